@@ -1,18 +1,28 @@
 # -*- coding: utf-8 -*-
 # pylint: disable=expression-not-assigned,line-too-long
 """Walk the REST accessible path tree of some binary repository management system."""
+from collections import defaultdict
 import datetime as dti
+import heapq
+import itertools
 import json
 import os
 import random
 import sys
+import threading
 import time
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
-import warnings
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 from bs4 import BeautifulSoup
 import requests
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+from brm_rest_walk.filters import PathFilter, load_rules, path_filter_for
+from brm_rest_walk.frontier import DFS, PRIORITY, Frontier
+from brm_rest_walk.replicas import ReplicaPool
+from brm_rest_walk.retry import DEAD_LETTERS_FILE, RetryQueue, write_dead_letters
+from brm_rest_walk.singleflight import MEMO_SECONDS, SingleFlight
+from brm_rest_walk.transport import Transport, configure, transport_from_env
+from brm_rest_walk.visited import visited_set
 
 DEBUG_VAR = "BRM_DEBUG"
 DEBUG = os.getenv(DEBUG_VAR)
@@ -47,17 +57,73 @@ brm_token = os.getenv(BRM_TOKEN, "")
 if not brm_token:
     raise RuntimeError(f"Please set {BRM_TOKEN}")
 
+BRM_WORKERS = "BRM_WORKERS"
+brm_workers = int(os.getenv(BRM_WORKERS, "1"))
+
+BRM_HISTORY = "BRM_HISTORY"
+brm_history = os.getenv(BRM_HISTORY, "")  # Optional tree.json of a previous walk to schedule by cost
+
+BRM_FILTERS = "BRM_FILTERS"
+brm_filters = os.getenv(BRM_FILTERS, "")  # Optional JSON file with include and exclude rules
+
+BRM_REPLICAS = "BRM_REPLICAS"
+brm_replicas = [url for url in os.getenv(BRM_REPLICAS, "").split(',') if url]  # Optional equivalent server urls (comma separated)
+
+BRM_DEADLINE = "BRM_DEADLINE"
+brm_deadline = float(os.getenv(BRM_DEADLINE, "0"))  # Optional wall clock seconds for a bounded walk
+
+BRM_MAX_REQUESTS = "BRM_MAX_REQUESTS"
+brm_max_requests = int(os.getenv(BRM_MAX_REQUESTS, "0"))  # Optional request budget for a bounded walk
+
+BRM_RESUME = "BRM_RESUME"
+brm_resume = os.getenv(BRM_RESUME, "")  # Optional partial tree.json of a bounded walk to continue
+
 TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+API_TS_FORMAT = "%d-%b-%Y %H:%M"  # Autoindex timestamps like 22-Aug-2019 09:53
 
 EDGE = '@e'
 NODE = '@n'
 HREFS = '@h'
 META = '@m'
+COST = '@c'
+TEXT = '@t'
+DIGESTS = '@d'
+DOCUMENT = '@j'
+PENDING = '@p'
+FAILED = '@x'
+MARKERS = (EDGE, COST, PENDING, FAILED)  # Keys of folder branches that are not children
+
+COSTS = (SECONDS := 'seconds', CHILDREN := 'children', FOLDERS := 'folders')
 
 EASING = True
 
+DEPTH_DAYS = 30  # Recency in days one level of folder depth is worth when prioritizing bounded walks
+SECONDS_PER_DAY = 86400
+
 KNOWN_DIGESTS = (MD5 := 'md5', SHA1 := 'sha1', SHA256 := 'sha256')
 
+SIZE_UNITS = {
+    'b': 1, 'bytes': 1,
+    'kb': 1 << 10, 'k': 1 << 10,
+    'mb': 1 << 20, 'm': 1 << 20,
+    'gb': 1 << 30, 'g': 1 << 30,
+    'tb': 1 << 40, 't': 1 << 40,
+}
+
+CHUNK_BYTES = 1 << 20
+
+KINDS = (FOLDER := 'folder', LEAF := 'leaf')
+
+WALK_STATS = (
+    REQUESTS := 'requests',
+    PRUNED_FOLDERS := 'pruned_folders',
+    SKIPPED_LEAVES := 'skipped_leaves',
+    DUPLICATE_FOLDERS := 'duplicate_folders',
+    METADATA_FALLBACKS := 'metadata_fallbacks',
+    RETRIES := 'retries',
+    DEAD_LETTERS := 'dead_letters',
+)
+
 
 def easing():
     """Be nice."""
@@ -85,58 +151,215 @@ def parse_autoindex(page_text):
     return parsed
 
 
+def parse_hrefs(html):
+    """Extract the links from HTML a tags (excluding ..)."""
+    return [rel for rel in (tag['href'] for tag in BeautifulSoup(html, "html.parser").find_all("a", href=True)) if not rel.startswith('..')]
+
+
 def autoindex_map(html):
     """parse autoindex for tuples describing files and reshape the list of tuples into a map."""
     return {f: {"name": f, "api_ts": d, "h_size": s, "h_unit": u} for f, d, s, u in parse_autoindex(html)}
 
 
+def size_bytes(h_size, h_unit):
+    """Convert the human readable autoindex size to bytes (None for folders and unknown units)."""
+    factor = SIZE_UNITS.get(str(h_unit).lower())
+    if factor is None:
+        return None
+    try:
+        return int(float(h_size) * factor)
+    except (TypeError, ValueError):
+        return None
+
+
 def is_node(relative_link):
     """In directory listings a folder is indeicated by a trailing slash (/)."""
     node = not relative_link.endswith('/')
     return node
 
 
+def join_url(url, relative_link):
+    """Join folder url and relative link with exactly one slash (absolute links are taken as is)."""
+    if '://' in relative_link:
+        return relative_link
+    return f"{url.rstrip('/')}/{relative_link}"
+
+
+def child_link(folder_url, relative_link):
+    """Relative form of a link to a direct child of the folder (None for absolute links leading elsewhere)."""
+    if '://' not in relative_link:
+        return relative_link
+    prefix = f"{folder_url.rstrip('/')}/"
+    rest = relative_link[len(prefix):] if relative_link.startswith(prefix) else ''
+    return rest if rest and '/' not in rest.rstrip('/') else None
+
+
+def digest_value(text):
+    """Digest of a sidecar like '<hex>  file name' as lower case hex ('' when blank)."""
+    words = text.split() if text else []
+    return words[0].lower() if words else ''
+
+
+def api_timestamp(api_ts):
+    """Convert the autoindex timestamp to seconds since the epoch (None if absent or unparseable).
+
+    Only the date and time words count, as folder lines may leave size columns in the timestamp.
+    """
+    try:
+        return int(dti.datetime.strptime(' '.join(api_ts.split()[:2]), API_TS_FORMAT).replace(tzinfo=dti.timezone.utc).timestamp())
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def freshness(folder_path, ts=None):
+    """Frontier priority favoring shallow folders and among similar depths the recently changed ones.
+
+    Unknown timestamps (roots, resumed and retried folders) rank as changed today, so only their depth orders them.
+    """
+    days = ts / SECONDS_PER_DAY if ts is not None else time.time() // SECONDS_PER_DAY
+    return days - DEPTH_DAYS * folder_path.count('/')
+
+
+class Budget:
+    """Wall clock and request limits shared by the walks of one run (None means unlimited)."""
+
+    def __init__(self, seconds: Optional[float] = None, max_requests: Optional[int] = None):
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.max_requests = max_requests
+        self._baseline: Optional[int] = None
+
+    def exhausted(self, requests_made: int) -> bool:
+        """Answer if the deadline passed or the requests made since the first check reached the limit."""
+        if self._baseline is None:
+            self._baseline = requests_made
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.max_requests is not None and requests_made - self._baseline >= self.max_requests
+
+    def capped(self, seconds: float) -> float:
+        """Shorten the seconds to what is left before the deadline (never below zero)."""
+        return seconds if self.deadline is None else max(0.0, min(seconds, self.deadline - time.monotonic()))
+
+
+class Entry(NamedTuple):
+    """Flat record of one folder or leaf - folder paths carry a trailing slash, the root folder path is empty."""
+
+    repository: str
+    path: str
+    kind: str
+    size: Optional[int] = None
+    ts: Optional[int] = None
+    digests: Dict[str, str] = {}
+
+    @property
+    def depth(self):
+        return self.path.rstrip('/').count('/') + 1 if self.path else 0
+
+    @property
+    def url(self):
+        return join_url(self.repository, self.path) if self.path else self.repository
+
+    @property
+    def sort_key(self):
+        return self.repository, self.path
+
+
+def leaf_entry(repository, path, meta) -> Entry:
+    """Leaf record from the autoindex meta (digests are taken from the meta when present)."""
+    return Entry(
+        repository,
+        path,
+        LEAF,
+        size_bytes(meta.get('h_size'), meta.get('h_unit')),
+        api_timestamp(meta.get('api_ts')),
+        {digest: meta[digest] for digest in KNOWN_DIGESTS if meta.get(digest)},
+    )
+
+
 class TreeWalker:  # pylint: disable=bad-continuation,expression-not-assigned
     """Wrap the auth stuff and the REST BRM tree related walking."""
     
-    def __init__(self, server_url, api_root=None, repositories_path=None, username=None, api_token=None, wait=None):
+    def __init__(self, server_url, api_root=None, repositories_path=None, username=None, api_token=None, wait=None, visited=None, memo_seconds=None, transport: Optional[Transport] = None, replicas: Optional[List[str]] = None):
         self._user_url = server_url.rstrip("/")
         self._base_url = f"{self._user_url}{api_root if api_root else '/'}"
         self._repositories_url = f"{self._base_url}{repositories_path if repositories_path else 'repositories'}/"
         self._wait = wait if wait else 0.0
+        self.replicas = ReplicaPool(self._user_url, replicas) if replicas else None  # Equivalent server urls to spread requests across
         if username and api_token:
             self._session = requests.Session()
             self._session.auth = (username, api_token)
+            configure(self._session, transport if transport else transport_from_env(brm_workers))
         else:
             raise ValueError("Must use API token (other authentication means not implemented)")
         self.repositories = {}
+        self.stats = {stat: 0 for stat in WALK_STATS}
+        self.visited = visited if visited is not None else visited_set()  # Folder urls of the current walk (cleared as a walk starts)
+        self._flight = SingleFlight(ttl=memo_seconds if memo_seconds is not None else MEMO_SECONDS)
         self.repository_map()
 
-    def _fetch(self, url, params=None):
+    def _fetch(self, url, params=None, stream=False, headers=None):
         """DRY."""
         params = {} if not params else params
         self._wait and time.sleep(self._wait)
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", category=InsecureRequestWarning)
-            return self._session.get(url, verify=False, params=params)
+
+        def send(target):
+            self.stats[REQUESTS] += 1
+            return self._session.get(target, params=params, stream=stream, headers=headers)
+        return self.replicas.fetch(send, url) if self.replicas else send(url)
+
+    def revalidate(self, url, etag=None, last_modified=None):
+        """Conditionally retrieve url bypassing the memo and return None when unchanged (304) else (text, etag, last modified)."""
+        headers = {}
+        etag and headers.update({'If-None-Match': etag})
+        last_modified and headers.update({'If-Modified-Since': last_modified})
+        response = self._fetch(url, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return response.text, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+    def _text(self, url):
+        """Retrieve the response text of url once for concurrent and repeated callers."""
+        def fetch():
+            response = self._fetch(url)
+            response.raise_for_status()
+            return response.text
+        return self._flight.do((TEXT, url), fetch)
+
+    def text(self, url):
+        """Retrieve the text of url (metadata files, indexes) once for concurrent and repeated callers."""
+        return self._text(url)
+
+    def _hrefs(self, url):
+        """Parse the links of url once for concurrent and repeated callers."""
+        return self._flight.do((HREFS, url), lambda: parse_hrefs(self._text(url)))
+
+    def document(self, url):
+        """Retrieve and parse the JSON document at url once for concurrent and repeated callers (treat as read only)."""
+        return self._flight.do((DOCUMENT, url), lambda: json.loads(self._text(url)))
 
     def hashes(self, url):
-        """Retrieve the repository tree leaf hashes from convention."""
-        digests = {}
-        for digest in KNOWN_DIGESTS:
-            digest_url = f'{url}.{digest}'
-            response = self._fetch(digest_url)
+        """Retrieve the repository tree leaf hashes from convention (normalized to lower case hex)."""
+        return dict(self._flight.do((DIGESTS, url), lambda: {digest: digest_value(self._text(f"{url}.{digest}")) for digest in KNOWN_DIGESTS}))
+
+    def sidecar(self, url, digest):
+        """Retrieve one digest sidecar of url normalized like hashes ('' when not published)."""
+        try:
+            return digest_value(self._text(f"{url}.{digest}"))
+        except requests.HTTPError as error:
+            if error.response is not None and error.response.status_code in (404, 410):
+                return ''
+            raise
+
+    def artifact_chunks(self, url, chunk_size=CHUNK_BYTES):
+        """Stream the artifact bytes of url in chunks without buffering the whole file."""
+        with self._fetch(url, stream=True) as response:
             response.raise_for_status()
-            digests[digest] = response.text.strip()
-        return digests
+            yield from response.iter_content(chunk_size=chunk_size)
 
     def links(self, url):
         """Retrieve the repository tree leaf ward links from HTML a tags per tree link (excluding ..)."""
-        response = self._fetch(url)
-        response.raise_for_status()
-        html = response.text
-        hrefs = [rel for rel in (tag['href'] for tag in BeautifulSoup(html, "html.parser").find_all("a", href=True)) if not rel.startswith('..')]
-        return hrefs
+        return list(self._hrefs(url))
 
     def repository_map(self):
         """Retrieve the repositories resource and parse into repository dict by key field.
@@ -149,24 +372,270 @@ class TreeWalker:  # pylint: disable=bad-continuation,expression-not-assigned
         response_json = response.json()  # TODO depends on JSON type of response
         repo_types_ok = ('LOCAL', 'VIRTUAL')  # TODO specific pass filter - may need adjustment of other installs
         for repository in response_json:  # TODO mapping relies on presence and semantics of key, type,
-            key, repo_type = repository.get('key'), repository.get('type')
+            key, repo_type, url = repository.get('key'), repository.get('type'), repository.get('url')
             if repo_type not in repo_types_ok:
                 continue
             self.repositories[key] = {
                 "description": repository.get('description'),
-                "url": repository.get('url'),  # TODO meaningless entries where url is not given
+                "url": self.replicas.canonicalize(url) if self.replicas and url else url,  # TODO meaningless entries where url is not given
                 "package_type": repository.get('packageType'),
             }
         return self.repositories
 
     def repository_page(self, url):
-        """Retrieve the repository tree page and return paths."""
-        response = self._fetch(url)
-        response.raise_for_status()
-        html = response.text
-        page_map = autoindex_map(html)
-        hrefs = [rel for rel in (tag['href'] for tag in BeautifulSoup(html, "html.parser").find_all("a", href=True)) if not rel.startswith('..')]
-        return {HREFS: hrefs, META: page_map}
+        """Retrieve the repository tree page and return paths (the META map is shared, treat as read only)."""
+        page_map = self._flight.do((META, url), lambda: autoindex_map(self._text(url)))
+        return {HREFS: list(self._hrefs(url)), META: page_map}
+
+    def expand(self, folder_url, folder_path='', path_filter: Optional[PathFilter] = None):
+        """Retrieve one folder page and split it into hrefs, admitted leaves and folders to descend into.
+
+        Leaves map to {NODE: {NODE: url, META: autoindex meta}} from the page of their folder and
+        folders are (relative link, url, path) triplets - pruned folders are never requested.
+        """
+        data, leaves, folders = self._expand(folder_url, folder_path, path_filter)
+        return data[HREFS], leaves, folders
+
+    def _expand(self, folder_url, folder_path='', path_filter: Optional[PathFilter] = None):
+        """Implement expand but return the whole page data (hrefs and the shared META map)."""
+        data = self.repository_page(folder_url)
+        leaves, folders = {}, []
+        for relative_link in data[HREFS]:
+            path = f"{folder_path}{relative_link}"
+            if is_node(relative_link):
+                if path_filter and not path_filter.admits(path):
+                    self.stats[SKIPPED_LEAVES] += 1
+                    continue
+                leaves[relative_link] = {NODE: {NODE: join_url(folder_url, relative_link), META: data[META].get(relative_link, {})}}
+            elif relative_link:
+                child_url = join_url(folder_url, relative_link)
+                relative_link = child_link(folder_url, relative_link)
+                if relative_link is None:  # Absolute links elsewhere are followed from their own parents
+                    if child_url in self.visited:
+                        self.stats[DUPLICATE_FOLDERS] += 1
+                    continue
+                path = f"{folder_path}{relative_link}"
+                if path_filter and path_filter.prunes(path):
+                    self.stats[PRUNED_FOLDERS] += 1
+                    continue
+                if not self.visited.add(child_url):
+                    self.stats[DUPLICATE_FOLDERS] += 1
+                    continue
+                folders.append((relative_link, child_url, path))
+        return data, leaves, folders
+
+    def _failed(self, retries: RetryQueue, item: Tuple, error: BaseException, branch: Dict[str, Any]):
+        """Route a failed folder request to the retry queue and mark the branch once dead lettered."""
+        if retries.fail(item, error):
+            self.stats[RETRIES] += 1
+        else:
+            self.stats[DEAD_LETTERS] += 1
+            branch[FAILED] = retries.dead_letters[-1].error_class
+
+    def walk(
+        self,
+        url,
+        path_filter: Optional[PathFilter] = None,
+        order: str = DFS,
+        max_in_memory: Optional[int] = None,
+        budget: Optional['Budget'] = None,
+        resume: Optional[Dict[str, Any]] = None,
+        retries: Optional[RetryQueue] = None,
+    ):
+        """Walk the tree below url and return it nested as folder -> {EDGE: hrefs, COST: cost, child: ...}.
+
+        Pending folders wait in a Frontier (dfs, bfs or priority with shallow and recently changed folders
+        first) holding at most max_in_memory of them in memory and spilling the rest to disk. Once the
+        budget is exhausted the walk stops and marks the folders never requested as {PENDING: url}. Pass
+        such a partial tree as resume to continue with its pending folders (the tree is completed in place).
+        With a retry queue failed folder requests are retried by policy and dead letters are marked
+        {FAILED: error class} instead of aborting the walk.
+        """
+        resumes = {url: resume} if resume is not None else None
+        return self.walk_roots({url: path_filter}, order, max_in_memory, budget, resumes, retries)[url]
+
+    def walk_roots(
+        self,
+        roots: Dict[str, Optional[PathFilter]],
+        order: str = DFS,
+        max_in_memory: Optional[int] = None,
+        budget: Optional['Budget'] = None,
+        resume: Optional[Dict[str, Dict[str, Any]]] = None,
+        retries: Optional[RetryQueue] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Walk all roots (url -> path filter) like walk but from one frontier and return the trees by root url.
+
+        With the priority order a budget goes to the shallow and recently changed folders of all roots
+        instead of the first roots only. Resume maps root urls to partial trees (other roots start afresh).
+        """
+        resume = resume if resume else {}
+        trees: Dict[str, Dict[str, Any]] = {url: resume.get(url, {}) for url in roots}
+        self.visited.clear()
+        with Frontier(order, max_in_memory) as frontier:
+            for url, root in trees.items():
+                self.visited.add(url)
+                if url not in resume:
+                    frontier.push((url, url, ''), freshness(''))
+                for pending_url, pending_path in pending_folders(root):
+                    self.visited.add(pending_url)
+                    frontier.push((url, pending_url, pending_path), freshness(pending_path))
+            while frontier or retries:
+                if budget and budget.exhausted(self.stats[REQUESTS]):
+                    for pending_url, pending_path, url in retries.drain() if retries else ():
+                        branch_at(trees[url], pending_path)[PENDING] = pending_url
+                    while frontier:
+                        url, pending_url, pending_path = frontier.pop()
+                        branch_at(trees[url], pending_path)[PENDING] = pending_url
+                    break
+                if retries:
+                    if not frontier:
+                        time.sleep(budget.capped(retries.wait_seconds()) if budget else retries.wait_seconds())
+                        if budget and budget.exhausted(self.stats[REQUESTS]):
+                            continue
+                    for retry_url, retry_path, url in retries.due():
+                        frontier.push((url, retry_url, retry_path), freshness(retry_path))
+                    if not frontier:
+                        continue
+                url, folder_url, folder_path = frontier.pop()
+                branch = branch_at(trees[url], folder_path)
+                branch.pop(PENDING, None)
+                started = time.perf_counter()
+                try:
+                    data, leaves, folders = self._expand(folder_url, folder_path, roots[url])
+                except requests.RequestException as error:
+                    if retries is None:
+                        raise
+                    self._failed(retries, (folder_url, folder_path, url), error, branch)
+                    continue
+                branch[EDGE] = data[HREFS]
+                branch[COST] = folder_cost(data[HREFS], time.perf_counter() - started)
+                branch.update(leaves)
+                for relative_link, child_url, child_path in folders:
+                    easing()
+                    branch[relative_link] = {}
+                    ts = api_timestamp(data[META].get(relative_link, {}).get('api_ts'))
+                    frontier.push((url, child_url, child_path), freshness(child_path, ts))
+        return trees
+
+    def iter_entries(
+        self,
+        repositories: Dict[str, Dict],
+        filter_for: Optional[Callable[[str], PathFilter]] = None,
+        order: str = DFS,
+        max_in_memory: Optional[int] = None,
+    ) -> Iterator[Entry]:
+        """Lazily walk the repositories (key -> {"url": ...} like repository_map) and yield entries as discovered.
+
+        Folders are yielded when found and requested only when the consumer asks for more, so a slow
+        consumer throttles the walk and nothing but the pending folders is buffered (in a Frontier
+        bounded by max_in_memory that spills to disk).
+        """
+        self.visited.clear()
+        for key, repository in repositories.items():
+            url = repository["url"]
+            self.visited.add(url)
+            yield Entry(url, '', FOLDER)
+            yield from self.iter_below(url, url, '', filter_for(key) if filter_for else None, order, max_in_memory)
+
+    def iter_below(
+        self,
+        repository_url,
+        folder_url,
+        folder_path='',
+        path_filter: Optional[PathFilter] = None,
+        order: str = DFS,
+        max_in_memory: Optional[int] = None,
+    ) -> Iterator[Entry]:
+        """Lazily yield the entries below one folder of the repository (the folder itself excluded)."""
+        with Frontier(order, max_in_memory) as frontier:
+            frontier.push((folder_url, folder_path))
+            while frontier:
+                folder_url, folder_path = frontier.pop()
+                _, leaves, folders = self.expand(folder_url, folder_path, path_filter)
+                for relative_link, leaf in leaves.items():
+                    yield leaf_entry(repository_url, f"{folder_path}{relative_link}", leaf[NODE][META])
+                for _, _, child_path in folders:
+                    yield Entry(repository_url, child_path, FOLDER)
+                pending = reversed(folders) if order == DFS else folders
+                for _, child_url, child_path in pending:
+                    frontier.push((child_url, child_path), -child_path.count('/'))
+
+    def walk_parallel(
+        self,
+        roots: Dict[str, Optional[PathFilter]],
+        workers: int = 4,
+        history: Optional[Dict[Tuple[str, str], Dict]] = None,
+        retries: Optional[RetryQueue] = None,
+    ):
+        """Walk all roots (url -> path filter) with worker threads sharing one frontier ordered by expected cost.
+
+        Folders known from the history of an earlier walk start in the order of their subtree seconds, longest
+        first, and as their children enter the shared frontier with their own costs, giant subtrees are split
+        across the workers. Unknown folders expect an equal share of the cost of their parent. Failed folder
+        requests go to the retry queue (if given) like in walk.
+        """
+        history = history if history else {}
+        trees: Dict[str, Dict[str, Any]] = {url: {} for url in roots}
+        order = itertools.count()
+        frontier: List = []
+        self.visited.clear()
+        for url in roots:
+            self.visited.add(url)
+            expected = history.get((url, ''), {}).get(SECONDS, 0.0)
+            heapq.heappush(frontier, (-expected, next(order), url, url, '', trees[url]))
+        condition = threading.Condition()
+        active, errors = 0, []
+
+        def work():
+            nonlocal active
+            while True:
+                with condition:
+                    while not errors:
+                        for retry_url, retry_path, root_url, negative_expected in retries.due() if retries else ():
+                            heapq.heappush(frontier, (negative_expected, next(order), root_url, retry_url, retry_path, branch_at(trees[root_url], retry_path)))
+                        if frontier or not (active or retries):
+                            break
+                        condition.wait(retries.wait_seconds() if retries else None)
+                    if not frontier or errors:
+                        condition.notify_all()
+                        return
+                    negative_expected, _, root_url, folder_url, folder_path, branch = heapq.heappop(frontier)
+                    active += 1
+                try:
+                    started = time.perf_counter()
+                    hrefs, leaves, folders = self.expand(folder_url, folder_path, roots[root_url])
+                    cost = folder_cost(hrefs, time.perf_counter() - started)
+                except BaseException as error:  # pylint: disable=broad-except
+                    with condition:
+                        if retries is not None and isinstance(error, requests.RequestException):
+                            self._failed(retries, (folder_url, folder_path, root_url, negative_expected), error, branch)
+                        else:
+                            errors.append(error)
+                        active -= 1
+                        condition.notify_all()
+                    if errors:
+                        return
+                    continue
+                with condition:
+                    branch[EDGE] = hrefs
+                    branch[COST] = cost
+                    branch.update(leaves)
+                    share = -negative_expected / max(1, len(folders))
+                    for relative_link, child_url, child_path in folders:
+                        branch[relative_link] = {}
+                        expected = history.get((root_url, child_path), {}).get(SECONDS, share)
+                        heapq.heappush(frontier, (-expected, next(order), root_url, child_url, child_path, branch[relative_link]))
+                    active -= 1
+                    condition.notify_all()
+
+        threads = [threading.Thread(target=work, name=f"walker-{n}", daemon=True) for n in range(max(1, workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return trees
 
 
 def trial(argv=None):
@@ -178,120 +647,43 @@ def trial(argv=None):
 
     print(f"Job walking REST accessible BRM tree starts at {naive_timestamp()}")
     DEBUG and print(f'Context -> server({brm_server}), API root({brm_api_root}), remote user ({brm_user})')
-    walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+    walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token, replicas=brm_replicas)
     repositories = walker.repository_map()
     print(f"Found {len(repositories)} repositories with interesting types.")
     DEBUG and print(repositories)
+    rules = load_rules(brm_filters)
+    bounded = brm_deadline or brm_max_requests or brm_resume
+    budget = Budget(brm_deadline if brm_deadline else None, brm_max_requests if brm_max_requests else None) if bounded else None
+    parallel = brm_workers > 1 and not budget  # Bounded and resumed walks share one prioritized frontier across repositories
+    previous = load_tree(brm_resume).get(str(1), {}) if brm_resume else {}
+    retries = RetryQueue()
     level = 1
     tree = {level: {}}
     for key, repository in repositories.items():
-        indent = ""
+        indent = " " * 2
         DEBUG and print(f"{indent}{key} -> {repository}")
         url = repository["url"]
-        data = walker.repository_page(url)
-        tree[level][url] = {EDGE: data[HREFS]}
-        indent += " " * 2
-        print(f"{indent}{url} ->")
-
-        indent += " " * 2
-        for url, downward_links in tree[level].items():
-            for relative_link in downward_links[EDGE]:
-                tree[level][url][relative_link] = {}
-                node = is_node(relative_link)
-                if not node and relative_link:
-                    easing()
-                    data = walker.repository_page(f"{url}/{relative_link}")
-                    tree[level][url][relative_link][EDGE] = data[HREFS]
-                else:
-                    data = walker.repository_page(f"{url}")
-                    tree[level][url][relative_link][NODE] = {
-                        NODE: f"{url}/{relative_link}",
-                        META: data[META].get(relative_link, {}),
-                    }
-                print(f"{indent}{relative_link} {'LEAF' if node else '->'}")
-
-            for relative_link in downward_links[EDGE]:
-                for p1 in tree[level][url][relative_link].get(EDGE, []):
-                    tree[level][url][relative_link][p1] = {}
-                    node = is_node(p1)
-                    if not node and relative_link:
-                        easing()
-                        data = walker.repository_page(f"{url}/{relative_link}/{p1}")
-                        tree[level][url][relative_link][p1][EDGE] = data[HREFS]
-                    else:
-                        data = walker.repository_page(f"{url}/{relative_link}")
-                        tree[level][url][relative_link][p1][NODE] = {
-                            NODE: f"{url}/{relative_link}{p1}",
-                            META: data[META].get(p1, {}),
-                        }
-
-            for relative_link in downward_links[EDGE]:
-                for p1 in tree[level][url][relative_link].get(EDGE, []):
-                    for p2 in tree[level][url][relative_link][p1].get(EDGE, []):
-                        tree[level][url][relative_link][p1][p2] = {}
-                        node = is_node(p2)
-                        if not node and relative_link:
-                            easing()
-                            data = walker.repository_page(f"{url}/{relative_link}/{p1}/{p2}")
-                            tree[level][url][relative_link][p1][p2][EDGE] = data[HREFS]
-                        else:
-                            data = walker.repository_page(f"{url}/{relative_link}{p1}")
-                            tree[level][url][relative_link][p1][p2][NODE] = {
-                                NODE: f"{url}/{relative_link}{p1}{p2}",
-                                META: data[META].get(p2, {}),
-                            }
-
-            for relative_link in downward_links[EDGE]:
-                for p1 in tree[level][url][relative_link].get(EDGE, []):
-                    for p2 in tree[level][url][relative_link][p1].get(EDGE, []):
-                        for p3 in tree[level][url][relative_link][p1][p2].get(EDGE, []):
-                            tree[level][url][relative_link][p1][p2][p3] = {}
-                            node = is_node(p3)
-                            if not node and relative_link:
-                                easing()
-                                data = walker.repository_page(f"{url}/{relative_link}/{p1}/{p2}/{p3}")
-                                tree[level][url][relative_link][p1][p2][p3][EDGE] = data[HREFS]
-                            else:
-                                data = walker.repository_page(f"{url}/{relative_link}{p1}{p2}")
-                                tree[level][url][relative_link][p1][p2][p3][NODE] = {
-                                    NODE: f"{url}/{relative_link}{p1}{p2}{p3}",
-                                    META: data[META].get(p3, {}),
-                                }
-
-            for relative_link in downward_links[EDGE]:
-                for p1 in tree[level][url][relative_link].get(EDGE, []):
-                    for p2 in tree[level][url][relative_link][p1].get(EDGE, []):
-                        for p3 in tree[level][url][relative_link][p1][p2].get(EDGE, []):
-                            for p4 in tree[level][url][relative_link][p1][p2][p3].get(EDGE, []):
-                                tree[level][url][relative_link][p1][p2][p3][p4] = {}
-                                node = is_node(p4)
-                                if not node and relative_link:
-                                    easing()
-                                    data = walker.repository_page(f"{url}/{relative_link}/{p1}/{p2}/{p3}/{p4}")
-                                    tree[level][url][relative_link][p1][p2][p3][p4][EDGE] = data[HREFS]
-                                else:
-                                    data = walker.repository_page(f"{url}/{relative_link}{p1}{p2}{p3}")
-                                    tree[level][url][relative_link][p1][p2][p3][NODE] = {
-                                        NODE: f"{url}/{relative_link}{p1}{p2}{p3}{p4}",
-                                        META: data[META].get(p4, {}),
-                                    }
-
-            # for relative_link in downward_links[EDGE]:
-            #     for p1 in tree[level][url][relative_link].get(EDGE, []):
-            #         for p2 in tree[level][url][relative_link][p1].get(EDGE, []):
-            #             for p3 in tree[level][url][relative_link][p1][p2].get(EDGE, []):
-            #                 for p4 in tree[level][url][relative_link][p1][p2][p3].get(EDGE, []):
-            #                     for p5 in tree[level][url][relative_link][p1][p2][p3][p4].get(EDGE, []):
-            #                         tree[level][url][relative_link][p1][p2][p3][p4][p5] = {}
-            #                         node = is_node(p5)
-            #                         if not node and relative_link:
-            #                             easing()
-            #                             data = walker.repository_page(f"{url}/{relative_link}/{p1}/{p2}/{p3}/{p4}/{p5}")
-            #                             tree[level][url][relative_link][p1][p2][p3][p4][p5][EDGE] = data[HREFS]
-            #                         else:
-            #                             tree[level][url][relative_link][p1][p2][p3][p4][p5][NODE] = f"{url}/{relative_link}{p1}{p2}{p3}{p4}{p5}"
-
+        if parallel or budget:
+            continue
+        pruned = walker.stats[PRUNED_FOLDERS]
+        tree[level][url] = walker.walk(url, path_filter=path_filter_for(rules, key), retries=retries)
+        print(f"{indent}{url} -> pruned {walker.stats[PRUNED_FOLDERS] - pruned} folders")
+    if budget:
+        roots = {repository["url"]: path_filter_for(rules, key) for key, repository in repositories.items()}
+        resume = {url: previous[url] for url in roots if url in previous}
+        tree[level] = walker.walk_roots(roots, PRIORITY, budget=budget, resume=resume, retries=retries)
+        print(f"Walked {len(roots)} repositories leaving {sum(1 for root in tree[level].values() for _ in pending_folders(root))} folders pending.")
+    if parallel:
+        history = subtree_costs(load_tree(brm_history)) if brm_history else {}
+        roots = {repository["url"]: path_filter_for(rules, key) for key, repository in repositories.items()}
+        print(f"Walking with {brm_workers} workers scheduled by {len(history)} folder costs from history.")
+        tree[level] = walker.walk_parallel(roots, brm_workers, history, retries)
+
+    print(f"Walk stats: {walker.stats}")
+    walker.replicas and print(f"Replica health: {walker.replicas.health()}")
     dump(tree)
+    if retries.dead_letters:
+        print(f"Gave up on {write_dead_letters(DEAD_LETTERS_FILE, retries.dead_letters)} folders listed in {DEAD_LETTERS_FILE}.")
     print(f"Job walking REST accessible BRM tree finished at {naive_timestamp()}")
     return 0
 
@@ -302,6 +694,104 @@ def dump(tree):
         json.dump(tree, handle, indent=2)
 
 
+def load_tree(path):
+    """Load a tree.json written by dump()."""
+    with open(path, "rt", encoding=ENCODING) as handle:
+        return json.load(handle)
+
+
+def folder_cost(hrefs, seconds):
+    """Cost record of one folder page."""
+    return {SECONDS: round(seconds, 6), CHILDREN: len(hrefs)}
+
+
+def pending_folders(root) -> Iterator[Tuple[str, str]]:
+    """Yield (url, path) of the folders a bounded walk left {PENDING: url} in the tree below root."""
+    stack = [('', root)]
+    while stack:
+        folder_path, branch = stack.pop()
+        if PENDING in branch:
+            yield branch[PENDING], folder_path
+        stack.extend((f"{folder_path}{rel}", child) for rel, child in branch.items() if rel not in MARKERS and NODE not in child)
+
+
+def branch_at(root, folder_path):
+    """Branch of a walked tree below root at the folder path (like 'a/b/', '' is the root)."""
+    branch = root
+    for segment in folder_path.split('/')[:-1]:
+        branch = branch[f"{segment}/"]
+    return branch
+
+
+def subtree_costs(tree) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """Sum the folder costs of a walked tree per subtree keyed by (repository url, folder path).
+
+    Subtree folders count the page requests a walk of the subtree costs.
+    """
+    costs: Dict[Tuple[str, str], Dict[str, float]] = {}
+    for repositories in tree.values():
+        for repository, root in repositories.items():
+            stack: List[Tuple[str, Dict, bool]] = [('', root, False)]
+            while stack:
+                folder_path, branch, children_done = stack.pop()
+                if not children_done:
+                    stack.append((folder_path, branch, True))
+                    stack.extend((f"{folder_path}{rel}", child, False) for rel, child in branch.items() if rel not in MARKERS and NODE not in child)
+                    continue
+                own = branch.get(COST, {})
+                total = {SECONDS: own.get(SECONDS, 0.0), CHILDREN: own.get(CHILDREN, 0), FOLDERS: 1}
+                for rel, child in branch.items():
+                    if rel not in MARKERS and NODE not in child:
+                        for name, value in costs[(repository, f"{folder_path}{rel}")].items():
+                            total[name] += value
+                costs[(repository, folder_path)] = total
+    return costs
+
+
+def iter_tree(tree) -> Iterator[Entry]:
+    """Flatten the nested {level: {repository url: tree}} layout of trial() (levels as int or str) into entries."""
+    for repositories in tree.values():
+        for repository, root in repositories.items():
+            stack = [('', root)]
+            while stack:
+                folder_path, branch = stack.pop()
+                yield Entry(repository, folder_path, FOLDER)
+                for relative_link, child in branch.items():
+                    if relative_link in MARKERS:
+                        continue
+                    if NODE in child:
+                        yield leaf_entry(repository, f"{folder_path}{relative_link}", child[NODE].get(META, {}))
+                    else:
+                        stack.append((f"{folder_path}{relative_link}", child))
+
+
+def build_tree(entries: Iterable[Entry]) -> Dict[int, Dict[str, Any]]:
+    """Nest entries into the layout of trial() (sizes in bytes, timestamps in autoindex format, EDGE lists from the entries)."""
+    level = 1
+    tree: Dict[int, Dict[str, Any]] = {level: {}}
+    for entry in entries:
+        branch = tree[level].setdefault(entry.repository, {EDGE: []})
+        parts = [f"{part}/" for part in entry.path.rstrip('/').split('/')] if entry.path else []
+        if entry.kind == LEAF:
+            parts[-1] = parts[-1].rstrip('/')
+        for depth, part in enumerate(parts, start=1):
+            if part not in branch:
+                branch[EDGE].append(part)
+                branch[part] = {EDGE: []} if part.endswith('/') else {}
+            if depth < len(parts):
+                branch = branch[part]
+        if entry.kind == LEAF:
+            meta = {
+                "name": parts[-1],
+                "api_ts": dti.datetime.fromtimestamp(entry.ts, dti.timezone.utc).strftime(API_TS_FORMAT) if entry.ts is not None else None,
+                "h_size": str(entry.size) if entry.size is not None else '-',
+                "h_unit": 'bytes' if entry.size is not None else '-',
+                **entry.digests,
+            }
+            branch[parts[-1]] = {NODE: {NODE: entry.url, META: meta}}
+    return tree
+
+
 def add_element(below: defaultdict, path_sequence: List[str], data) -> None:
     """Helper function."""
     head, tail = 0, slice(1, None)  # seq[0], seq[1:]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Export entries to typed columnar files - Arrow IPC (.arrow) or Parquet (.parquet) - for analytics.
+
+Entries are buffered per column and written as one record batch (and one Parquet row group) per
+batch_rows, so exports stream with bounded memory and readers can memory map the files and load
+column subsets. Needs the optional pyarrow package.
+"""
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from brm_rest_walk.brm_rest_walk import KNOWN_DIGESTS, Entry
+from brm_rest_walk.diff import open_entries
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401 pylint: disable=unused-import
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa, pq = None, None
+
+BATCH_ROWS = 64 * 1024
+FORMATS = (ARROW := '.arrow', PARQUET := '.parquet')
+COMPRESSION = 'zstd'
+
+SCHEMA = pa.schema([
+    ('repository', pa.string()),
+    ('path', pa.string()),
+    ('depth', pa.int16()),
+    ('kind', pa.string()),
+    ('size', pa.int64()),
+    ('ts', pa.timestamp('s', tz='UTC')),
+    *((digest, pa.string()) for digest in KNOWN_DIGESTS),
+]) if pa else None
+
+
+def columnar_format(path: str) -> str:
+    """File format by suffix (ValueError for others)."""
+    for suffix in FORMATS:
+        if path.endswith(suffix):
+            return suffix
+    raise ValueError(f"Unknown columnar target ({path}) - use one of {FORMATS}")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Columnar export needs the optional pyarrow package (pip install pyarrow)")
+
+
+class ColumnarWriter:
+    """Write entries in record batches of batch_rows to an Arrow IPC or Parquet file (use as context manager)."""
+
+    def __init__(self, path: str, batch_rows: int = BATCH_ROWS):
+        require_pyarrow()
+        if batch_rows < 1:
+            raise ValueError("Batch rows must be positive")
+        self.format = columnar_format(path)
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self.batches = 0
+        self._columns: Dict[str, List] = {name: [] for name in SCHEMA.names}
+        if self.format == ARROW:
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, SCHEMA)
+        else:
+            self._sink = None
+            self._writer = pq.ParquetWriter(path, SCHEMA, compression=COMPRESSION)
+
+    def write(self, entry: Entry):
+        """Buffer the entry and write a batch once batch_rows are buffered."""
+        columns = self._columns
+        columns['repository'].append(entry.repository)
+        columns['path'].append(entry.path)
+        columns['depth'].append(entry.depth)
+        columns['kind'].append(entry.kind)
+        columns['size'].append(entry.size)
+        columns['ts'].append(entry.ts)
+        for digest in KNOWN_DIGESTS:
+            columns[digest].append(entry.digests.get(digest))
+        self.rows += 1
+        len(columns['path']) >= self.batch_rows and self.flush()
+
+    def flush(self):
+        """Write the buffered entries as one record batch (one Parquet row group)."""
+        if not self._columns['path']:
+            return
+        batch = pa.RecordBatch.from_pydict(self._columns, schema=SCHEMA)
+        if self.format == ARROW:
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_batch(batch, row_group_size=self.batch_rows)
+        self.batches += 1
+        for column in self._columns.values():
+            column.clear()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        self._sink and self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_columnar(path: str, entries: Iterable[Entry], batch_rows: int = BATCH_ROWS) -> int:
+    """Stream the entries into the columnar file and return their count."""
+    with ColumnarWriter(path, batch_rows) as writer:
+        for entry in entries:
+            writer.write(entry)
+    return writer.rows
+
+
+def read_batches(path: str, columns: Optional[List[str]] = None):
+    """Iterate the record batches of the memory mapped file (optionally only the given columns)."""
+    require_pyarrow()
+    if columnar_format(path) == ARROW:
+        with pa.memory_map(path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                batch = reader.get_batch(index)
+                yield batch.select(columns) if columns else batch
+    else:
+        yield from pq.ParquetFile(path, memory_map=True).iter_batches(columns=columns)
+
+
+def read_columnar(path: str) -> Iterator[Entry]:
+    """Stream the entries of a columnar file."""
+    for batch in read_batches(path):
+        rows = batch.to_pydict()
+        rows['ts'] = batch.column('ts').cast(SCHEMA.field('ts').type).cast(pa.int64()).to_pylist()  # Parquet stores ms
+        for index in range(batch.num_rows):
+            yield Entry(
+                rows['repository'][index],
+                rows['path'][index],
+                rows['kind'][index],
+                rows['size'][index],
+                rows['ts'][index],
+                {digest: rows[digest][index] for digest in KNOWN_DIGESTS if rows[digest][index]},
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Export the entries of SOURCE (.snap, .ndjson or .json) to TARGET (.arrow or .parquet): SOURCE TARGET [BATCH_ROWS]."""
+    argv = argv if argv else sys.argv[1:]
+    if len(argv) not in (2, 3) or not argv[1].endswith(FORMATS):
+        print("ERROR usage: SOURCE TARGET [BATCH_ROWS]")
+        return 2
+    count = write_columnar(argv[1], open_entries(argv[0]), int(argv[2]) if len(argv) > 2 else BATCH_ROWS)
+    print(f"Exported {count} entries from {argv[0]} to {argv[1]}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
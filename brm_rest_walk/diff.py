@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Compare two walks by merge joining their entry streams in (repository, path) order.
+
+Sources are a snapshot (already sorted), an NDJSON file of entries (written sorted by write_ndjson)
+or a tree.json from dump() (flattened and sorted in memory, as loading it needs the memory anyway).
+The merge join runs in linear time and holds one entry per side, the rollups hold one counter per
+repository and per folder with changes.
+"""
+import collections
+import json
+import sys
+from typing import Counter, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from brm_rest_walk.brm_rest_walk import ENCODING, Entry, iter_tree
+from brm_rest_walk.snapshot import Snapshot
+
+CHANGES = (
+    ADDED := 'added',
+    REMOVED := 'removed',
+    RESIZED := 'resized',
+    RETIMED := 'retimed',
+    DIGEST_CHANGED := 'digest_changed',
+)
+
+SNAPSHOT_SUFFIX = '.snap'
+NDJSON_SUFFIX = '.ndjson'
+JSON_SUFFIX = '.json'
+
+
+class Change(NamedTuple):
+    """What changed for one (repository, path) with the old and new entry (None when absent)."""
+
+    repository: str
+    path: str
+    changes: Tuple[str, ...]
+    old: Optional[Entry]
+    new: Optional[Entry]
+
+
+def write_ndjson(path: str, entries: Iterable[Entry]) -> int:
+    """Write the entries sorted one JSON object per line and return their count."""
+    count = 0
+    with open(path, 'wt', encoding=ENCODING) as handle:
+        for entry in sorted(entries, key=lambda entry: entry.sort_key):
+            handle.write(json.dumps(entry._asdict()) + '\n')
+            count += 1
+    return count
+
+
+def read_ndjson(path: str) -> Iterator[Entry]:
+    """Stream the entries of an NDJSON file."""
+    with open(path, 'rt', encoding=ENCODING) as handle:
+        for line in handle:
+            if line.strip():
+                yield Entry(**json.loads(line))
+
+
+def read_json(path: str) -> Iterator[Entry]:
+    """Flatten and sort a tree.json written by dump()."""
+    with open(path, 'rt', encoding=ENCODING) as handle:
+        tree = json.load(handle)
+    yield from sorted(iter_tree(tree), key=lambda entry: entry.sort_key)
+
+
+def read_snapshot(path: str) -> Iterator[Entry]:
+    with Snapshot(path) as snapshot:
+        yield from snapshot
+
+
+def open_entries(path: str) -> Iterator[Entry]:
+    """Sorted entries from a snapshot, NDJSON or JSON file chosen by suffix."""
+    if path.endswith(SNAPSHOT_SUFFIX):
+        return read_snapshot(path)
+    if path.endswith(NDJSON_SUFFIX):
+        return read_ndjson(path)
+    if path.endswith(JSON_SUFFIX):
+        return read_json(path)
+    raise ValueError(f"Unknown entry source ({path}) - use one of {SNAPSHOT_SUFFIX}, {NDJSON_SUFFIX}, {JSON_SUFFIX}")
+
+
+def _ordered(entries: Iterable[Entry], side: str) -> Iterator[Entry]:
+    """Pass the entries through and insist on strictly ascending keys."""
+    previous = None
+    for entry in entries:
+        key = entry.sort_key
+        if previous is not None and key <= previous:
+            raise ValueError(f"The {side} entries are not strictly sorted at {key}")
+        previous = key
+        yield entry
+
+
+def compare(old: Entry, new: Entry) -> Tuple[str, ...]:
+    """Changes between two entries of the same key (digests only count when known on both sides)."""
+    changes = []
+    old.size != new.size and changes.append(RESIZED)
+    old.ts != new.ts and changes.append(RETIMED)
+    if any(old.digests[digest] != new.digests[digest] for digest in old.digests.keys() & new.digests.keys()):
+        changes.append(DIGEST_CHANGED)
+    return tuple(changes)
+
+
+def diff(old: Iterable[Entry], new: Iterable[Entry]) -> Iterator[Change]:
+    """Merge join two sorted entry streams and yield the changes."""
+    olds, news = _ordered(old, 'old'), _ordered(new, 'new')
+    old_entry, new_entry = next(olds, None), next(news, None)
+    while old_entry is not None or new_entry is not None:
+        if new_entry is None or (old_entry is not None and old_entry.sort_key < new_entry.sort_key):
+            yield Change(old_entry.repository, old_entry.path, (REMOVED,), old_entry, None)
+            old_entry = next(olds, None)
+        elif old_entry is None or new_entry.sort_key < old_entry.sort_key:
+            yield Change(new_entry.repository, new_entry.path, (ADDED,), None, new_entry)
+            new_entry = next(news, None)
+        else:
+            changes = compare(old_entry, new_entry)
+            if changes:
+                yield Change(new_entry.repository, new_entry.path, changes, old_entry, new_entry)
+            old_entry, new_entry = next(olds, None), next(news, None)
+
+
+def parent_folder(path: str) -> str:
+    """The folder path containing path (the root folder is the empty path)."""
+    head, _, _ = path.rstrip('/').rpartition('/')
+    return f"{head}/" if head else ''
+
+
+def rollup(changes: Iterable[Change]) -> Tuple[Dict[str, Counter], Dict[Tuple[str, str], Counter]]:
+    """Count the changes per repository and per containing folder."""
+    per_repository: Dict[str, Counter] = collections.defaultdict(collections.Counter)
+    per_folder: Dict[Tuple[str, str], Counter] = collections.defaultdict(collections.Counter)
+    for change in changes:
+        per_repository[change.repository].update(change.changes)
+        per_folder[(change.repository, parent_folder(change.path))].update(change.changes)
+    return dict(per_repository), dict(per_folder)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Print the changes from OLD to NEW and the per repository rollup."""
+    argv = argv if argv else sys.argv[1:]
+    if len(argv) != 2:
+        print("ERROR usage: OLD NEW (each .snap, .ndjson or .json)")
+        return 2
+    per_repository: Dict[str, Counter] = collections.defaultdict(collections.Counter)
+    for change in diff(open_entries(argv[0]), open_entries(argv[1])):
+        print(f"{','.join(change.changes)} {change.repository} {change.path}")
+        per_repository[change.repository].update(change.changes)
+    for repository, counts in per_repository.items():
+        print(f"{repository}: {dict(counts)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
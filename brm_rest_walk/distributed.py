@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Distribute the walk across worker processes or hosts sharing a SQLite frontier store.
+
+The coordinator seeds the store with the repository roots. Every folder in the frontier is owned by
+a worker chosen by consistent hashing of its repository and leading path segments, so subtrees stay
+together. Idle workers steal pending folders from the worker with the longest backlog and claims of
+crashed workers expire after a lease. With the subtree costs of an earlier walk, workers claim the
+most expensive folders first and unknown folders expect an equal share of their parent. Failed folder
+requests are due again after the backoff of their error class (see retry) and end up failed in the
+store as dead letters once the class runs out of attempts. Each worker appends its folder records to
+its own NDJSON file and merge_outputs() assembles those into the nested tree layout of trial().
+"""
+import bisect
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+
+from brm_rest_walk.brm_rest_walk import (
+    COST,
+    DEAD_LETTERS,
+    EDGE,
+    FAILED as FAILED_MARKER,
+    RETRIES,
+    SECONDS,
+    ENCODING,
+    TreeWalker,
+    brm_api_root,
+    brm_filters,
+    brm_history,
+    brm_server,
+    brm_token,
+    brm_user,
+    dump,
+    folder_cost,
+    load_tree,
+    naive_timestamp,
+    subtree_costs,
+)
+from brm_rest_walk.filters import PathFilter, load_rules, path_filter_for, segments
+from brm_rest_walk.retry import DEAD_LETTERS_FILE, POLICIES, DeadLetter, RetryPolicy, classify, retry_after, write_dead_letters
+
+PENDING, CLAIMED, DONE, FAILED = 'pending', 'claimed', 'done', 'failed'
+
+PREFIX_DEPTH = 2  # Leading path segments that decide the owner of a folder
+VIRTUAL_NODES = 64  # Points per worker on the hash ring
+LEASE_SECONDS = 300.0  # Claims older than this are considered abandoned
+IDLE_SLEEP_SECONDS = 0.5
+
+REPOSITORY = 'repository'
+KEY = 'key'
+PATH = 'path'
+URL = 'url'
+LEAVES = 'leaves'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    repository TEXT NOT NULL,
+    key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    worker TEXT,
+    claimed_at REAL,
+    due REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error_class TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS frontier_owner_state ON frontier (owner, state, priority);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY
+);
+"""
+
+
+def _point(text: str) -> int:
+    """Stable position on the hash ring (md5 is used for spread, not security)."""
+    return int.from_bytes(hashlib.md5(text.encode(ENCODING)).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hashing of path prefixes onto worker ids."""
+
+    def __init__(self, workers: Sequence[str], virtual_nodes: int = VIRTUAL_NODES):
+        if not workers:
+            raise ValueError("Need at least one worker for the hash ring")
+        self._ring = sorted((_point(f"{worker}#{n}"), worker) for worker in workers for n in range(virtual_nodes))
+        self._points = [point for point, _ in self._ring]
+
+    def owner(self, repository: str, path: str, prefix_depth: int = PREFIX_DEPTH) -> str:
+        """The worker owning the folder given by repository and path."""
+        prefix = '/'.join(segments(path)[:prefix_depth])
+        index = bisect.bisect(self._points, _point(f"{repository}|{prefix}")) % len(self._ring)
+        return self._ring[index][1]
+
+
+class WorkQueue:
+    """Shared frontier of folder urls in SQLite with claims, leases, work stealing and retries."""
+
+    def __init__(self, store_path: str, lease_seconds: float = LEASE_SECONDS, policies: Optional[Dict[str, RetryPolicy]] = None):
+        self._connection = sqlite3.connect(store_path, timeout=60.0, isolation_level=None)
+        self._connection.executescript(SCHEMA)
+        self._lease = lease_seconds
+        self.policies = {**POLICIES, **(policies if policies else {})}
+        self._ring: Optional[HashRing] = None
+
+    def close(self):
+        self._connection.close()
+
+    def workers(self) -> List[str]:
+        return [row[0] for row in self._connection.execute("SELECT worker FROM workers ORDER BY worker")]
+
+    def ring(self) -> HashRing:
+        if self._ring is None:
+            self._ring = HashRing(self.workers())
+        return self._ring
+
+    def register(self, workers: Sequence[str]):
+        """Record the worker ids the frontier is partitioned over (before seeding)."""
+        self._connection.executemany("INSERT OR IGNORE INTO workers (worker) VALUES (?)", [(w,) for w in workers])
+        self._ring = None
+
+    def push(self, items: Iterable[Tuple]):
+        """Add (url, repository, key, path[, priority]) folders unless already known - the url is the identity."""
+        ring = self.ring()
+        rows = [(url, repository, key, path, ring.owner(repository, path), priority[0] if priority else 0.0, PENDING) for url, repository, key, path, *priority in items]
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO frontier (url, repository, key, path, owner, priority, state) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def claim(self, worker: str) -> Optional[Tuple[str, str, str, str, float]]:
+        """Claim the most expensive due folder owned by the worker, else steal from the longest backlog.
+
+        Returns (url, repository, key, path, priority) or None if nothing is due right now.
+        """
+        now = time.time()
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute(
+                "UPDATE frontier SET state = ?, worker = NULL, claimed_at = NULL WHERE state = ? AND claimed_at < ?",
+                (PENDING, CLAIMED, now - self._lease),
+            )
+            row = cursor.execute(
+                "SELECT url, repository, key, path, priority FROM frontier WHERE owner = ? AND state = ? AND due <= ? ORDER BY priority DESC LIMIT 1",
+                (worker, PENDING, now),
+            ).fetchone()
+            if row is None:
+                victim = cursor.execute(
+                    "SELECT owner FROM frontier WHERE state = ? AND due <= ? GROUP BY owner ORDER BY COUNT(*) DESC LIMIT 1", (PENDING, now)
+                ).fetchone()
+                if victim is not None:
+                    row = cursor.execute(
+                        "SELECT url, repository, key, path, priority FROM frontier WHERE owner = ? AND state = ? AND due <= ? ORDER BY priority DESC, rowid DESC LIMIT 1",
+                        (victim[0], PENDING, now),
+                    ).fetchone()
+            if row is not None:
+                cursor.execute("UPDATE frontier SET state = ?, worker = ?, claimed_at = ? WHERE url = ?", (CLAIMED, worker, now, row[0]))
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        return row
+
+    def complete(self, url: str, children: Iterable[Tuple]):
+        """Mark the folder done and publish its child folders in one transaction."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.push(children)
+            self._connection.execute("UPDATE frontier SET state = ? WHERE url = ?", (DONE, url))
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def fail(self, url: str, error: BaseException) -> bool:
+        """Release the folder for another attempt after its backoff and answer True, or mark it failed and answer False."""
+        error_class = classify(error)
+        policy = self.policies[error_class]
+        detail = f"{type(error).__name__}: {error}"
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            attempts = self._connection.execute("SELECT attempts FROM frontier WHERE url = ?", (url,)).fetchone()[0] + 1
+            retry = attempts < policy.attempts
+            due = time.time() + min(policy.max_seconds, max(policy.delay(attempts), retry_after(error) or 0.0)) if retry else 0.0
+            self._connection.execute(
+                "UPDATE frontier SET state = ?, worker = NULL, claimed_at = NULL, due = ?, attempts = ?, error_class = ?, error = ? WHERE url = ?",
+                (PENDING if retry else FAILED, due, attempts, error_class, detail, url),
+            )
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        return retry
+
+    def dead_letters(self) -> List[DeadLetter]:
+        """Folders given up on."""
+        rows = self._connection.execute("SELECT url, path, error_class, error, attempts FROM frontier WHERE state = ? ORDER BY rowid", (FAILED,))
+        return [DeadLetter(*row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {PENDING: 0, CLAIMED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(self._connection.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state")))
+        return counts
+
+    def finished(self) -> bool:
+        counts = self.counts()
+        return not counts[PENDING] and not counts[CLAIMED]
+
+
+def seed(queue: WorkQueue, repositories: Dict[str, Dict], workers: Sequence[str], history: Optional[Dict] = None):
+    """Coordinator: partition over the workers and enqueue the repository roots (by historical cost)."""
+    history = history if history else {}
+    queue.register(workers)
+    queue.push(
+        (repository["url"], repository["url"], key, '', history.get((repository["url"], ''), {}).get(SECONDS, 0.0))
+        for key, repository in repositories.items()
+    )
+
+
+def run_worker(
+    walker: TreeWalker,
+    queue: WorkQueue,
+    worker: str,
+    output_path: str,
+    filter_for: Optional[Callable[[str], PathFilter]] = None,
+    idle_sleep: float = IDLE_SLEEP_SECONDS,
+    history: Optional[Dict] = None,
+) -> int:
+    """Process folders from the shared frontier until it is exhausted and return the count processed."""
+    processed = 0
+    history = history if history else {}
+    filters: Dict[str, PathFilter] = {}
+    with open(output_path, "at", encoding=ENCODING) as handle:
+        while True:
+            item = queue.claim(worker)
+            if item is None:
+                if queue.finished():
+                    return processed
+                time.sleep(idle_sleep)
+                continue
+            url, repository, key, path, priority = item
+            if filter_for and key not in filters:
+                filters[key] = filter_for(key)
+            started = time.perf_counter()
+            try:
+                hrefs, leaves, folders = walker.expand(url, path, filters.get(key))
+            except requests.RequestException as error:
+                if queue.fail(url, error):
+                    walker.stats[RETRIES] += 1
+                else:
+                    walker.stats[DEAD_LETTERS] += 1
+                    handle.write(json.dumps({REPOSITORY: repository, KEY: key, PATH: path, URL: url, FAILED_MARKER: classify(error)}) + '\n')
+                    handle.flush()
+                continue
+            cost = folder_cost(hrefs, time.perf_counter() - started)
+            record = {REPOSITORY: repository, KEY: key, PATH: path, URL: url, EDGE: hrefs, COST: cost, LEAVES: leaves}
+            handle.write(json.dumps(record) + '\n')
+            handle.flush()
+            share = priority / max(1, len(folders))
+            queue.complete(url, (
+                (child_url, repository, key, child_path, history.get((repository, child_path), {}).get(SECONDS, share))
+                for _, child_url, child_path in folders
+            ))
+            processed += 1
+
+
+def merge_outputs(output_paths: Iterable[str]) -> Dict[int, Dict[str, Any]]:
+    """Assemble the per worker folder records into the nested {1: {repository url: tree}} layout."""
+    level = 1
+    tree: Dict[int, Dict[str, Any]] = {level: {}}
+    for output_path in output_paths:
+        with open(output_path, "rt", encoding=ENCODING) as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                branch = tree[level].setdefault(record[REPOSITORY], {})
+                for segment in segments(record[PATH]):
+                    branch = branch.setdefault(f"{segment}/", {})
+                if FAILED_MARKER in record:
+                    branch[FAILED_MARKER] = record[FAILED_MARKER]
+                    continue
+                branch[EDGE] = record[EDGE]
+                if COST in record:
+                    branch[COST] = record[COST]
+                branch.update(record[LEAVES])
+    return tree
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Drive one role: seed STORE WORKER..., work STORE WORKER, or merge STORE OUTPUT..."""
+    argv = argv if argv else sys.argv[1:]
+    if len(argv) < 3 or argv[0] not in ('seed', 'work', 'merge'):
+        print("ERROR usage: seed STORE WORKER... | work STORE WORKER | merge STORE OUTPUT...")
+        return 2
+    role, store_path, rest = argv[0], argv[1], argv[2:]
+    queue = WorkQueue(store_path)
+    try:
+        if role == 'merge':
+            dump(merge_outputs(rest))
+            letters = queue.dead_letters()
+            letters and print(f"Gave up on {write_dead_letters(DEAD_LETTERS_FILE, letters)} folders listed in {DEAD_LETTERS_FILE}.")
+            return 0
+        walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+        history = subtree_costs(load_tree(brm_history)) if brm_history else {}
+        if role == 'seed':
+            seed(queue, walker.repository_map(), rest, history)
+            print(f"Seeded {len(walker.repositories)} repositories for workers {rest} at {naive_timestamp()}")
+            return 0
+        worker = rest[0]
+        rules = load_rules(brm_filters)
+        processed = run_worker(walker, queue, worker, f"{store_path}.{worker}.ndjson", lambda key: path_filter_for(rules, key), history=history)
+        print(f"Worker {worker} processed {processed} folders with {walker.stats} at {naive_timestamp()}")
+        return 0
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Index leaves by content across repositories to find duplicate copies and the storage they waste.
+
+Leaves are grouped by their autoindex size first and only leaves sharing a size cost a digest request.
+One agreed digest (sha256 by default) keys the content, so copies described by different digests
+(like npm metadata sha1 and sidecar sha256) still meet. Where the listing or package metadata already
+carries the agreed digest, no request is needed.
+Autoindex sizes are rounded to their unit, so a size bucket may hold different contents but never
+splits equal ones.
+"""
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import requests
+
+from brm_rest_walk.brm_rest_walk import (
+    KNOWN_DIGESTS,
+    LEAF,
+    SHA256,
+    Entry,
+    TreeWalker,
+    brm_api_root,
+    brm_filters,
+    brm_server,
+    brm_token,
+    brm_user,
+    digest_value,
+)
+from brm_rest_walk.filters import load_rules, path_filter_for
+
+INDEX_STATS = (
+    LEAVES := 'leaves',
+    DIGEST_REQUESTS := 'digest_requests',
+    UNRESOLVED := 'unresolved',
+)
+
+
+class DuplicateGroup(NamedTuple):
+    """Copies of one content - the first copy (by repository and path) is the one kept."""
+
+    digest: str
+    value: str
+    size: Optional[int]
+    copies: List[Entry]
+
+    @property
+    def reclaimable(self):
+        return (self.size or 0) * (len(self.copies) - 1)
+
+
+class RepositoryWaste(NamedTuple):
+    """Duplicate copies in one repository beyond the kept ones and the bytes they hold."""
+
+    repository: str
+    copies: int
+    reclaimable: int
+
+
+class DuplicateIndex:
+    """Content index fed with entries during a walk (not thread safe)."""
+
+    def __init__(self, walker: Optional[TreeWalker] = None, digest: str = SHA256):
+        if digest not in KNOWN_DIGESTS:
+            raise ValueError(f"Unknown digest ({digest}) - use one of {KNOWN_DIGESTS}")
+        self._walker = walker
+        self.digest = digest
+        self._by_size: Dict[Optional[int], List[Entry]] = defaultdict(list)
+        self._by_content: Dict[str, List[Entry]] = defaultdict(list)
+        self.stats = {stat: 0 for stat in INDEX_STATS}
+
+    def _key(self, entry: Entry) -> str:
+        """Known or fetched agreed digest of the leaf ('' when it cannot be had)."""
+        value = digest_value(entry.digests.get(self.digest))
+        if value or self._walker is None:
+            return value
+        self.stats[DIGEST_REQUESTS] += 1
+        try:
+            return self._walker.sidecar(entry.url, self.digest)
+        except requests.RequestException:
+            return ''
+
+    def _resolve(self, entry: Entry):
+        key = self._key(entry)
+        if not key:
+            self.stats[UNRESOLVED] += 1
+            return
+        self._by_content[key].append(entry)
+
+    def add(self, entry: Entry):
+        """Index the leaf (other entries are ignored) - digests are only needed once its size collides."""
+        if entry.kind != LEAF:
+            return
+        self.stats[LEAVES] += 1
+        bucket = self._by_size[entry.size]
+        bucket.append(entry)
+        if len(bucket) == 2:
+            self._resolve(bucket[0])
+        if len(bucket) >= 2:
+            self._resolve(entry)
+
+    def update(self, entries: Iterable[Entry]) -> 'DuplicateIndex':
+        for entry in entries:
+            self.add(entry)
+        return self
+
+    def groups(self) -> Iterator[DuplicateGroup]:
+        """Contents held by more than one leaf, most reclaimable bytes first."""
+        found = []
+        for value, copies in self._by_content.items():
+            if len(copies) > 1:
+                copies = sorted(copies, key=lambda entry: entry.sort_key)
+                found.append(DuplicateGroup(self.digest, value, copies[0].size, copies))
+        yield from sorted(found, key=lambda group: (-group.reclaimable, group.digest, group.value))
+
+    def report(self) -> List[RepositoryWaste]:
+        """Per repository count and bytes of the copies beyond the kept ones, most wasteful first."""
+        copies: Dict[str, int] = defaultdict(int)
+        reclaimable: Dict[str, int] = defaultdict(int)
+        for group in self.groups():
+            for entry in group.copies[1:]:
+                copies[entry.repository] += 1
+                reclaimable[entry.repository] += group.size or 0
+        return sorted(
+            (RepositoryWaste(repository, count, reclaimable[repository]) for repository, count in copies.items()),
+            key=lambda waste: (-waste.reclaimable, waste.repository),
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Walk all (or the given) repositories and report duplicate contents and reclaimable bytes: [KEY ...]."""
+    argv = argv if argv else sys.argv[1:]
+    if any(arg.startswith('-') for arg in argv):
+        print("ERROR usage: [KEY ...]")
+        return 2
+    walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+    repositories = {key: repository for key, repository in walker.repository_map().items() if not argv or key in argv}
+    rules = load_rules(brm_filters)
+    index = DuplicateIndex(walker).update(walker.iter_entries(repositories, lambda key: path_filter_for(rules, key)))
+    groups = list(index.groups())
+    for group in groups:
+        print(f"DUP {group.digest}:{group.value} {group.size} bytes x{len(group.copies)} {' '.join(entry.url for entry in group.copies)}")
+    for waste in index.report():
+        print(f"WASTE {waste.repository} {waste.copies} copies {waste.reclaimable} bytes")
+    print(f"Indexed {index.stats[LEAVES]} leaves with {index.stats[DIGEST_REQUESTS]} digest requests: {len(groups)} duplicate groups, {sum(group.reclaimable for group in groups)} reclaimable bytes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
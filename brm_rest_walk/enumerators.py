@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Enumerate repositories via package type specific metadata instead of requesting every autoindex folder.
+
+Strategies are registered per package type (as recorded by repository_map) and yield the entries below
+the repository root with fewer requests or in a more useful order:
+
+    npm    one package document per package lists all tarballs with sha1 (instead of two folder pages)
+    pypi   the simple index and one project page per project list all files with sha256
+
+Maven has no strategy: maven-metadata.xml lists the versions of an artifact but not their files, so
+every version folder would still be requested and the metadata only add requests to the autoindex walk.
+
+Units with missing or inconsistent metadata fall back to the autoindex walk (counted in the walk stats).
+
+Trade-off: npm package documents and simple index pages carry no file sizes (npm only has the unpacked
+size), so their leaves have size None where the autoindex walk has one. Byte totals of estimates miss
+them, duplicate detection puts them all in one unknown size bucket (each costs a digest request), and a diff against
+an autoindex walked snapshot reports them resized. Use the autoindex walk where sizes matter.
+"""
+import datetime as dti
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Set
+from urllib.parse import quote, urljoin
+
+from bs4 import BeautifulSoup
+import requests
+
+from brm_rest_walk.brm_rest_walk import (
+    FOLDER,
+    KNOWN_DIGESTS,
+    LEAF,
+    METADATA_FALLBACKS,
+    NODE,
+    META,
+    SHA1,
+    SKIPPED_LEAVES,
+    Entry,
+    TreeWalker,
+    brm_api_root,
+    brm_filters,
+    brm_server,
+    brm_token,
+    brm_user,
+    join_url,
+    leaf_entry,
+)
+from brm_rest_walk.diff import write_ndjson
+from brm_rest_walk.filters import PathFilter, load_rules, path_filter_for
+
+NPM_TARBALLS = '-/'
+PYPI_SIMPLE = 'simple/'
+
+Strategy = Callable[[TreeWalker, str, Optional[PathFilter]], Iterator[Entry]]
+STRATEGIES: Dict[str, Strategy] = {}
+METADATA_ERRORS = (ValueError, requests.RequestException)
+
+
+class MetadataError(ValueError):
+    """Metadata missing or inconsistent with the autoindex."""
+
+
+def strategy(*package_types: str):
+    """Register the decorated function as the enumerator of the package types (case insensitive)."""
+    def register(function: Strategy) -> Strategy:
+        for package_type in package_types:
+            STRATEGIES[package_type.lower()] = function
+        return function
+    return register
+
+
+def strategy_for(package_type: Optional[str]) -> Optional[Strategy]:
+    return STRATEGIES.get(package_type.lower()) if package_type else None
+
+
+def enumerate_entries(
+    walker: TreeWalker,
+    repositories: Dict[str, Dict],
+    filter_for: Optional[Callable[[str], PathFilter]] = None,
+) -> Iterator[Entry]:
+    """Lazily yield the entries of the repositories (like iter_entries) using the strategy of their package type."""
+    walker.visited.clear()
+    for key, repository in repositories.items():
+        url = repository["url"]
+        path_filter = filter_for(key) if filter_for else None
+        walker.visited.add(url)
+        yield Entry(url, '', FOLDER)
+        fast = strategy_for(repository.get("package_type"))
+        yield from fast(walker, url, path_filter) if fast else walker.iter_below(url, url, '', path_filter)
+
+
+def iso_timestamp(text) -> Optional[int]:
+    """Convert ISO 8601 timestamps like 2020-08-22T09:53:00.000Z to seconds since the epoch (None if unparseable)."""
+    try:
+        stamp = dti.datetime.fromisoformat(str(text).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return int((stamp if stamp.tzinfo else stamp.replace(tzinfo=dti.timezone.utc)).timestamp())
+
+
+def anchors(html) -> List[str]:
+    """All link targets of the page (relative parent links included)."""
+    return [tag['href'] for tag in BeautifulSoup(html, "html.parser").find_all("a", href=True)]
+
+
+def _leaves(repository_url, folder_path, leaves) -> Iterator[Entry]:
+    for relative_link, leaf in leaves.items():
+        yield leaf_entry(repository_url, f"{folder_path}{relative_link}", leaf[NODE][META])
+
+
+def _admitted(walker: TreeWalker, path_filter: Optional[PathFilter], path: str) -> bool:
+    if path_filter and not path_filter.admits(path):
+        walker.stats[SKIPPED_LEAVES] += 1
+        return False
+    return True
+
+
+def npm_package(walker: TreeWalker, repository_url: str, package_path: str, path_filter: Optional[PathFilter] = None) -> List[Entry]:
+    """Entries below the package folder from the package document (MetadataError if unusable)."""
+    name = package_path.rstrip('/')
+    document = walker.document(join_url(repository_url, quote(name, safe='@')))
+    versions = document.get('versions') if isinstance(document, dict) else None
+    if not isinstance(versions, dict) or not versions or document.get('name', name) != name:
+        raise MetadataError(f"Package document of {name} lists no versions or another package")
+    times = document.get('time') if isinstance(document.get('time'), dict) else {}
+    entries = [Entry(repository_url, f"{package_path}{NPM_TARBALLS}", FOLDER)]
+    for version, manifest in versions.items():
+        dist = manifest.get('dist') if isinstance(manifest, dict) else None
+        tarball = str(dist.get('tarball', '')) if isinstance(dist, dict) else ''
+        file_name = tarball.rsplit('/', 1)[-1]
+        if not file_name or not tarball.endswith(f"{name}/{NPM_TARBALLS}{file_name}"):
+            raise MetadataError(f"Tarball of {name}@{version} not at {name}/{NPM_TARBALLS} ({tarball})")
+        path = f"{package_path}{NPM_TARBALLS}{file_name}"
+        if _admitted(walker, path_filter, path):
+            digests = {SHA1: dist['shasum']} if dist.get('shasum') else {}
+            entries.append(Entry(repository_url, path, LEAF, None, iso_timestamp(times.get(version)), digests))
+    return entries
+
+
+@strategy('npm')
+def npm_entries(walker: TreeWalker, repository_url: str, path_filter: Optional[PathFilter] = None) -> Iterator[Entry]:
+    """Package folders (below scope folders like @scope/) are enumerated from their package documents."""
+    stack = [(repository_url, '')]
+    while stack:
+        folder_url, folder_path = stack.pop()
+        _, leaves, folders = walker.expand(folder_url, folder_path, path_filter)
+        yield from _leaves(repository_url, folder_path, leaves)
+        for relative_link, child_url, child_path in folders:
+            yield Entry(repository_url, child_path, FOLDER)
+            if not folder_path and relative_link.startswith('@'):
+                stack.append((child_url, child_path))
+                continue
+            try:
+                entries: Iterator[Entry] = iter(npm_package(walker, repository_url, child_path, path_filter))
+            except METADATA_ERRORS:
+                walker.stats[METADATA_FALLBACKS] += 1
+                entries = walker.iter_below(repository_url, child_url, child_path, path_filter)
+            yield from entries
+
+
+def pypi_project(repository_url: str, project_url: str, html: str) -> List[Entry]:
+    """Leaves of one simple index project page (MetadataError for files outside the repository)."""
+    prefix = f"{repository_url.rstrip('/')}/"
+    entries = []
+    for href in anchors(html):
+        url, _, fragment = urljoin(project_url, href).partition('#')
+        if not url.startswith(prefix) or url.endswith('/'):
+            raise MetadataError(f"Simple index file outside the repository ({url})")
+        digest, _, value = fragment.partition('=')
+        entries.append(Entry(repository_url, url[len(prefix):], LEAF, digests={digest: value} if digest in KNOWN_DIGESTS and value else {}))
+    return entries
+
+
+@strategy('pypi')
+def pypi_entries(walker: TreeWalker, repository_url: str, path_filter: Optional[PathFilter] = None) -> Iterator[Entry]:
+    """Files are enumerated from the simple index, their folders are derived from the file paths."""
+    simple_url = join_url(repository_url, PYPI_SIMPLE)
+    seen: Set[str] = set()
+    try:
+        for project in anchors(walker.text(simple_url)):
+            project_url = urljoin(simple_url, project)
+            for entry in pypi_project(repository_url, project_url, walker.text(project_url)):
+                parts = entry.path.split('/')[:-1]
+                folders = [f"{'/'.join(parts[:depth])}/" for depth in range(1, len(parts) + 1)]
+                if path_filter and any(path_filter.prunes(folder) for folder in folders) or not _admitted(walker, path_filter, entry.path):
+                    continue
+                for folder in folders:
+                    if folder not in seen:
+                        seen.add(folder)
+                        yield Entry(repository_url, folder, FOLDER)
+                seen.add(entry.path)
+                yield entry
+    except METADATA_ERRORS:
+        walker.stats[METADATA_FALLBACKS] += 1
+        yield from (entry for entry in walker.iter_below(repository_url, repository_url, '', path_filter) if entry.path not in seen)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Enumerate all (or the given) repositories by package type into an NDJSON file: OUTPUT.ndjson [KEY ...]."""
+    argv = argv if argv else sys.argv[1:]
+    if not argv or not argv[0].endswith('.ndjson'):
+        print("ERROR usage: OUTPUT.ndjson [KEY ...]")
+        return 2
+    walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+    repositories = {key: repository for key, repository in walker.repository_map().items() if not argv[1:] or key in argv[1:]}
+    rules = load_rules(brm_filters)
+    count = write_ndjson(argv[0], enumerate_entries(walker, repositories, lambda key: path_filter_for(rules, key)))
+    print(f"Enumerated {count} entries of {len(repositories)} repositories with stats {walker.stats}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
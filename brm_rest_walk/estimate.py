@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Estimate folder, artifact and byte counts of a repository from random root to leaf probes.
+
+Knuth's estimator follows one uniformly chosen subfolder per level and weights what it sees on a level
+by the product of the branching factors above it. Every probe is an unbiased estimate of the totals, so
+the mean over a fixed request budget converges to the truth and the spread gives a confidence interval.
+Pages seen by earlier probes are reused, so the upper levels cost their requests only once.
+"""
+import math
+import random
+import sys
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from brm_rest_walk.brm_rest_walk import (
+    META,
+    NODE,
+    REQUESTS,
+    TreeWalker,
+    brm_api_root,
+    brm_server,
+    brm_token,
+    brm_user,
+    size_bytes,
+)
+from brm_rest_walk.filters import PathFilter
+
+Z_95 = 1.96
+
+ESTIMATES = (FOLDERS := 'folders', LEAVES := 'leaves', BYTES := 'bytes')
+PROBES = 'probes'
+REQUESTS_USED = 'requests'
+
+
+class Estimate(NamedTuple):
+    """Mean of the probe estimates with the bounds of its confidence interval."""
+
+    mean: float
+    low: float
+    high: float
+
+
+def summarize(samples: List[float], z: float = Z_95) -> Estimate:
+    """Normal approximation interval of the sample mean (bounded below by zero)."""
+    if not samples:
+        return Estimate(0.0, 0.0, math.inf)
+    n = len(samples)
+    mean = sum(samples) / n
+    if n == 1:
+        return Estimate(mean, 0.0, math.inf)
+    variance = sum((sample - mean) ** 2 for sample in samples) / (n - 1)
+    half_width = z * math.sqrt(variance / n)
+    return Estimate(mean, max(0.0, mean - half_width), mean + half_width)
+
+
+def leaf_bytes(leaves: Dict) -> int:
+    """Sum of the autoindex sizes of the leaves (unknown sizes count as zero)."""
+    return sum(size_bytes(leaf[NODE][META].get('h_size'), leaf[NODE][META].get('h_unit')) or 0 for leaf in leaves.values())
+
+
+def probe(
+    walker: TreeWalker,
+    url: str,
+    pages: Dict,
+    rng: random.Random,
+    path_filter: Optional[PathFilter] = None,
+    unseen: Optional[Set[str]] = None,
+) -> Dict[str, float]:
+    """One random descent returning the Knuth estimates of the totals below url.
+
+    Unseen (if given) is kept as the set of child folder urls not yet in pages.
+    """
+    totals = {estimate: 0.0 for estimate in ESTIMATES}
+    weight, folder_url, folder_path = 1.0, url, ''
+    while True:
+        if folder_url not in pages:
+            pages[folder_url] = walker.expand(folder_url, folder_path, path_filter)
+            if unseen is not None:
+                unseen.discard(folder_url)
+                unseen.update(child_url for _, child_url, _ in pages[folder_url][2] if child_url not in pages)
+        _, leaves, folders = pages[folder_url]
+        totals[FOLDERS] += weight
+        totals[LEAVES] += weight * len(leaves)
+        totals[BYTES] += weight * leaf_bytes(leaves)
+        if not folders:
+            return totals
+        weight *= len(folders)
+        _, folder_url, folder_path = rng.choice(folders)
+
+
+def estimate(
+    walker: TreeWalker,
+    url: str,
+    max_requests: int,
+    path_filter: Optional[PathFilter] = None,
+    rng: Optional[random.Random] = None,
+    z: float = Z_95,
+) -> Dict:
+    """Probe until the request budget is spent and summarize folders, leaves and bytes below url.
+
+    The folders estimate is also the number of page requests a full walk would cost.
+    """
+    rng = rng if rng else random.Random()
+    walker.visited.clear()
+    pages: Dict = {}
+    unseen = {url}  # Once empty every folder reachable is seen and further probes cost nothing new
+    samples: Dict[str, List[float]] = {estimate: [] for estimate in ESTIMATES}
+    start = walker.stats[REQUESTS]
+    while True:
+        for name, value in probe(walker, url, pages, rng, path_filter, unseen).items():
+            samples[name].append(value)
+        if walker.stats[REQUESTS] - start >= max_requests:
+            break
+        if not unseen:
+            exact = _exact(pages)
+            return {
+                **{name: Estimate(value, value, value) for name, value in exact.items()},
+                PROBES: len(samples[FOLDERS]),
+                REQUESTS_USED: walker.stats[REQUESTS] - start,
+            }
+    return {
+        **{name: summarize(values, z) for name, values in samples.items()},
+        PROBES: len(samples[FOLDERS]),
+        REQUESTS_USED: walker.stats[REQUESTS] - start,
+    }
+
+
+def _exact(pages: Dict) -> Dict[str, float]:
+    """Totals over a completely seen tree."""
+    totals = {estimate: 0.0 for estimate in ESTIMATES}
+    for _, leaves, _ in pages.values():
+        totals[FOLDERS] += 1
+        totals[LEAVES] += len(leaves)
+        totals[BYTES] += leaf_bytes(leaves)
+    return totals
+
+
+def main(argv=None):
+    """Estimate all interesting repositories within MAX_REQUESTS page requests each."""
+    argv = argv if argv else sys.argv[1:]
+    if len(argv) != 1 or not argv[0].isdigit():
+        print("ERROR usage: MAX_REQUESTS")
+        return 2
+    max_requests = int(argv[0])
+    walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+    for key, repository in walker.repository_map().items():
+        result = estimate(walker, repository["url"], max_requests)
+        print(f"{key} probes={result[PROBES]} requests={result[REQUESTS_USED]}")
+        for name in ESTIMATES:
+            mean, low, high = result[name]
+            print(f"  {name}: {mean:.0f} [{low:.0f}, {high:.0f}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Include and exclude rules compiled into a prefix aware matcher to prune the walk before descending.
+
+Rules are globs by default (`*` and `?` stay within one path segment, `**` spans any number of segments,
+a pattern without a slash matches at any depth, a leading slash anchors explicitly) or regular expressions when prefixed with `re:`.
+Paths are relative to the repository root and folders carry a trailing slash like in the autoindex pages.
+"""
+import fnmatch
+import json
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ENCODING = "utf-8"
+
+REGEX_PREFIX = 're:'
+DEEP = '**'
+SEP = '/'
+
+INCLUDE = 'include'
+EXCLUDE = 'exclude'
+REPOSITORIES = 'repositories'
+
+
+def segments(path: str) -> List[str]:
+    """Split a relative path into its non empty segments."""
+    return [segment for segment in path.split(SEP) if segment]
+
+
+def compile_glob(pattern: str) -> Tuple:
+    """Compile a glob into a tuple of segment matchers keeping DEEP as marker."""
+    pattern = pattern.strip().rstrip(SEP)
+    if SEP not in pattern and pattern != DEEP:
+        pattern = f"{DEEP}{SEP}{pattern}"
+    return tuple(DEEP if segment == DEEP else re.compile(fnmatch.translate(segment)) for segment in segments(pattern))
+
+
+def glob_match(compiled: Tuple, parts: Sequence[str]) -> bool:
+    """Full match of the compiled glob against the path segments (DEEP matches zero or more segments)."""
+    if not compiled:
+        return not parts
+    head, tail = compiled[0], compiled[1:]
+    if head == DEEP:
+        return any(glob_match(tail, parts[k:]) for k in range(len(parts) + 1))
+    return bool(parts) and bool(head.match(parts[0])) and glob_match(tail, parts[1:])
+
+
+def glob_may_match_below(compiled: Tuple, parts: Sequence[str]) -> bool:
+    """Decide if any path below the folder given by parts may still match the compiled glob."""
+    if not parts:
+        return True
+    if not compiled:
+        return False
+    head, tail = compiled[0], compiled[1:]
+    if head == DEEP:
+        return True
+    return bool(head.match(parts[0])) and glob_may_match_below(tail, parts[1:])
+
+
+def _compile_rules(patterns: Optional[Sequence[str]]) -> Tuple[List[Tuple], List]:
+    """Separate and compile the glob and regex patterns."""
+    globs, regexes = [], []
+    for pattern in patterns or []:
+        if pattern.startswith(REGEX_PREFIX):
+            regexes.append(re.compile(pattern[len(REGEX_PREFIX):]))
+        else:
+            globs.append(compile_glob(pattern))
+    return globs, regexes
+
+
+class PathFilter:
+    """Compiled include and exclude rules answering prune (folders) and admit (leaves) questions."""
+
+    def __init__(self, include: Optional[Sequence[str]] = None, exclude: Optional[Sequence[str]] = None):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self._include_globs, self._include_regexes = _compile_rules(self.include)
+        self._exclude_globs, self._exclude_regexes = _compile_rules(self.exclude)
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    def excluded(self, path: str) -> bool:
+        """Any exclude rule matching the path removes it (and for folders everything below)."""
+        parts = segments(path)
+        return any(glob_match(g, parts) for g in self._exclude_globs) or any(r.search(path) for r in self._exclude_regexes)
+
+    def included(self, path: str) -> bool:
+        """Without include rules everything is included, else a rule must match the path or one of its ancestors."""
+        if not self.include:
+            return True
+        parts = segments(path)
+        if any(glob_match(g, parts[:k]) for g in self._include_globs for k in range(1, len(parts) + 1)):
+            return True
+        return any(r.search(path) for r in self._include_regexes)
+
+    def prunes(self, folder_path: str) -> bool:
+        """Decide before any request if the folder subtree can be skipped as a whole.
+
+        Regex include rules cannot be evaluated on prefixes so their presence keeps folders open.
+        """
+        if self.excluded(folder_path):
+            return True
+        if not self.include or self._include_regexes:
+            return False
+        parts = segments(folder_path)
+        return not self.included(folder_path) and not any(glob_may_match_below(g, parts) for g in self._include_globs)
+
+    def admits(self, leaf_path: str) -> bool:
+        """Leaves must be included and not excluded."""
+        return self.included(leaf_path) and not self.excluded(leaf_path)
+
+
+def load_rules(path: str) -> Dict:
+    """Load the global and per repository rules from a JSON file like
+
+        {"include": [...], "exclude": [...], "repositories": {"key": {"include": [...], "exclude": [...]}}}
+    """
+    if not path:
+        return {}
+    with open(path, "rt", encoding=ENCODING) as handle:
+        return json.load(handle)
+
+
+def path_filter_for(rules: Dict, key: str) -> PathFilter:
+    """Combine the global rules with the rules of the repository given by key."""
+    local = rules.get(REPOSITORIES, {}).get(key, {})
+    return PathFilter(
+        include=[*rules.get(INCLUDE, []), *local.get(INCLUDE, [])],
+        exclude=[*rules.get(EXCLUDE, []), *local.get(EXCLUDE, [])],
+    )
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Work queue of pending folders with a bounded in memory buffer and overflow spilled to disk.
+
+Items are tuples of JSON scalars like (url, path). The ordering policy survives spilling:
+
+    dfs       last in first out - the oldest half of the buffer moves to a stack of segment files
+    bfs       first in first out - write buffers of half the bound become segment files read back in order
+    priority  highest priority first - the lowest half moves to sorted run files merged on pop
+
+Segments are append-only NDJSON files in a private temporary directory removed on close.
+"""
+import collections
+import heapq
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Deque, List, Optional, Tuple
+
+ENCODING = "utf-8"
+
+BRM_FRONTIER_MAX = "BRM_FRONTIER_MAX"
+DEFAULT_MAX_IN_MEMORY = 1_000_000
+
+POLICIES = (DFS := 'dfs', BFS := 'bfs', PRIORITY := 'priority')
+
+
+def max_in_memory_default() -> int:
+    return int(os.getenv(BRM_FRONTIER_MAX, str(DEFAULT_MAX_IN_MEMORY)))
+
+
+class Frontier:
+    """Bounded frontier spilling to disk while keeping the dfs, bfs or priority order."""
+
+    def __init__(self, policy: str = DFS, max_in_memory: Optional[int] = None, spill_dir: Optional[str] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown frontier policy ({policy}) - use one of {POLICIES}")
+        self.policy = policy
+        self.max_in_memory = max(2, max_in_memory if max_in_memory else max_in_memory_default())
+        self._spill_root = spill_dir
+        self._directory: Optional[str] = None
+        self._names = itertools.count()
+        self._order = itertools.count()
+        self._count = 0
+        self.spilled = 0  # Items written to disk so far
+        self._buffer: List = []  # dfs stack or priority heap
+        self._head: Deque = collections.deque()  # bfs read side
+        self._tail: List = []  # bfs write side
+        self._segments: Deque[str] = collections.deque()  # bfs oldest first, dfs newest last
+        self._runs: List = []  # priority: heap of (head record, reader index)
+        self._readers: List = []
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def close(self):
+        """Drop pending items and remove the spill files."""
+        for reader in self._readers:
+            reader and reader.close()
+        self._readers, self._runs = [], []
+        self._directory and shutil.rmtree(self._directory, ignore_errors=True)
+        self._directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_segment(self, records: List) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='brm-frontier-', dir=self._spill_root)
+        path = os.path.join(self._directory, f"segment-{next(self._names)}.ndjson")
+        with open(path, 'at', encoding=ENCODING) as handle:
+            handle.writelines(json.dumps(record) + '\n' for record in records)
+        self.spilled += len(records)
+        return path
+
+    @staticmethod
+    def _read_segment(path: str) -> List:
+        with open(path, 'rt', encoding=ENCODING) as handle:
+            records = [json.loads(line) for line in handle]
+        os.remove(path)
+        return records
+
+    def push(self, item: Tuple, priority: float = 0.0):
+        """Add item (priority only matters for the priority policy, higher first)."""
+        self._count += 1
+        if self.policy == DFS:
+            self._buffer.append(item)
+            if len(self._buffer) > self.max_in_memory:
+                half = len(self._buffer) // 2
+                self._segments.append(self._write_segment(self._buffer[:half]))
+                del self._buffer[:half]
+        elif self.policy == BFS:
+            self._tail.append(item)
+            if len(self._tail) >= self.max_in_memory // 2:  # Head and tail each hold at most one segment
+                self._segments.append(self._write_segment(self._tail))
+                self._tail = []
+        else:
+            heapq.heappush(self._buffer, (-priority, next(self._order), item))
+            if len(self._buffer) > self.max_in_memory:
+                self._buffer.sort()
+                half = len(self._buffer) // 2
+                self._add_run(self._buffer[half:])
+                del self._buffer[half:]
+
+    def _add_run(self, records: List):
+        """Spill sorted (-priority, order, item) records as a run and keep its head in memory."""
+        path = self._write_segment(records)
+        reader = open(path, 'rt', encoding=ENCODING)  # pylint: disable=consider-using-with
+        self._readers.append(reader)
+        self._advance_run(len(self._readers) - 1)
+
+    def _advance_run(self, index: int):
+        reader = self._readers[index]
+        line = reader.readline()
+        if line:
+            negative_priority, order, item = json.loads(line)
+            heapq.heappush(self._runs, ((negative_priority, order), index, item))
+        else:
+            reader.close()
+            os.remove(reader.name)
+            self._readers[index] = None
+
+    def pop(self) -> Any:
+        """Remove and return the next item by policy (IndexError when empty)."""
+        if not self._count:
+            raise IndexError("pop from an empty frontier")
+        self._count -= 1
+        if self.policy == DFS:
+            if not self._buffer:
+                self._buffer = self._read_segment(self._segments.pop())
+            return _as_item(self._buffer.pop())
+        if self.policy == BFS:
+            if not self._head:
+                if self._segments:
+                    self._head.extend(self._read_segment(self._segments.popleft()))
+                else:
+                    self._head.extend(self._tail)
+                    self._tail = []
+            return _as_item(self._head.popleft())
+        if self._runs and (not self._buffer or self._runs[0][0] < self._buffer[0][:2]):
+            _, index, item = heapq.heappop(self._runs)
+            self._advance_run(index)
+            return _as_item(item)
+        return heapq.heappop(self._buffer)[2]
+
+
+def _as_item(record: Any) -> Any:
+    """Items come back from JSON as lists."""
+    return tuple(record) if isinstance(record, list) else record
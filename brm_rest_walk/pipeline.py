@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Compose lazy processing pipelines around TreeWalker.iter_entries.
+
+A stage is any callable taking an iterator and returning an iterator. pipeline() runs the source and
+every stage in a thread of its own, connected by bounded queues, so slow stages (digest requests, sinks)
+overlap with the walk while a full queue holds the upstream back. Exceptions travel downstream and are
+raised to the consumer, and closing the consumer stops all stages.
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+from brm_rest_walk.brm_rest_walk import KNOWN_DIGESTS, LEAF, Entry, TreeWalker
+
+QUEUE_SIZE = 256
+POLL_SECONDS = 0.1
+
+Stage = Callable[[Iterator], Iterator]
+
+
+class _End:
+    """Marks the end of a stream."""
+
+
+class _Failure:
+    """Carries an exception of an upstream stage."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _drain(channel: queue.Queue, stop: threading.Event) -> Iterator:
+    """Iterate the items of the channel until the end marker (raising upstream failures)."""
+    while not stop.is_set():
+        try:
+            item = channel.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            continue
+        if isinstance(item, _End):
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+
+def _feed(items: Iterable, channel: queue.Queue, stop: threading.Event):
+    """Put the items into the channel respecting its bound, then the end or failure marker."""
+    def put(item):
+        while not stop.is_set():
+            try:
+                channel.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for item in items:
+            if not put(item):
+                return
+        put(_End())
+    except BaseException as error:  # pylint: disable=broad-except
+        put(_Failure(error))
+
+
+def pipeline(source: Iterable, *stages: Stage, maxsize: int = QUEUE_SIZE) -> Iterator:
+    """Run source and stages concurrently with bounded queues in between and yield the final items."""
+    stop = threading.Event()
+    channel: queue.Queue = queue.Queue(maxsize)
+    threads = [threading.Thread(target=_feed, args=(source, channel, stop), daemon=True)]
+    for stage in stages:
+        downstream: queue.Queue = queue.Queue(maxsize)
+        threads.append(threading.Thread(target=_feed, args=(stage(_drain(channel, stop)), downstream, stop), daemon=True))
+        channel = downstream
+    for thread in threads:
+        thread.start()
+    try:
+        yield from _drain(channel, stop)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def keep(predicate: Callable[[Any], bool]) -> Stage:
+    """Filter stage."""
+    return lambda items: (item for item in items if predicate(item))
+
+
+def with_digests(walker: TreeWalker) -> Stage:
+    """Enrich stage adding the published sidecar digests to leaf entries (missing sidecars are skipped)."""
+    def stage(items: Iterator[Entry]) -> Iterator[Entry]:
+        for entry in items:
+            if entry.kind == LEAF:
+                published = {digest: walker.sidecar(entry.url, digest) for digest in KNOWN_DIGESTS}
+                entry = entry._replace(digests={**entry.digests, **{digest: value for digest, value in published.items() if value}})
+            yield entry
+    return stage
+
+
+def throttle(per_second: float) -> Stage:
+    """Rate limit stage letting at most per_second items pass per second."""
+    if per_second <= 0:
+        raise ValueError("Rate limit must be positive")
+    interval = 1.0 / per_second
+
+    def stage(items: Iterator) -> Iterator:
+        due = time.monotonic()
+        for item in items:
+            delay = due - time.monotonic()
+            delay > 0 and time.sleep(delay)
+            due = max(due, time.monotonic()) + interval
+            yield item
+    return stage
+
+
+def sink(write: Callable[[Any], Any]) -> Stage:
+    """Sink stage handing every item to write and passing it on."""
+    def stage(items: Iterator) -> Iterator:
+        for item in items:
+            write(item)
+            yield item
+    return stage
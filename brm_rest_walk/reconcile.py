@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Reconcile the REST view of the repositories with the checksum addressed filestore below BRM_FS_ROOT.
+
+Both sides are reduced to records keyed by digest, sorted (externally via temporary runs when they
+exceed the in memory limit) and merge joined. Blobs no REST entry references are orphans, REST entries
+without blob are missing, and the references per blob give the deduplication ratio.
+"""
+import heapq
+import json
+import os
+import re
+import sys
+import tempfile
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from brm_rest_walk.brm_rest_walk import (
+    ENCODING,
+    LEAF,
+    SHA1,
+    SHA256,
+    Entry,
+    TreeWalker,
+    brm_api_root,
+    brm_fs_root,
+    brm_server,
+    brm_token,
+    brm_user,
+    digest_value,
+)
+from brm_rest_walk.diff import open_entries
+
+MAX_IN_MEMORY = 1_000_000  # Records per sorted run
+HEX_LENGTHS = {SHA1: 40, SHA256: 64}
+
+FINDINGS = (ORPHAN := 'orphan', MISSING := 'missing')
+SUMMARY = (
+    REFERENCES := 'references',
+    UNHASHED := 'unhashed',
+    BLOBS := 'blobs',
+    REFERENCED_BLOBS := 'referenced_blobs',
+    ORPHANS := 'orphans',
+    ORPHAN_BYTES := 'orphan_bytes',
+    MISSING_REFERENCES := 'missing',
+    LOGICAL_BYTES := 'logical_bytes',
+    PHYSICAL_BYTES := 'physical_bytes',
+)
+DEDUP_RATIO = 'dedup_ratio'
+
+
+class Finding(NamedTuple):
+    """An orphaned blob (location is the file path) or a missing blob (location is the artifact url)."""
+
+    kind: str
+    digest: str
+    location: str
+    size: Optional[int]
+
+
+def scan_filestore(root: str, digest: str = SHA1) -> Iterator[Tuple[str, int, str]]:
+    """Yield (digest, size, path) for every file below root named like a digest of the given kind."""
+    pattern = re.compile(f"[0-9a-f]{{{HEX_LENGTHS[digest]}}}")
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as scanner:
+            for item in scanner:
+                if item.is_dir(follow_symlinks=False):
+                    stack.append(item.path)
+                elif item.is_file(follow_symlinks=False) and pattern.fullmatch(item.name):
+                    yield item.name, item.stat(follow_symlinks=False).st_size, item.path
+
+
+def with_hashes(walker: TreeWalker, entries: Iterable[Entry], digest: str = SHA1) -> Iterator[Entry]:
+    """Fill in the sidecar of the digest of interest where leaves lack it (unpublished ones stay unhashed)."""
+    for entry in entries:
+        if entry.kind == LEAF and not entry.digests.get(digest):
+            value = walker.sidecar(entry.url, digest)
+            entry = entry._replace(digests={**entry.digests, digest: value}) if value else entry
+        yield entry
+
+
+def external_sort(records: Iterable[Tuple], max_in_memory: int = MAX_IN_MEMORY, temp_dir: Optional[str] = None) -> Iterator[Tuple]:
+    """Sort records (digest first) with sorted runs spilled to temporary files and merged lazily."""
+    runs: List = []
+    chunk: List[Tuple] = []
+
+    def spill():
+        chunk.sort()
+        run = tempfile.TemporaryFile('w+t', encoding=ENCODING, dir=temp_dir)  # pylint: disable=consider-using-with
+        run.writelines(json.dumps(record) + '\n' for record in chunk)
+        run.seek(0)
+        runs.append(run)
+        chunk.clear()
+
+    for record in records:
+        chunk.append(record)
+        len(chunk) >= max_in_memory and spill()
+    if not runs:
+        chunk.sort()
+        yield from chunk
+        return
+    chunk and spill()
+    try:
+        yield from heapq.merge(*((tuple(json.loads(line)) for line in run) for run in runs))
+    finally:
+        for run in runs:
+            run.close()
+
+
+def reconcile(
+    references: Iterable[Tuple[str, int, str]],
+    blobs: Iterable[Tuple[str, int, str]],
+    summary: Optional[Dict] = None,
+) -> Iterator[Finding]:
+    """Merge join (digest, size, url) references and (digest, size, path) blobs, both sorted by digest."""
+    summary = summary if summary is not None else {}
+    for name in SUMMARY:
+        summary.setdefault(name, 0)
+    references, blobs = iter(references), iter(blobs)
+    reference, blob = next(references, None), next(blobs, None)
+    while reference is not None or blob is not None:
+        if reference is None or (blob is not None and blob[0] < reference[0]):
+            summary[BLOBS] += 1
+            summary[ORPHANS] += 1
+            summary[ORPHAN_BYTES] += blob[1]
+            summary[PHYSICAL_BYTES] += blob[1]
+            yield Finding(ORPHAN, blob[0], blob[2], blob[1])
+            blob = next(blobs, None)
+        elif blob is None or reference[0] < blob[0]:
+            summary[REFERENCES] += 1
+            summary[MISSING_REFERENCES] += 1
+            yield Finding(MISSING, reference[0], reference[2], reference[1])
+            reference = next(references, None)
+        else:
+            digest, size = blob[0], blob[1]
+            summary[BLOBS] += 1
+            summary[REFERENCED_BLOBS] += 1
+            summary[PHYSICAL_BYTES] += size
+            while reference is not None and reference[0] == digest:
+                summary[REFERENCES] += 1
+                summary[LOGICAL_BYTES] += size
+                reference = next(references, None)
+            blob = next(blobs, None)
+    matched = summary[REFERENCES] - summary[MISSING_REFERENCES]
+    summary[DEDUP_RATIO] = matched / summary[REFERENCED_BLOBS] if summary[REFERENCED_BLOBS] else 0.0
+
+
+def reference_records(entries: Iterable[Entry], summary: Dict, digest: str = SHA1) -> Iterator[Tuple[str, int, str]]:
+    """Reduce leaves to (digest, size or -1, url) and count those without the digest as unhashed."""
+    summary.setdefault(UNHASHED, 0)
+    for entry in entries:
+        if entry.kind != LEAF:
+            continue
+        value = digest_value(entry.digests.get(digest))  # Entries written by older runs may hold raw sidecar text
+        if not value:
+            summary[UNHASHED] += 1
+            continue
+        yield value, entry.size if entry.size is not None else -1, entry.url
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Reconcile the leaves in SOURCE (.snap, .ndjson or .json) with the filestore: SOURCE [--hashes]."""
+    argv = argv if argv else sys.argv[1:]
+    if not argv or len(argv) > 2 or argv[1:] not in ([], ['--hashes']):
+        print("ERROR usage: SOURCE [--hashes]")
+        return 2
+    entries: Iterable[Entry] = open_entries(argv[0])
+    if argv[1:]:
+        walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+        entries = with_hashes(walker, entries)
+    summary: Dict = {}
+    references = external_sort(reference_records(entries, summary))
+    blobs = external_sort(scan_filestore(brm_fs_root))
+    for finding in reconcile(references, blobs, summary):
+        print(f"{finding.kind} {finding.digest} {finding.location}")
+    print(f"Summary: {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Spread requests across equivalent BRM replicas with latency awareness, circuit breaking and failover.
+
+Urls stay canonical (the primary server url) everywhere in the walker - trees, visited sets and memo
+keys - and the pool rewrites the server prefix per request. Each request picks the better of two random
+available replicas by latency (moving average) times requests in flight. Network errors and server errors
+count as failures: the request fails over to another replica, and a replica failing repeatedly is
+skipped (circuit open) until a cooldown passes and a probe request succeeds.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+
+EWMA_ALPHA = 0.2  # Weight of the newest latency sample
+FAILURE_THRESHOLD = 3  # Consecutive failures opening the circuit
+COOLDOWN_SECONDS = 30.0
+
+CIRCUIT_STATES = (CLOSED := 'closed', OPEN := 'open', HALF_OPEN := 'half_open')
+
+
+class Replica:  # pylint: disable=too-few-public-methods
+    """Health and latency of one replica base url."""
+
+    __slots__ = ('url', 'latency', 'in_flight', 'failures', 'open_until', 'requests')
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None  # Seconds, None until measured
+        self.in_flight = 0
+        self.failures = 0
+        self.open_until = 0.0
+        self.requests = 0
+
+    def state(self, now: float) -> str:
+        if self.failures < FAILURE_THRESHOLD:
+            return CLOSED
+        return OPEN if now < self.open_until else HALF_OPEN
+
+
+class ReplicaPool:
+    """Equivalent base urls for the canonical one (thread safe)."""
+
+    def __init__(
+        self,
+        canonical: str,
+        urls: Iterable[str],
+        cooldown: float = COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ):
+        self.canonical = canonical.rstrip('/')
+        self.replicas = [Replica(url.rstrip('/')) for url in dict.fromkeys(urls)]
+        if not self.replicas:
+            raise ValueError("Replica pool needs at least one base url")
+        self.cooldown = cooldown
+        self._clock = clock
+        self._rng = rng if rng else random.Random()
+        self._lock = threading.Lock()
+
+    def canonicalize(self, url: str) -> str:
+        """Map an url of any replica (like links in server responses) to the canonical server."""
+        for replica in self.replicas:
+            if url.startswith(f"{replica.url}/") or url == replica.url:
+                return f"{self.canonical}{url[len(replica.url):]}"
+        return url
+
+    def _score(self, replica: Replica) -> float:
+        return (replica.latency if replica.latency is not None else 0.0) * (replica.in_flight + 1)
+
+    def _choose(self, tried: List[Replica]) -> Optional[Replica]:
+        """Better of two random available replicas (open circuits only if nothing else is left)."""
+        now = self._clock()
+        candidates = [replica for replica in self.replicas if replica not in tried]
+        available = [replica for replica in candidates if replica.state(now) != OPEN]
+        if not available:
+            if not candidates:
+                return None
+            replica = min(candidates, key=lambda replica: replica.open_until)
+        else:
+            replica = min(self._rng.sample(available, min(2, len(available))), key=self._score)
+            if replica.state(now) == HALF_OPEN:
+                replica.open_until = now + self.cooldown  # One probe at a time
+        replica.in_flight += 1
+        replica.requests += 1
+        return replica
+
+    def _record(self, replica: Replica, seconds: Optional[float]):
+        """Record a success with its latency or a failure (seconds None)."""
+        replica.in_flight -= 1
+        if seconds is None:
+            replica.failures += 1
+            if replica.failures >= FAILURE_THRESHOLD:
+                replica.open_until = self._clock() + self.cooldown
+            return
+        replica.failures = 0
+        replica.latency = seconds if replica.latency is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * replica.latency
+
+    def fetch(self, send: Callable[[str], requests.Response], url: str) -> requests.Response:
+        """Send the canonical url to the chosen replica failing over on network and server errors.
+
+        When every replica fails, the last server error response is returned (or the last network error raised).
+        """
+        if not url.startswith(self.canonical):
+            return send(url)
+        tried: List[Replica] = []
+        response, error = None, None
+        while True:
+            with self._lock:
+                replica = self._choose(tried)
+            if replica is None:
+                break
+            tried.append(replica)
+            started = self._clock()
+            try:
+                response = send(f"{replica.url}{url[len(self.canonical):]}")
+            except (requests.ConnectionError, requests.Timeout) as failure:
+                error = failure
+                with self._lock:
+                    self._record(replica, None)
+                continue
+            failed = response.status_code >= 500
+            with self._lock:
+                self._record(replica, None if failed else self._clock() - started)
+            if not failed:
+                return response
+        if response is not None:
+            return response
+        raise error if error else requests.ConnectionError(f"No replica available for {url}")
+
+    def health(self) -> Dict[str, Dict]:
+        """Per replica state, latency, failures and request count."""
+        now = self._clock()
+        with self._lock:
+            return {
+                replica.url: {'state': replica.state(now), 'latency': replica.latency, 'failures': replica.failures, 'requests': replica.requests}
+                for replica in self.replicas
+            }
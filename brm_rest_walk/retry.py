@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Retry queue isolating failed folder requests instead of aborting a long walk.
+
+Failures are classified by HTTP status (or as network errors) and every class has a policy of attempts
+and exponential backoff. Folders are due again after their backoff (or the Retry-After of the server,
+capped by the policy) and land on the dead letter list once their class runs out of attempts.
+"""
+import heapq
+import itertools
+import json
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+ENCODING = "utf-8"
+
+DEAD_LETTERS_FILE = "dead_letters.ndjson"  # Written alongside tree.json
+
+ERROR_CLASSES = (
+    TRANSIENT := 'transient',
+    THROTTLED := 'throttled',
+    NETWORK := 'network',
+    MISSING := 'missing',
+    DENIED := 'denied',
+    CLIENT := 'client',
+)
+
+
+class RetryPolicy(NamedTuple):
+    """Total attempts (the first included) and exponential backoff from base to max seconds."""
+
+    attempts: int
+    base_seconds: float = 1.0
+    max_seconds: float = 60.0
+
+    def delay(self, attempt: int) -> float:
+        """Backoff after the given failed attempt (1 for the first)."""
+        return min(self.max_seconds, self.base_seconds * 2 ** (attempt - 1))
+
+
+POLICIES = {
+    TRANSIENT: RetryPolicy(4, 1.0, 60.0),
+    THROTTLED: RetryPolicy(6, 5.0, 300.0),
+    NETWORK: RetryPolicy(4, 2.0, 120.0),
+    MISSING: RetryPolicy(1),
+    DENIED: RetryPolicy(1),
+    CLIENT: RetryPolicy(1),
+}
+
+
+class DeadLetter(NamedTuple):
+    """Folder given up on after attempts requests failing with the error class."""
+
+    url: str
+    path: str
+    error_class: str
+    detail: str
+    attempts: int
+
+
+def classify(error: BaseException) -> str:
+    """Error class of a failed request (HTTP errors by status, anything without response as network)."""
+    response = getattr(error, 'response', None)
+    status = response.status_code if response is not None else None
+    if status is None:
+        return NETWORK
+    if status == 429:
+        return THROTTLED
+    if status in (404, 410):
+        return MISSING
+    if status in (401, 403):
+        return DENIED
+    return TRANSIENT if status >= 500 else CLIENT
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds of a numeric Retry-After header of the failed response (None if absent)."""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers['Retry-After']) if response is not None else None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RetryQueue:
+    """Failed (url, path, ...) items due again after their backoff - not thread safe, callers lock."""
+
+    def __init__(self, policies: Optional[Dict[str, RetryPolicy]] = None, clock: Callable[[], float] = time.monotonic):
+        self.policies = {**POLICIES, **(policies if policies else {})}
+        self.dead_letters: List[DeadLetter] = []
+        self._clock = clock
+        self._heap: List = []
+        self._attempts: Dict[Tuple, int] = {}
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def fail(self, item: Tuple, error: BaseException) -> bool:
+        """Schedule the item for another attempt and answer True, or dead letter it and answer False."""
+        error_class = classify(error)
+        policy = self.policies[error_class]
+        attempts = self._attempts[item] = self._attempts.get(item, 0) + 1
+        if attempts >= policy.attempts:
+            del self._attempts[item]
+            self.dead_letters.append(DeadLetter(item[0], item[1], error_class, f"{type(error).__name__}: {error}", attempts))
+            return False
+        delay = min(policy.max_seconds, max(policy.delay(attempts), retry_after(error) or 0.0))
+        heapq.heappush(self._heap, (self._clock() + delay, next(self._order), item))
+        return True
+
+    def due(self) -> List[Tuple]:
+        """Remove and return the items whose backoff has passed."""
+        now, items = self._clock(), []
+        while self._heap and self._heap[0][0] <= now:
+            items.append(heapq.heappop(self._heap)[2])
+        return items
+
+    def wait_seconds(self) -> Optional[float]:
+        """Seconds until the next item is due (None when empty)."""
+        return max(0.0, self._heap[0][0] - self._clock()) if self._heap else None
+
+    def drain(self) -> List[Tuple]:
+        """Remove and return all scheduled items regardless of their backoff."""
+        items = [entry[2] for entry in sorted(self._heap)]
+        self._heap.clear()
+        return items
+
+
+def write_dead_letters(path: str, letters: Iterable[DeadLetter]) -> int:
+    """Write the dead letters one JSON object per line and return their count."""
+    count = 0
+    with open(path, 'wt', encoding=ENCODING) as handle:
+        for letter in letters:
+            handle.write(json.dumps(letter._asdict()) + '\n')
+            count += 1
+    return count
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Coalesce concurrent and repeated calls for the same key into one call with a short lived memo.
+
+The first caller of a key (the leader) runs the call while later callers wait for and share its result
+or exception. Successful results stay memoized for a few seconds so repeated requests of the same url in
+a walk share the network call and the parse result. Failures are never memoized.
+"""
+import collections
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+MEMO_SECONDS = 30.0
+MEMO_ENTRIES = 1024
+
+
+class _Call:
+    """One call in flight."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Share one call per key among concurrent callers and memoize the results briefly."""
+
+    def __init__(self, ttl: float = MEMO_SECONDS, max_entries: int = MEMO_ENTRIES):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._memo: collections.OrderedDict = collections.OrderedDict()
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """Return the memoized, the in flight or a fresh result of function for key."""
+        with self._lock:
+            memo = self._memo.get(key)
+            if memo is not None:
+                expires, result = memo
+                if expires > time.monotonic():
+                    return result
+                del self._memo[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and self._ttl > 0:
+                    self._memo[key] = (time.monotonic() + self._ttl, call.result)
+                    while len(self._memo) > self._max_entries:
+                        self._memo.popitem(last=False)
+            call.done.set()
+        return call.result
+
+    def forget(self, key: Optional[Hashable] = None):
+        """Drop the memo for key or for all keys."""
+        with self._lock:
+            self._memo.pop(key, None) if key is not None else self._memo.clear()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Compact binary snapshots of walks that load instantly via mmap and support O(log n) path lookup.
+
+Layout (little endian, every section 8 byte aligned):
+
+    header   magic, version, count, then (offset, length) of every section below
+    offsets  uint64 per entry - start of the key in the heap
+    lengths  uint32 per entry - byte length of the key
+    sizes    int64 per entry - bytes (-1 unknown)
+    stamps   int64 per entry - seconds since the epoch (-1 unknown)
+    kinds    uint8 per entry - 0 folder, 1 leaf
+    present  uint8 per entry - bit mask of the digests present (md5 1, sha1 2, sha256 4)
+    md5      16 raw bytes per entry
+    sha1     20 raw bytes per entry
+    sha256   32 raw bytes per entry
+    heap     utf-8 keys "repository NUL path" in ascending byte order
+
+Byte order of the keys equals the (repository, path) order of the entries, so lookups bisect the heap
+keys in place and iteration decodes one row at a time from the mapped file.
+"""
+import json
+import mmap
+import struct
+import sys
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from brm_rest_walk.brm_rest_walk import (
+    ENCODING,
+    FOLDER,
+    KNOWN_DIGESTS,
+    LEAF,
+    MD5,
+    SHA1,
+    SHA256,
+    Entry,
+    build_tree,
+    iter_tree,
+)
+
+MAGIC = b'BRMSNAP\x00'
+VERSION = 1
+SEPARATOR = b'\x00'
+UNKNOWN = -1
+
+DIGEST_WIDTHS = {MD5: 16, SHA1: 20, SHA256: 32}
+DIGEST_BITS = {MD5: 1, SHA1: 2, SHA256: 4}
+KIND_CODES = {FOLDER: 0, LEAF: 1}
+KINDS_BY_CODE = {code: kind for kind, code in KIND_CODES.items()}
+
+SECTIONS = ('offsets', 'lengths', 'sizes', 'stamps', 'kinds', 'present', *KNOWN_DIGESTS, 'heap')
+WIDTHS = {'offsets': 8, 'lengths': 4, 'sizes': 8, 'stamps': 8, 'kinds': 1, 'present': 1, **DIGEST_WIDTHS}
+FORMATS = {'offsets': 'Q', 'lengths': 'I', 'sizes': 'q', 'stamps': 'q', 'kinds': 'B', 'present': 'B'}
+HEADER = struct.Struct(f"<8sIQ{2 * len(SECTIONS)}Q")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def encode_key(repository: str, path: str) -> bytes:
+    return repository.encode(ENCODING) + SEPARATOR + path.encode(ENCODING)
+
+
+def decode_key(key: bytes) -> Tuple[str, str]:
+    repository, _, path = key.partition(SEPARATOR)
+    return repository.decode(ENCODING), path.decode(ENCODING)
+
+
+def write_snapshot(path: str, entries: Iterable[Entry]) -> int:
+    """Write the entries (sorted here, duplicate keys keep the last entry) and return their count."""
+    rows = sorted({encode_key(entry.repository, entry.path): entry for entry in entries}.items())
+    count = len(rows)
+    columns = {name: bytearray(count * width) for name, width in WIDTHS.items()}
+    heap = bytearray()
+    for index, (key, entry) in enumerate(rows):
+        struct.pack_into('<Q', columns['offsets'], index * 8, len(heap))
+        struct.pack_into('<I', columns['lengths'], index * 4, len(key))
+        struct.pack_into('<q', columns['sizes'], index * 8, UNKNOWN if entry.size is None else entry.size)
+        struct.pack_into('<q', columns['stamps'], index * 8, UNKNOWN if entry.ts is None else entry.ts)
+        columns['kinds'][index] = KIND_CODES[entry.kind]
+        present = 0
+        for digest, width in DIGEST_WIDTHS.items():
+            value = entry.digests.get(digest)
+            if value:
+                raw = bytes.fromhex(value)
+                if len(raw) != width:
+                    raise ValueError(f"The {digest} digest of {entry.url} is not {width} bytes long ({value})")
+                columns[digest][index * width:(index + 1) * width] = raw
+                present |= DIGEST_BITS[digest]
+        columns['present'][index] = present
+        heap += key
+    columns['heap'] = heap
+
+    layout, offset = [], _align(HEADER.size)
+    for name in SECTIONS:
+        layout.extend((offset, len(columns[name])))
+        offset = _align(offset + len(columns[name]))
+    with open(path, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, VERSION, count, *layout))
+        for name, (start, _) in zip(SECTIONS, zip(layout[::2], layout[1::2])):
+            handle.write(b'\x00' * (start - handle.tell()))
+            handle.write(columns[name])
+    return count
+
+
+class Snapshot:
+    """Read only memory mapped snapshot with bisect lookup and lazy row decoding."""
+
+    def __init__(self, path: str):
+        self._handle = open(path, 'rb')  # pylint: disable=consider-using-with
+        self._map = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, *layout = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a snapshot of version {VERSION} ({path})")
+        self._view = memoryview(self._map)
+        self._sections = {name: self._view[start:start + length] for name, start, length in zip(SECTIONS, layout[::2], layout[1::2])}
+        self._columns = {name: self._sections[name].cast(code) for name, code in FORMATS.items()}
+
+    def close(self):
+        for view in (*getattr(self, '_columns', {}).values(), *getattr(self, '_sections', {}).values()):
+            view.release()
+        self._columns, self._sections = {}, {}
+        getattr(self, '_view', None) is not None and self._view.release()
+        if not self._map.closed:
+            self._map.close()
+        self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def key(self, index: int) -> memoryview:
+        """The raw key bytes of row index as a view into the mapped file."""
+        start = self._columns['offsets'][index]
+        return self._sections['heap'][start:start + self._columns['lengths'][index]]
+
+    def entry(self, index: int) -> Entry:
+        """Decode row index."""
+        repository, path = decode_key(bytes(self.key(index)))
+        size, stamp, present = self._columns['sizes'][index], self._columns['stamps'][index], self._columns['present'][index]
+        digests = {
+            digest: self._sections[digest][index * width:(index + 1) * width].hex()
+            for digest, width in DIGEST_WIDTHS.items() if present & DIGEST_BITS[digest]
+        }
+        return Entry(
+            repository, path, KINDS_BY_CODE[self._columns['kinds'][index]],
+            None if size == UNKNOWN else size, None if stamp == UNKNOWN else stamp, digests,
+        )
+
+    def bisect(self, key: bytes) -> int:
+        """Leftmost row whose key is not below key."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(self.key(middle)) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, repository: str, path: str) -> Optional[Entry]:
+        """The entry with exactly this repository and path or None."""
+        key = encode_key(repository, path)
+        index = self.bisect(key)
+        if index < self.count and bytes(self.key(index)) == key:
+            return self.entry(index)
+        return None
+
+    def __iter__(self) -> Iterator[Entry]:
+        """Rows in (repository, path) order."""
+        return (self.entry(index) for index in range(self.count))
+
+    def below(self, repository: str, prefix: str = '') -> Iterator[Entry]:
+        """Rows of the repository whose path starts with prefix (a contiguous range)."""
+        key = encode_key(repository, prefix)
+        index = self.bisect(key)
+        while index < self.count and bytes(self.key(index)).startswith(key):
+            yield self.entry(index)
+            index += 1
+
+
+def json_to_snapshot(json_path: str, snapshot_path: str) -> int:
+    """Convert a tree.json written by dump() into a snapshot."""
+    with open(json_path, 'rt', encoding=ENCODING) as handle:
+        return write_snapshot(snapshot_path, iter_tree(json.load(handle)))
+
+
+def snapshot_to_json(snapshot_path: str, json_path: str) -> int:
+    """Convert a snapshot back into the tree.json layout of dump()."""
+    with Snapshot(snapshot_path) as snapshot:
+        tree = build_tree(snapshot)
+        count = len(snapshot)
+    with open(json_path, 'wt', encoding=ENCODING) as handle:
+        json.dump(tree, handle, indent=2)
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Convert between tree.json and snapshot by the file name suffixes: SOURCE TARGET."""
+    argv = argv if argv else sys.argv[1:]
+    if len(argv) != 2:
+        print("ERROR usage: SOURCE TARGET (one ending in .json)")
+        return 2
+    source, target = argv
+    count = json_to_snapshot(source, target) if source.endswith('.json') else snapshot_to_json(source, target)
+    print(f"Converted {count} entries from {source} to {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Transport configuration applied once per session instead of per request.
+
+TLS verification (system trust, a CA bundle or a pinned certificate), connection pool sizes, TCP
+keep-alive and default timeouts live on a mounted adapter, so the fetch hot path is a plain
+session.get that many threads may call concurrently. Pooled keep-alive connections are reused
+across requests, which avoids repeated TLS handshakes. Insecure mode silences the urllib3
+warning once at configuration time.
+"""
+import os
+import socket
+from typing import NamedTuple, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import InsecureRequestWarning
+
+BRM_CA_BUNDLE = "BRM_CA_BUNDLE"  # Path of a CA bundle file or directory (default system trust)
+BRM_PIN_SHA256 = "BRM_PIN_SHA256"  # Hex SHA-256 fingerprint of the server certificate to pin
+BRM_INSECURE = "BRM_INSECURE"  # Set to skip certificate verification
+BRM_POOL_SIZE = "BRM_POOL_SIZE"
+BRM_CONNECT_TIMEOUT = "BRM_CONNECT_TIMEOUT"
+BRM_READ_TIMEOUT = "BRM_READ_TIMEOUT"
+
+POOL_SIZE = 16
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 60.0
+KEEP_ALIVE_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+SCHEMES = ('https://', 'http://')
+
+
+class Transport(NamedTuple):
+    """Session wide transport settings - verify is True, False or a CA bundle path."""
+
+    verify: Union[bool, str] = True
+    pin_sha256: Optional[str] = None
+    pool_size: int = POOL_SIZE
+    connect_timeout: float = CONNECT_TIMEOUT
+    read_timeout: float = READ_TIMEOUT
+    keep_alive: bool = True
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeout
+
+
+def transport_from_env(workers: int = 1) -> Transport:
+    """Transport honoring the BRM_* transport variables with pools sized for the worker count."""
+    ca_bundle = os.getenv(BRM_CA_BUNDLE, "")
+    pin = os.getenv(BRM_PIN_SHA256, "").replace(':', '').lower()
+    verify: Union[bool, str] = ca_bundle if ca_bundle else not os.getenv(BRM_INSECURE)
+    return Transport(
+        verify=verify,
+        pin_sha256=pin if pin else None,
+        pool_size=int(os.getenv(BRM_POOL_SIZE, str(max(POOL_SIZE, workers)))),
+        connect_timeout=float(os.getenv(BRM_CONNECT_TIMEOUT, str(CONNECT_TIMEOUT))),
+        read_timeout=float(os.getenv(BRM_READ_TIMEOUT, str(READ_TIMEOUT))),
+    )
+
+
+class TransportAdapter(HTTPAdapter):
+    """HTTP adapter with pinned fingerprint, keep-alive sockets and default timeouts."""
+
+    def __init__(self, transport: Transport):
+        self.transport = transport
+        # A pinned certificate replaces the chain validation (self signed servers) but is still asserted
+        self.verify: Union[bool, str] = False if transport.pin_sha256 else transport.verify
+        super().__init__(pool_connections=transport.pool_size, pool_maxsize=transport.pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.transport.pin_sha256:
+            kwargs['assert_fingerprint'] = self.transport.pin_sha256
+        if self.transport.keep_alive:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + KEEP_ALIVE_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):  # pylint: disable=too-many-arguments
+        """Send with the default timeouts and the configured verification (REQUESTS_CA_BUNDLE cannot override it)."""
+        timeout = timeout if timeout is not None else self.transport.timeout
+        return super().send(request, stream=stream, timeout=timeout, verify=self.verify, cert=cert, proxies=proxies)
+
+
+def configure(session: requests.Session, transport: Transport) -> requests.Session:
+    """Apply the transport to the session once (mount adapters, set verification, silence insecure warnings)."""
+    if transport.pin_sha256 and len(transport.pin_sha256) != 64:
+        raise ValueError("Pinned certificate fingerprint must be 64 hex digits of SHA-256")
+    adapter = TransportAdapter(transport)
+    for scheme in SCHEMES:
+        session.mount(scheme, adapter)
+    session.verify = adapter.verify
+    if session.verify is False:
+        urllib3.disable_warnings(InsecureRequestWarning)
+    return session
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Verify artifact bytes against their published md5, sha1 and sha256 sidecar digests.
+
+Artifacts are streamed in chunks and every chunk updates all digests, so each file is read once and
+never held in memory as a whole. A pool of workers verifies artifacts in parallel and a shared token
+bucket bounds the aggregate download rate to spare the BRM.
+"""
+import concurrent.futures
+import hashlib
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import requests
+
+from brm_rest_walk.brm_rest_walk import (
+    CHUNK_BYTES,
+    KNOWN_DIGESTS,
+    LEAF,
+    TreeWalker,
+    brm_api_root,
+    brm_server,
+    brm_token,
+    brm_user,
+)
+from brm_rest_walk.diff import open_entries
+
+WORKERS = 4
+
+
+class Verification(NamedTuple):
+    """Outcome for one artifact - mismatches name the digests differing from their sidecars."""
+
+    url: str
+    size: int
+    expected: Dict[str, str]
+    actual: Dict[str, str]
+    mismatches: List[str]
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return not self.mismatches and self.error is None
+
+
+class ByteRateLimiter:
+    """Token bucket shared by the workers (one second of burst)."""
+
+    def __init__(self, bytes_per_second: float):
+        if bytes_per_second <= 0:
+            raise ValueError("Byte rate budget must be positive")
+        self._rate = float(bytes_per_second)
+        self._tokens = self._rate
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, count: int):
+        """Take count tokens and sleep off any debt outside the lock."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._rate, self._tokens + (now - self._stamp) * self._rate) - count
+            self._stamp = now
+            debt = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        debt and time.sleep(debt)
+
+
+def digest_stream(chunks: Iterable[bytes], limiter: Optional[ByteRateLimiter] = None):
+    """Compute all known digests in a single pass over the chunks and return them with the byte count."""
+    hashers = {digest: hashlib.new(digest) for digest in KNOWN_DIGESTS}
+    size = 0
+    for chunk in chunks:
+        limiter and limiter.consume(len(chunk))
+        for hasher in hashers.values():
+            hasher.update(chunk)
+        size += len(chunk)
+    return {digest: hasher.hexdigest() for digest, hasher in hashers.items()}, size
+
+
+def verify_one(walker: TreeWalker, url: str, limiter: Optional[ByteRateLimiter] = None, chunk_size: int = CHUNK_BYTES) -> Verification:
+    """Fetch the published sidecars, stream the artifact and compare the digests that have a sidecar."""
+    try:
+        expected = {digest: value for digest in KNOWN_DIGESTS if (value := walker.sidecar(url, digest))}
+        if not expected:
+            return Verification(url, 0, {}, {}, [], "No sidecar digests published")
+        actual, size = digest_stream(walker.artifact_chunks(url, chunk_size), limiter)
+    except requests.RequestException as error:
+        return Verification(url, 0, {}, {}, [], f"{type(error).__name__}: {error}")
+    mismatches = [digest for digest in expected if expected[digest] != actual[digest]]
+    return Verification(url, size, expected, actual, mismatches)
+
+
+def verify(
+    walker: TreeWalker,
+    urls: Iterable[str],
+    workers: int = WORKERS,
+    bytes_per_second: Optional[float] = None,
+    chunk_size: int = CHUNK_BYTES,
+) -> Iterator[Verification]:
+    """Verify the artifacts in parallel and yield the outcomes as they complete.
+
+    At most twice the worker count of artifacts are in flight, so urls may be a lazy stream.
+    """
+    limiter = ByteRateLimiter(bytes_per_second) if bytes_per_second else None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for url in urls:
+            pending.add(pool.submit(verify_one, walker, url, limiter, chunk_size))
+            if len(pending) >= 2 * workers:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Verify the leaves listed in SOURCE (.snap, .ndjson or .json) and report mismatches: SOURCE [WORKERS [BYTES_PER_SECOND]]."""
+    argv = argv if argv else sys.argv[1:]
+    if not 1 <= len(argv) <= 3:
+        print("ERROR usage: SOURCE [WORKERS [BYTES_PER_SECOND]]")
+        return 2
+    workers = int(argv[1]) if len(argv) > 1 else WORKERS
+    bytes_per_second = float(argv[2]) if len(argv) > 2 else None
+    walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+    urls = (entry.url for entry in open_entries(argv[0]) if entry.kind == LEAF)
+    checked, failed, volume = 0, 0, 0
+    for outcome in verify(walker, urls, workers, bytes_per_second):
+        checked += 1
+        volume += outcome.size
+        if not outcome.ok:
+            failed += 1
+            print(f"FAIL {outcome.url} {outcome.error or ','.join(outcome.mismatches)}")
+    print(f"Verified {checked} artifacts ({volume} bytes) with {failed} failures.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Compact sets of visited urls to prevent duplicate fetches and cycles in large walks.
+
+The exact set groups urls by their parent prefix, stores each prefix once (interned) and only keeps the
+last segment per url. The Bloom filter needs a fixed number of bits per url independent of the url
+length, at the price of skipping a small configurable fraction of never seen urls (false positives).
+"""
+import hashlib
+import math
+import os
+import sys
+import threading
+from typing import Dict, Set
+
+ENCODING = "utf-8"
+
+BRM_VISITED = "BRM_VISITED"  # exact (default) or bloom
+BRM_VISITED_CAPACITY = "BRM_VISITED_CAPACITY"
+BRM_VISITED_FP_RATE = "BRM_VISITED_FP_RATE"
+
+MODES = (EXACT := 'exact', BLOOM := 'bloom')
+DEFAULT_CAPACITY = 10_000_000
+DEFAULT_FP_RATE = 1.e-6
+
+
+def normalize(url: str) -> str:
+    """Folder urls with and without trailing slash denote the same resource."""
+    return url.rstrip('/')
+
+
+class ExactVisited:
+    """Prefix compressed exact set of urls."""
+
+    def __init__(self):
+        self._tails_by_prefix: Dict[str, Set[str]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, url: str) -> bool:
+        prefix, _, tail = normalize(url).rpartition('/')
+        return tail in self._tails_by_prefix.get(prefix, ())
+
+    def add(self, url: str) -> bool:
+        """Add the url and answer if it was new (thread safe)."""
+        prefix, _, tail = normalize(url).rpartition('/')
+        with self._lock:
+            tails = self._tails_by_prefix.get(prefix)
+            if tails is None:
+                tails = self._tails_by_prefix[sys.intern(prefix)] = set()
+            if tail in tails:
+                return False
+            tails.add(tail)
+            self._count += 1
+            return True
+
+    def clear(self):
+        self._tails_by_prefix.clear()
+        self._count = 0
+
+
+class BloomVisited:
+    """Bloom filter of urls sized for capacity entries at the given false positive rate."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, fp_rate: float = DEFAULT_FP_RATE):
+        if capacity < 1 or not 0.0 < fp_rate < 1.0:
+            raise ValueError("Bloom filter needs a positive capacity and a false positive rate between 0 and 1")
+        self.bits = max(8, int(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def _positions(self, url: str):
+        """Double hashing from one digest (Kirsch and Mitzenmacher)."""
+        digest = hashlib.blake2b(normalize(url).encode(ENCODING), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, url: str) -> bool:
+        return all(self._array[p >> 3] & (1 << (p & 7)) for p in self._positions(url))
+
+    def add(self, url: str) -> bool:
+        """Add the url and answer if it was (probably) new (thread safe)."""
+        positions = self._positions(url)
+        new = False
+        with self._lock:
+            for p in positions:
+                mask = 1 << (p & 7)
+                if not self._array[p >> 3] & mask:
+                    self._array[p >> 3] |= mask
+                    new = True
+            self._count += new
+        return new
+
+    def clear(self):
+        self._array = bytearray(len(self._array))
+        self._count = 0
+
+
+def visited_set(mode: str = '', capacity: int = 0, fp_rate: float = 0.0):
+    """Factory honoring the BRM_VISITED* environment variables for unset parameters."""
+    mode = mode if mode else os.getenv(BRM_VISITED, EXACT)
+    if mode == EXACT:
+        return ExactVisited()
+    if mode == BLOOM:
+        capacity = capacity if capacity else int(os.getenv(BRM_VISITED_CAPACITY, DEFAULT_CAPACITY))
+        fp_rate = fp_rate if fp_rate else float(os.getenv(BRM_VISITED_FP_RATE, DEFAULT_FP_RATE))
+        return BloomVisited(capacity, fp_rate)
+    raise ValueError(f"Unknown visited set mode ({mode}) - use one of {MODES}")
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=expression-not-assigned,line-too-long
+"""Watch repositories and stream the changes of their folders as they are published.
+
+Every watched folder keeps its last listing and validators (ETag, Last-Modified) and is polled with
+conditional requests at its own interval. The first interval follows the age of the newest timestamp
+in the listing, then it halves when a poll finds changes and grows when it finds none (within the
+minimum and maximum), so hot folders are polled often and cold ones rarely. A shared spacing between
+requests bounds the request rate of the whole watch.
+"""
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+import requests
+
+from brm_rest_walk.brm_rest_walk import (
+    FOLDER,
+    Entry,
+    TreeWalker,
+    api_timestamp,
+    autoindex_map,
+    brm_api_root,
+    brm_filters,
+    brm_server,
+    brm_token,
+    brm_user,
+    is_node,
+    join_url,
+    leaf_entry,
+    parse_hrefs,
+)
+from brm_rest_walk.diff import ADDED, REMOVED, Change, compare
+from brm_rest_walk.filters import PathFilter, load_rules, path_filter_for
+
+BRM_WATCH_RATE = "BRM_WATCH_RATE"  # Requests per second of the whole watch
+
+MIN_INTERVAL = 30.0
+MAX_INTERVAL = 6 * 3600.0
+GROWTH = 1.5  # Interval factor after a poll without changes (halved after a poll with changes)
+AGE_FRACTION = 0.1  # A folder last changed an hour ago is first revisited after six minutes
+REQUESTS_PER_SECOND = 2.0
+
+WATCH_STATS = (
+    POLLS := 'polls',
+    NOT_MODIFIED := 'not_modified',
+    CHANGED := 'changed',
+    ERRORS := 'errors',
+)
+
+
+class Folder:  # pylint: disable=too-few-public-methods
+    """Last known state of one watched folder (leaves is None until the baseline listing is known)."""
+
+    __slots__ = ('repository', 'url', 'path', 'path_filter', 'etag', 'last_modified', 'leaves', 'folders', 'interval')
+
+    def __init__(self, repository: str, url: str, path: str, path_filter: Optional[PathFilter], leaves: Optional[Dict[str, Entry]]):
+        self.repository, self.url, self.path, self.path_filter = repository, url, path, path_filter
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.leaves = leaves
+        self.folders: Set[str] = set()
+        self.interval = MIN_INTERVAL
+
+
+class Watcher:
+    """Poll the folders of the repositories (key -> {"url": ...}) and yield the changes found."""
+
+    def __init__(
+        self,
+        walker: TreeWalker,
+        repositories: Dict[str, Dict],
+        filter_for: Optional[Callable[[str], PathFilter]] = None,
+        requests_per_second: float = REQUESTS_PER_SECOND,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Any] = time.sleep,
+    ):
+        if requests_per_second <= 0 or not 0 < min_interval <= max_interval:
+            raise ValueError("Watch needs a positive request rate and 0 < min interval <= max interval")
+        self._walker = walker
+        self._spacing = 1.0 / requests_per_second
+        self.min_interval, self.max_interval = min_interval, max_interval
+        self._clock, self._sleep = clock, sleep
+        self._next_request = clock()
+        self._heap: List = []
+        self._order = itertools.count()
+        self.folders: Dict[str, Folder] = {}
+        self.stats = {stat: 0 for stat in WATCH_STATS}
+        for key, repository in repositories.items():
+            url = repository["url"]
+            self._watch(Folder(url, url, '', filter_for(key) if filter_for else None, None), self._clock())
+
+    def _watch(self, folder: Folder, due: float):
+        self.folders[folder.url] = folder
+        heapq.heappush(self._heap, (due, next(self._order), folder))
+
+    def _unwatch(self, url: str):
+        """Stop watching the folder and everything below (their heap entries go stale and are skipped)."""
+        stack = [url]
+        while stack:
+            folder = self.folders.pop(stack.pop(), None)
+            folder and stack.extend(join_url(folder.url, rel) for rel in folder.folders)
+
+    def _clamp(self, seconds: float) -> float:
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def changes(self, max_polls: Optional[int] = None) -> Iterator[Change]:
+        """Poll due folders (at most max_polls, forever if None) and yield their changes."""
+        polls = 0
+        while self._heap and (max_polls is None or polls < max_polls):
+            due, _, folder = self._heap[0]
+            if self.folders.get(folder.url) is not folder:  # Unwatched, maybe watched again as a new folder
+                heapq.heappop(self._heap)
+                continue
+            now = self._clock()
+            wait = max(due, self._next_request) - now
+            if wait > 0:
+                self._sleep(wait)
+                continue
+            heapq.heappop(self._heap)
+            self._next_request = now + self._spacing
+            polls += 1
+            yield from self._poll(folder)
+
+    def run(self, sink: Callable[[Change], Any], max_polls: Optional[int] = None):
+        """Hand every change to the sink."""
+        for change in self.changes(max_polls):
+            sink(change)
+
+    def _poll(self, folder: Folder) -> List[Change]:
+        """Conditionally request the folder, diff its listing and schedule the next poll."""
+        self.stats[POLLS] += 1
+        try:
+            result = self._walker.revalidate(folder.url, folder.etag, folder.last_modified)
+        except requests.RequestException:
+            self.stats[ERRORS] += 1
+            folder.interval = self._clamp(folder.interval * 2)
+            self._watch(folder, self._clock() + folder.interval)
+            return []
+        changes: List[Change] = []
+        if result is None:
+            self.stats[NOT_MODIFIED] += 1
+            folder.interval = self._clamp(folder.interval * GROWTH)
+        else:
+            text, folder.etag, folder.last_modified = result
+            baseline = folder.leaves is None
+            changes, newest = self._update(folder, text)
+            if baseline:
+                age = self._clock() - newest if newest is not None else self.max_interval / AGE_FRACTION
+                folder.interval = self._clamp(age * AGE_FRACTION)
+            elif changes:
+                self.stats[CHANGED] += 1
+                folder.interval = self._clamp(folder.interval / 2)
+            else:
+                folder.interval = self._clamp(folder.interval * GROWTH)
+        self._watch(folder, self._clock() + folder.interval)
+        return changes
+
+    def _update(self, folder: Folder, text: str):
+        """Replace the known listing of the folder, watch new subfolders and return the changes and the newest timestamp."""
+        hrefs, meta = parse_hrefs(text), autoindex_map(text)
+        path_filter, repository = folder.path_filter, folder.repository
+        leaves: Dict[str, Entry] = {}
+        subfolders: Set[str] = set()
+        stamps = []
+        for rel in hrefs:
+            path = f"{folder.path}{rel}"
+            stamp = api_timestamp(meta.get(rel, {}).get('api_ts'))
+            stamp is not None and stamps.append(stamp)
+            if is_node(rel):
+                if not path_filter or path_filter.admits(path):
+                    leaves[rel] = leaf_entry(repository, path, meta.get(rel, {}))
+            elif rel and '://' not in rel and not (path_filter and path_filter.prunes(path)):
+                subfolders.add(rel)
+        known, changes = folder.leaves, []
+        if known is not None:
+            for rel in sorted(known.keys() | leaves.keys()):
+                old, new = known.get(rel), leaves.get(rel)
+                if old is None:
+                    changes.append(Change(repository, new.path, (ADDED,), None, new))
+                elif new is None:
+                    changes.append(Change(repository, old.path, (REMOVED,), old, None))
+                elif kinds := compare(old, new):
+                    changes.append(Change(repository, new.path, kinds, old, new))
+            for rel in sorted(subfolders - folder.folders):
+                entry = Entry(repository, f"{folder.path}{rel}", FOLDER)
+                changes.append(Change(repository, entry.path, (ADDED,), None, entry))
+            for rel in sorted(folder.folders - subfolders):
+                entry = Entry(repository, f"{folder.path}{rel}", FOLDER)
+                changes.append(Change(repository, entry.path, (REMOVED,), entry, None))
+                self._unwatch(join_url(folder.url, rel))
+        for rel in sorted(subfolders - folder.folders):
+            # Folders appearing after the baseline start empty, so all their content counts as added
+            self._watch(Folder(repository, join_url(folder.url, rel), f"{folder.path}{rel}", path_filter, None if known is None else {}), self._clock())
+        folder.leaves, folder.folders = leaves, subfolders
+        return changes, max(stamps) if stamps else None
+
+
+def change_record(change: Change) -> Dict[str, Any]:
+    """JSON friendly form of a change."""
+    return {
+        'repository': change.repository,
+        'path': change.path,
+        'changes': list(change.changes),
+        'old': change.old._asdict() if change.old else None,
+        'new': change.new._asdict() if change.new else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Watch all (or the given) repositories and print changes as NDJSON until interrupted: [KEY ...]."""
+    argv = argv if argv else sys.argv[1:]
+    if any(arg.startswith('-') for arg in argv):
+        print("ERROR usage: [KEY ...]")
+        return 2
+    walker = TreeWalker(server_url=brm_server, api_root=brm_api_root, username=brm_user, api_token=brm_token)
+    repositories = {key: repository for key, repository in walker.repository_map().items() if not argv or key in argv}
+    rules = load_rules(brm_filters)
+    rate = float(os.getenv(BRM_WATCH_RATE, str(REQUESTS_PER_SECOND)))
+    watcher = Watcher(walker, repositories, lambda key: path_filter_for(rules, key), requests_per_second=rate)
+    try:
+        watcher.run(lambda change: print(json.dumps(change_record(change)), flush=True))
+    except KeyboardInterrupt:
+        print(f"Watch stats: {watcher.stats}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))  # pragma: no cover
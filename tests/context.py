@@ -1,11 +1,20 @@
 """Setting up the context for test."""
 import os
+
+import responses
+
 BRM_FS_ROOT = "."
 BRM_SERVER = "https://example.com/"
 BRM_API_ROOT = "/api/"
 BRM_USER = "none"
 BRM_TOKEN = "0xcafedafe"
 
+BASE_URL = BRM_SERVER.rstrip('/')
+API_BASE_URL = f'{BASE_URL}{BRM_API_ROOT}'
+REPOSITORIES_URL = f'{API_BASE_URL}repositories/'
+REPOSITORY_URL = f'{API_BASE_URL}data'
+STAMP = '22-Aug-2020 09:53'
+
 
 def init():
     """Set some environment variables."""
@@ -18,3 +27,44 @@ def init():
 
 init()
 reset = init
+
+
+class Clock:
+    """Manual clock to inject as clock (and sleep) callable."""
+
+    def __init__(self, now=0.0):
+        self.now = float(now)
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def repository(key='data', url=REPOSITORY_URL, **fields):
+    """Repository record as served by the repositories API."""
+    return {'key': key, 'type': 'LOCAL', 'url': url, **fields}
+
+
+def make_walker(repositories=None, **kwargs):
+    """Tree walker of the test server (registers the repositories response first when given)."""
+    import brm_rest_walk.brm_rest_walk as brm  # pylint: disable=import-outside-toplevel  # reads the environment set by init
+    if repositories is not None:
+        responses.add(responses.GET, REPOSITORIES_URL, json=repositories, status=200)
+    return brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token, **kwargs)
+
+
+def folder_line(name, stamp=STAMP):
+    return f'<a href="{name}/">{name}/</a>       {stamp}  -  -'
+
+
+def leaf_line(name, size='1 kB', stamp=STAMP):
+    return f'<a href="{name}">{name}</a>       {stamp}  {size}'
+
+
+def listing(*names, stamp=STAMP):
+    """Autoindex page of the names (folders end with a slash, leaves are 1 kB)."""
+    return '\n'.join(folder_line(name[:-1], stamp) if name.endswith('/') else leaf_line(name, stamp=stamp) for name in names)
@@ -15,6 +15,8 @@ Some tree info:
         └── b.txt.sha256
 """
 import datetime as dti
+import json
+import time
 import pytest  # type: ignore
 
 import responses
@@ -23,6 +25,9 @@ import requests
 import tests.context as ctx
 
 import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.filters as flt
+import brm_rest_walk.frontier as fro
+import brm_rest_walk.retry as ret
 
 
 def setup():
@@ -757,3 +762,362 @@ def test_tree_walker_ok_tree_edge_leaf_page():
                         }
 
     assert tree == expected_tree
+
+
+@responses.activate
+def test_tree_walker_ok_walk_prunes_before_request():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repositories_url = f'{api_base_url}repositories/'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, repositories_url,
+                  json=[{'key': '1', 'type': 'LOCAL', 'url': repository_url}], status=200)
+    responses.add(responses.GET, repository_url, status=200, body=(
+        '<a href="a.txt">a.txt</a>       22-Aug-2019 09:53  2.50 MB\n'
+        '<a href="b/">b/</a>       22-Aug-2020 09:53  -  -\n'
+        '<a href=".index/">.index/</a>       22-Aug-2020 09:53  -  -'
+    ))
+    responses.add(responses.GET, f'{repository_url}/b/', status=200,
+                  body='<a href="b.txt">b.txt</a>       22-Aug-2020 09:53  1.23 kB')
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    tree = walker.walk(repository_url, path_filter=flt.PathFilter(exclude=['.index']))
+    assert tree[brm.EDGE] == ['a.txt', 'b/', '.index/']
+    assert tree['a.txt'][brm.NODE][brm.NODE] == f'{repository_url}/a.txt'
+    assert tree['a.txt'][brm.NODE][brm.META]['h_size'] == '2.50'
+    assert tree['b/']['b.txt'][brm.NODE][brm.NODE] == f'{repository_url}/b/b.txt'
+    assert '.index/' not in tree
+    assert walker.stats[brm.PRUNED_FOLDERS] == 1
+    assert walker.stats[brm.REQUESTS] == 3
+    assert [call.request.url for call in responses.calls][1:] == [repository_url, f'{repository_url}/b/']
+
+
+def test_join_url_ok_relative_and_absolute():
+    assert brm.join_url('https://example.com/api/data', 'b/') == 'https://example.com/api/data/b/'
+    assert brm.join_url('https://example.com/api/data/', 'b/') == 'https://example.com/api/data/b/'
+    assert brm.join_url('https://example.com/api/data/', 'https://other.com/x/') == 'https://other.com/x/'
+
+
+@responses.activate
+def test_tree_walker_ok_walk_skips_visited_folders():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repositories_url = f'{api_base_url}repositories/'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, repositories_url,
+                  json=[{'key': '1', 'type': 'LOCAL', 'url': repository_url}], status=200)
+    responses.add(responses.GET, repository_url, status=200, body=(
+        '<a href="b/">b/</a>       22-Aug-2020 09:53  -  -\n'
+        '<a href="c/">c/</a>       22-Aug-2020 09:53  -  -'
+    ))
+    responses.add(responses.GET, f'{repository_url}/b/', status=200,
+                  body=f'<a href="{repository_url}/c/">c/</a>       22-Aug-2020 09:53  -  -')
+    responses.add(responses.GET, f'{repository_url}/c/', status=200,
+                  body=f'<a href="{repository_url}/">loop/</a>       22-Aug-2020 09:53  -  -')
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    walker.walk(repository_url)
+    assert walker.stats[brm.REQUESTS] == 4
+    assert walker.stats[brm.DUPLICATE_FOLDERS] == 2
+
+
+@responses.activate
+def test_tree_walker_ok_walk_places_absolute_child_links_and_skips_others():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    responses.add(responses.GET, repository_url, status=200, body='\n'.join((
+        f'<a href="{repository_url}/x/">x/</a>       22-Aug-2020 09:53  -  -',
+        '<a href="https://other.example.com/y/">y/</a>       22-Aug-2020 09:53  -  -',
+    )))
+    responses.add(responses.GET, f'{repository_url}/x/', status=200, body=(
+        '<a href="x.txt">x.txt</a>       22-Aug-2020 09:53  1 kB\n'
+        f'<a href="{repository_url}/x/z/deep/">deep/</a>       22-Aug-2020 09:53  -  -'
+    ))
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    for order in fro.POLICIES:
+        tree = walker.walk(repository_url, order=order)
+        assert set(tree) - set(brm.MARKERS) == {'x/'}
+        assert tree['x/']['x.txt'][brm.NODE][brm.NODE] == f'{repository_url}/x/x.txt'
+    assert all(call.request.url.startswith(repository_url) for call in responses.calls[1:])
+
+
+@responses.activate
+def test_tree_walker_ok_repeated_page_requests_coalesced():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repositories_url = f'{api_base_url}repositories/'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, repositories_url,
+                  json=[{'key': '1', 'type': 'LOCAL', 'url': repository_url}], status=200)
+    responses.add(responses.GET, repository_url, status=200,
+                  body='<a href="a.txt">a.txt</a>       22-Aug-2019 09:53  2.50 MB')
+    for digest in brm.KNOWN_DIGESTS:
+        responses.add(responses.GET, f'{repository_url}/a.txt.{digest}', status=200, body=f'{digest}-value\n')
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    first = walker.repository_page(repository_url)
+    second = walker.repository_page(repository_url)
+    assert first == second and walker.links(repository_url) == ['a.txt']
+    assert walker.hashes(f'{repository_url}/a.txt') == walker.hashes(f'{repository_url}/a.txt')
+    assert walker.stats[brm.REQUESTS] == 1 + 1 + len(brm.KNOWN_DIGESTS)
+
+
+def add_three_folder_tree(repository_url):
+    responses.add(responses.GET, repository_url, status=200, body='\n'.join(
+        f'<a href="{name}/">{name}/</a>       22-Aug-2020 09:53  -  -' for name in 'abc'))
+    for name in 'abc':
+        responses.add(responses.GET, f'{repository_url}/{name}/', status=200,
+                      body=f'<a href="{name}.txt">{name}.txt</a>       22-Aug-2020 09:53  1 kB')
+
+
+@responses.activate
+def test_tree_walker_ok_repeated_walks_on_same_walker():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    add_three_folder_tree(repository_url)
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    first = list(brm.iter_tree({1: {repository_url: walker.walk(repository_url)}}))
+    assert list(brm.iter_tree({1: {repository_url: walker.walk(repository_url)}})) == first and len(first) == 7
+    assert sorted(brm.iter_tree({1: walker.walk_parallel({repository_url: None}, workers=2)})) == sorted(first)
+    entries = [entry.path for entry in walker.iter_entries({'data': {'url': repository_url}})]
+    assert entries == [entry.path for entry in walker.iter_entries({'data': {'url': repository_url}})]
+    assert len(entries) == 7 and walker.stats[brm.DUPLICATE_FOLDERS] == 0
+
+
+@responses.activate
+def test_tree_walker_ok_walk_roots_shares_budget_across_repositories():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    first_url, second_url = f'{api_base_url}one', f'{api_base_url}two'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    add_three_folder_tree(first_url)
+    add_three_folder_tree(second_url)
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    trees = walker.walk_roots({first_url: None, second_url: None}, fro.PRIORITY, budget=brm.Budget(max_requests=4))
+    assert [call.request.url for call in responses.calls][1:3] == [first_url, second_url]
+    assert all(brm.EDGE in tree and brm.PENDING not in tree for tree in trees.values())
+    assert sum(1 for tree in trees.values() for _ in brm.pending_folders(tree)) == 6 - 2
+    resumed = walker.walk_roots({first_url: None, second_url: None}, fro.PRIORITY, resume=json.loads(json.dumps(trees)))
+    assert not any(True for tree in resumed.values() for _ in brm.pending_folders(tree))
+    assert len(list(brm.iter_tree({1: resumed}))) == 2 * 7
+
+
+def test_subtree_costs_ok_sums_below_folders():
+    tree = {'1': {'r': {
+        brm.EDGE: ['a/', 'x.txt'], brm.COST: {brm.SECONDS: 1.0, brm.CHILDREN: 2},
+        'x.txt': {brm.NODE: {brm.NODE: 'r/x.txt', brm.META: {}}},
+        'a/': {brm.EDGE: ['b/'], brm.COST: {brm.SECONDS: 2.0, brm.CHILDREN: 1},
+               'b/': {brm.EDGE: [], brm.COST: {brm.SECONDS: 4.0, brm.CHILDREN: 0}}},
+    }}}
+    costs = brm.subtree_costs(tree)
+    assert costs[('r', '')] == {brm.SECONDS: 7.0, brm.CHILDREN: 3, brm.FOLDERS: 3}
+    assert costs[('r', 'a/')] == {brm.SECONDS: 6.0, brm.CHILDREN: 1, brm.FOLDERS: 2}
+    assert costs[('r', 'a/b/')][brm.FOLDERS] == 1
+    assert [entry.path for entry in brm.iter_tree(tree) if entry.kind == brm.FOLDER] == ['', 'a/', 'a/b/']
+
+
+@responses.activate
+def test_tree_walker_ok_walk_parallel_schedules_by_history():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    add_three_folder_tree(repository_url)
+    history = {(repository_url, ''): {brm.SECONDS: 9.0}, (repository_url, 'c/'): {brm.SECONDS: 5.0}, (repository_url, 'a/'): {brm.SECONDS: 1.0}}
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    trees = walker.walk_parallel({repository_url: None}, workers=1, history=history)
+    requested = [call.request.url for call in responses.calls][1:]
+    assert requested == [repository_url, f'{repository_url}/c/', f'{repository_url}/b/', f'{repository_url}/a/']
+    assert trees[repository_url][brm.COST][brm.CHILDREN] == 3
+    assert trees[repository_url]['b/']['b.txt'][brm.NODE][brm.NODE] == f'{repository_url}/b/b.txt'
+
+
+@responses.activate
+def test_tree_walker_ok_walk_parallel_matches_walk():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    add_three_folder_tree(repository_url)
+
+    def make_walker():
+        return brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+
+    sequential = list(brm.iter_tree({1: {repository_url: make_walker().walk(repository_url)}}))
+    parallel = list(brm.iter_tree({1: make_walker().walk_parallel({repository_url: None}, workers=3)}))
+    assert sorted(parallel) == sorted(sequential)
+
+
+@responses.activate
+def test_tree_walker_nok_walk_parallel_propagates_errors():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    responses.add(responses.GET, repository_url, status=500)
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    with pytest.raises(requests.HTTPError, match=r"500 Server Error"):
+        walker.walk_parallel({repository_url: None}, workers=2)
+
+
+@responses.activate
+def test_tree_walker_ok_walk_spilling_frontier_matches_in_memory():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    add_three_folder_tree(repository_url)
+
+    def make_walker():
+        return brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+
+    in_memory = make_walker().walk(repository_url)
+    responses.calls.reset()
+    spilled = make_walker().walk(repository_url, order=fro.BFS, max_in_memory=2)
+    assert [call.request.url for call in responses.calls][1:] == [repository_url] + [f'{repository_url}/{name}/' for name in 'abc']
+    assert list(brm.iter_tree({1: {repository_url: spilled}})) == list(brm.iter_tree({1: {repository_url: in_memory}}))
+
+
+def add_dated_tree(repository_url):
+    responses.add(responses.GET, repository_url, status=200, body='\n'.join((
+        '<a href="old/">old/</a>       22-Aug-2018 09:53  -  -',
+        '<a href="new/">new/</a>       22-Aug-2020 09:53  -  -',
+    )))
+    responses.add(responses.GET, f'{repository_url}/new/', status=200, body='\n'.join((
+        '<a href="n.txt">n.txt</a>       22-Aug-2020 09:53  1 kB',
+        '<a href="deep/">deep/</a>       22-Aug-2020 09:53  -  -',
+    )))
+    responses.add(responses.GET, f'{repository_url}/old/', status=200, body='<a href="o.txt">o.txt</a>       22-Aug-2018 09:53  1 kB')
+    responses.add(responses.GET, f'{repository_url}/new/deep/', status=200, body='<a href="d.txt">d.txt</a>       22-Aug-2020 09:53  1 kB')
+
+
+@responses.activate
+def test_tree_walker_ok_walk_budget_marks_pending_and_resumes():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    add_dated_tree(repository_url)
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    partial = walker.walk(repository_url, order=fro.PRIORITY, budget=brm.Budget(max_requests=2))
+    assert [call.request.url for call in responses.calls][1:] == [repository_url, f'{repository_url}/new/']
+    assert partial['old/'] == {brm.PENDING: f'{repository_url}/old/'}
+    assert partial['new/']['deep/'] == {brm.PENDING: f'{repository_url}/new/deep/'}
+    assert sorted(brm.pending_folders(partial)) == [(f'{repository_url}/new/deep/', 'new/deep/'), (f'{repository_url}/old/', 'old/')]
+    assert sorted(entry.path for entry in brm.iter_tree({1: {repository_url: partial}})) == ['', 'new/', 'new/deep/', 'new/n.txt', 'old/']
+
+    resumed = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    complete = resumed.walk(repository_url, order=fro.PRIORITY, resume=json.loads(json.dumps(partial)))
+    assert resumed.stats[brm.REQUESTS] == 1 + 2
+    assert not list(brm.pending_folders(complete))
+    assert complete['old/']['o.txt'][brm.NODE][brm.NODE] == f'{repository_url}/old/o.txt'
+    assert complete['new/']['deep/']['d.txt'][brm.NODE][brm.NODE] == f'{repository_url}/new/deep/d.txt'
+
+
+@responses.activate
+def test_tree_walker_ok_walk_exhausted_budget_leaves_root_pending():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    assert walker.walk(repository_url, budget=brm.Budget(seconds=0.0)) == {brm.PENDING: repository_url}
+    assert walker.stats[brm.REQUESTS] == 1
+
+
+def test_budget_ok_counts_requests_since_first_check_and_deadline():
+    budget = brm.Budget(max_requests=3)
+    assert not budget.exhausted(10) and not budget.exhausted(12)
+    assert budget.exhausted(13)
+    assert not brm.Budget().exhausted(10 ** 9)
+    assert brm.Budget(seconds=-1.0).exhausted(0)
+
+
+def test_freshness_ok_shallow_then_recent():
+    day = brm.SECONDS_PER_DAY
+    assert brm.freshness('a/', 10 * day) > brm.freshness('a/b/', 20 * day)
+    assert brm.freshness('a/', 20 * day) > brm.freshness('b/', 10 * day)
+
+
+def test_freshness_ok_unknown_timestamps_rank_by_depth():
+    recent = int(time.time()) - brm.SECONDS_PER_DAY
+    assert brm.freshness('a/') == brm.freshness('b/') > brm.freshness('a/x/', recent)
+    assert brm.freshness('') > brm.freshness('a/', recent) and brm.freshness('a/') > brm.freshness('b/', 0)
+
+
+def no_backoff_retries():
+    return ret.RetryQueue({ret.TRANSIENT: ret.RetryPolicy(3, 0.0, 0.0)})
+
+
+@responses.activate
+def test_tree_walker_ok_walk_retries_transient_and_dead_letters_missing():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    responses.add(responses.GET, repository_url, status=200, body='\n'.join(
+        f'<a href="{name}/">{name}/</a>       22-Aug-2020 09:53  -  -' for name in 'abc'))
+    responses.add(responses.GET, f'{repository_url}/a/', status=503)
+    responses.add(responses.GET, f'{repository_url}/a/', status=200, body='<a href="a.txt">a.txt</a>       22-Aug-2020 09:53  1 kB')
+    responses.add(responses.GET, f'{repository_url}/b/', status=404)
+    responses.add(responses.GET, f'{repository_url}/c/', status=200, body='<a href="c.txt">c.txt</a>       22-Aug-2020 09:53  1 kB')
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    retries = no_backoff_retries()
+    tree = walker.walk(repository_url, retries=retries)
+    assert tree['a/']['a.txt'][brm.NODE][brm.NODE] == f'{repository_url}/a/a.txt'
+    assert tree['b/'] == {brm.FAILED: ret.MISSING}
+    assert 'c.txt' in tree['c/']
+    assert [(letter.path, letter.error_class) for letter in retries.dead_letters] == [('b/', ret.MISSING)]
+    assert walker.stats[brm.REQUESTS] == 1 + 1 + 2 + 1 + 1
+    assert walker.stats[brm.RETRIES] == 1 and walker.stats[brm.DEAD_LETTERS] == 1
+    assert sorted(entry.path for entry in brm.iter_tree({1: {repository_url: tree}})) == ['', 'a/', 'a/a.txt', 'b/', 'c/', 'c/c.txt']
+
+
+@responses.activate
+def test_tree_walker_ok_walk_retry_wait_capped_by_budget():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    responses.add(responses.GET, repository_url, status=503, headers={'Retry-After': '3'})
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    started = time.monotonic()
+    tree = walker.walk(repository_url, budget=brm.Budget(seconds=0.2), retries=ret.RetryQueue())
+    assert time.monotonic() - started < 1.0
+    assert tree == {brm.PENDING: repository_url}
+    assert walker.stats[brm.REQUESTS] == 1 + 1
+
+
+def test_budget_ok_capped_by_deadline():
+    assert brm.Budget().capped(300.0) == 300.0
+    assert brm.Budget(seconds=-1.0).capped(300.0) == 0.0
+    assert brm.Budget(seconds=60.0).capped(1.0) == 1.0
+
+
+@responses.activate
+def test_tree_walker_ok_walk_parallel_retries_instead_of_raising():
+    base_url = ctx.BRM_SERVER.rstrip('/')
+    api_base_url = f'{base_url}{ctx.BRM_API_ROOT}'
+    repository_url = f'{api_base_url}data'
+    responses.add(responses.GET, f'{api_base_url}repositories/', json=[], status=200)
+    responses.add(responses.GET, repository_url, status=500)
+    add_three_folder_tree(repository_url)
+
+    walker = brm.TreeWalker(server_url=brm.brm_server, api_root=brm.brm_api_root, username=brm.brm_user, api_token=brm.brm_token)
+    retries = no_backoff_retries()
+    trees = walker.walk_parallel({repository_url: None}, workers=2, retries=retries)
+    assert sorted(trees[repository_url][brm.EDGE]) == ['a/', 'b/', 'c/']
+    assert trees[repository_url]['c/']['c.txt'][brm.NODE][brm.NODE] == f'{repository_url}/c/c.txt'
+    assert not retries.dead_letters and walker.stats[brm.RETRIES] == 1
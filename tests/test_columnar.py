@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import pytest  # type: ignore
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.columnar as col
+import brm_rest_walk.diff as dif
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+REPOSITORY = 'https://example.com/api/data'
+
+
+def sample_entries(count):
+    yield brm.Entry(REPOSITORY, '', brm.FOLDER)
+    yield brm.Entry(REPOSITORY, 'a/', brm.FOLDER)
+    for n in range(count):
+        yield brm.Entry(REPOSITORY, f'a/{n:04d}.txt', brm.LEAF, n * 10, 1598089980 + n, {brm.SHA1: f'{n:040x}'} if n % 2 else {})
+
+
+@pytest.mark.parametrize('suffix', col.FORMATS)
+def test_write_columnar_ok_round_trip(tmp_path, suffix):
+    path = str(tmp_path / f'entries{suffix}')
+    entries = list(sample_entries(25))
+    assert col.write_columnar(path, iter(entries), batch_rows=10) == 27
+    assert list(col.read_columnar(path)) == entries
+
+
+def test_write_columnar_ok_typed_columns_and_row_groups(tmp_path):
+    path = str(tmp_path / 'entries.parquet')
+    col.write_columnar(path, sample_entries(25), batch_rows=10)
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3 and parquet.metadata.num_rows == 27
+    table = parquet.read(columns=['depth', 'size', 'ts'])
+    assert table.schema.field('depth').type == pa.int16()
+    assert pa.types.is_timestamp(table.schema.field('ts').type) and table.schema.field('ts').type.tz == 'UTC'
+    assert table.column('depth').to_pylist()[:3] == [0, 1, 2]
+
+
+def test_read_batches_ok_memory_mapped_ipc_column_subset(tmp_path):
+    path = str(tmp_path / 'entries.arrow')
+    with col.ColumnarWriter(path, batch_rows=4) as writer:
+        for entry in sample_entries(6):
+            writer.write(entry)
+    assert writer.batches == 2
+    batches = list(col.read_batches(path, columns=['path', 'sha1']))
+    assert [batch.num_rows for batch in batches] == [4, 4]
+    assert batches[0].schema.names == ['path', 'sha1']
+    assert batches[1].column('sha1').to_pylist()[-1] == f'{5:040x}'
+
+
+def test_columnar_nok_format_and_batch_rows(tmp_path):
+    with pytest.raises(ValueError, match='Unknown columnar target'):
+        col.ColumnarWriter(str(tmp_path / 'entries.csv'))
+    with pytest.raises(ValueError, match='Batch rows'):
+        col.ColumnarWriter(str(tmp_path / 'entries.arrow'), batch_rows=0)
+
+
+def test_main_ok_exports_ndjson(tmp_path, capsys):
+    source, target = str(tmp_path / 'entries.ndjson'), str(tmp_path / 'entries.parquet')
+    dif.write_ndjson(source, sample_entries(3))
+    assert col.main([source, target]) == 0
+    assert 'Exported 5 entries' in capsys.readouterr().out
+    assert [entry.path for entry in col.read_columnar(target)] == ['', 'a/', 'a/0000.txt', 'a/0001.txt', 'a/0002.txt']
+    assert col.main([source]) == 2
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import json
+
+import pytest  # type: ignore
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.diff as dif
+import brm_rest_walk.snapshot as snap
+
+REPO = 'https://example.com/api/data'
+
+OLD = [
+    brm.Entry(REPO, '', brm.FOLDER),
+    brm.Entry(REPO, 'a.txt', brm.LEAF, 10, 6000, {brm.SHA1: 'aa' * 20}),
+    brm.Entry(REPO, 'b/', brm.FOLDER),
+    brm.Entry(REPO, 'b/gone.txt', brm.LEAF, 5, 6000),
+    brm.Entry(REPO, 'b/same.txt', brm.LEAF, 5, 6000, {brm.SHA1: 'bb' * 20}),
+    brm.Entry(REPO, 'c.txt', brm.LEAF, 7, 6000, {brm.SHA1: 'cc' * 20}),
+]
+NEW = [
+    brm.Entry(REPO, '', brm.FOLDER),
+    brm.Entry(REPO, 'a.txt', brm.LEAF, 11, 12000, {brm.SHA1: 'aa' * 20}),
+    brm.Entry(REPO, 'b/', brm.FOLDER),
+    brm.Entry(REPO, 'b/new.txt', brm.LEAF, 1, 18000),
+    brm.Entry(REPO, 'b/same.txt', brm.LEAF, 5, 6000, {brm.SHA1: 'bb' * 20, brm.MD5: 'ee' * 16}),
+    brm.Entry(REPO, 'c.txt', brm.LEAF, 7, 6000, {brm.SHA1: 'dd' * 20}),
+]
+
+
+def test_diff_ok_changes():
+    changes = [(change.path, change.changes) for change in dif.diff(OLD, NEW)]
+    assert changes == [
+        ('a.txt', (dif.RESIZED, dif.RETIMED)),
+        ('b/gone.txt', (dif.REMOVED,)),
+        ('b/new.txt', (dif.ADDED,)),
+        ('c.txt', (dif.DIGEST_CHANGED,)),
+    ]
+
+
+def test_diff_ok_empty_sides():
+    assert [change.changes for change in dif.diff([], OLD[:2])] == [(dif.ADDED,), (dif.ADDED,)]
+    assert [change.changes for change in dif.diff(OLD[:1], [])] == [(dif.REMOVED,)]
+    assert list(dif.diff([], [])) == []
+
+
+def test_diff_nok_unsorted():
+    with pytest.raises(ValueError, match=r"The new entries are not strictly sorted"):
+        list(dif.diff(OLD, list(reversed(NEW))))
+
+
+def test_rollup_ok_per_repository_and_folder():
+    per_repository, per_folder = dif.rollup(dif.diff(OLD, NEW))
+    assert per_repository[REPO] == {dif.RESIZED: 1, dif.RETIMED: 1, dif.REMOVED: 1, dif.ADDED: 1, dif.DIGEST_CHANGED: 1}
+    assert per_folder[(REPO, 'b/')] == {dif.REMOVED: 1, dif.ADDED: 1}
+    assert per_folder[(REPO, '')][dif.DIGEST_CHANGED] == 1
+
+
+def test_parent_folder_ok():
+    assert dif.parent_folder('a.txt') == ''
+    assert dif.parent_folder('b/c/') == 'b/'
+    assert dif.parent_folder('b/c/d.txt') == 'b/c/'
+
+
+def test_open_entries_ok_sources_agree(tmp_path):
+    ndjson, snapshot, tree_json = str(tmp_path / 'old.ndjson'), str(tmp_path / 'old.snap'), tmp_path / 'old.json'
+    assert dif.write_ndjson(ndjson, reversed(OLD)) == len(OLD)
+    snap.write_snapshot(snapshot, OLD)
+    tree_json.write_text(json.dumps(brm.build_tree(OLD)), encoding='utf-8')
+    assert list(dif.open_entries(ndjson)) == OLD
+    assert list(dif.open_entries(snapshot)) == OLD
+    assert list(dif.diff(dif.open_entries(str(tree_json)), dif.open_entries(snapshot))) == []
+
+
+def test_open_entries_nok_unknown_suffix():
+    with pytest.raises(ValueError, match=r"Unknown entry source \(tree.txt\)"):
+        dif.open_entries('tree.txt')
+
+
+def test_main_ok_prints_changes(tmp_path, capsys):
+    old, new = str(tmp_path / 'old.ndjson'), str(tmp_path / 'new.ndjson')
+    dif.write_ndjson(old, OLD)
+    dif.write_ndjson(new, NEW)
+    assert dif.main([old, new]) == 0
+    assert 'removed https://example.com/api/data b/gone.txt' in capsys.readouterr().out
+
+
+def test_main_nok_usage():
+    assert dif.main(['only-one']) == 2
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import pytest  # type: ignore
+
+import requests
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.distributed as dist
+import brm_rest_walk.filters as flt
+import brm_rest_walk.retry as ret
+
+
+def add_tree_responses():
+    responses.add(responses.GET, ctx.REPOSITORIES_URL, json=[ctx.repository()], status=200)
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200,
+                  body='\n'.join((ctx.leaf_line('a.txt', '2.50 MB', '22-Aug-2019 09:53'), ctx.folder_line('b'), ctx.folder_line('c'))))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=200, body=ctx.leaf_line('b.txt', '1.23 kB'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/c/', status=200, body=ctx.listing('d/'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/c/d/', status=200, body=ctx.leaf_line('d.txt', '3 kB'))
+
+
+def without_costs(branch):
+    return {rel: without_costs(child) if isinstance(child, dict) and brm.NODE not in child else child
+            for rel, child in branch.items() if rel != brm.COST}
+
+
+def test_hash_ring_nok_no_workers():
+    with pytest.raises(ValueError, match=r"Need at least one worker for the hash ring"):
+        dist.HashRing([])
+
+
+def test_hash_ring_ok_stable_and_prefix_grouped():
+    ring = dist.HashRing(['w1', 'w2', 'w3'])
+    owner = ring.owner('repo', 'com/ourcorp/')
+    assert owner in ('w1', 'w2', 'w3')
+    assert ring.owner('repo', 'com/ourcorp/deep/er/') == owner
+    assert dist.HashRing(['w3', 'w1', 'w2']).owner('repo', 'com/ourcorp/') == owner
+
+
+def test_work_queue_ok_claim_steal_and_complete(tmp_path):
+    queue = dist.WorkQueue(str(tmp_path / 'frontier.db'))
+    queue.register(['w1', 'w2'])
+    queue.push([(f'u{n}', 'repo', 'key', f'p{n}/') for n in range(8)])
+    queue.push([('u0', 'repo', 'key', 'p0/')])
+    assert queue.counts() == {dist.PENDING: 8, dist.CLAIMED: 0, dist.DONE: 0, dist.FAILED: 0}
+    claimed = []
+    while (item := queue.claim('w1')) is not None:
+        claimed.append(item[0])
+        queue.complete(item[0], [])
+    assert sorted(claimed) == sorted(f'u{n}' for n in range(8))  # owned first then stolen
+    assert queue.finished()
+    queue.close()
+
+
+def test_work_queue_ok_claims_most_expensive_first(tmp_path):
+    queue = dist.WorkQueue(str(tmp_path / 'frontier.db'))
+    queue.register(['w1'])
+    queue.push([('cheap', 'repo', 'key', 'a/', 1.0), ('unknown', 'repo', 'key', 'b/'), ('expensive', 'repo', 'key', 'c/', 99.0)])
+    assert [queue.claim('w1')[0] for _ in range(3)] == ['expensive', 'cheap', 'unknown']
+    queue.close()
+
+
+def test_work_queue_ok_expired_lease_requeued(tmp_path):
+    queue = dist.WorkQueue(str(tmp_path / 'frontier.db'), lease_seconds=-1.0)
+    queue.register(['w1'])
+    queue.push([('u', 'repo', 'key', '')])
+    assert queue.claim('w1')[0] == 'u'
+    assert not queue.finished()
+    assert queue.claim('w1')[0] == 'u'  # the first claim expired immediately
+    queue.close()
+
+
+@responses.activate
+def test_run_worker_ok_two_workers_merge(tmp_path):
+    add_tree_responses()
+    store = str(tmp_path / 'frontier.db')
+    coordinator = dist.WorkQueue(store)
+    walker = ctx.make_walker()
+    dist.seed(coordinator, walker.repository_map(), ['w1', 'w2'])
+    outputs = [str(tmp_path / 'w1.ndjson'), str(tmp_path / 'w2.ndjson')]
+    processed = 0
+    for worker, output in zip(('w1', 'w2'), outputs):
+        processed += dist.run_worker(ctx.make_walker(), dist.WorkQueue(store), worker, output, idle_sleep=0.0)
+    assert processed == 4
+    assert coordinator.finished()
+
+    tree = dist.merge_outputs(outputs)
+    local_tree = ctx.make_walker().walk(ctx.REPOSITORY_URL)
+    assert without_costs(tree) == without_costs({1: {ctx.REPOSITORY_URL: local_tree}})
+    assert tree[1][ctx.REPOSITORY_URL]['c/'][brm.COST][brm.CHILDREN] == 1
+
+
+@responses.activate
+def test_run_worker_ok_filter_prunes(tmp_path):
+    add_tree_responses()
+    store = str(tmp_path / 'frontier.db')
+    queue = dist.WorkQueue(store)
+    walker = ctx.make_walker()
+    dist.seed(queue, walker.repository_map(), ['w1'])
+    output = str(tmp_path / 'w1.ndjson')
+    processed = dist.run_worker(walker, queue, 'w1', output, lambda key: flt.PathFilter(exclude=['c/']), idle_sleep=0.0)
+    assert processed == 2
+    assert walker.stats[brm.PRUNED_FOLDERS] == 1
+    assert 'c/' not in dist.merge_outputs([output])[1][ctx.REPOSITORY_URL]
+
+
+@responses.activate
+def test_run_worker_ok_retries_transient_and_dead_letters_missing(tmp_path):
+    add_tree_responses()
+    responses.replace(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=503)
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=200, body='<a href="b.txt">b.txt</a>       22-Aug-2020 09:53  1.23 kB')
+    responses.replace(responses.GET, f'{ctx.REPOSITORY_URL}/c/', status=404)
+    store = str(tmp_path / 'frontier.db')
+    queue = dist.WorkQueue(store, policies={ret.TRANSIENT: ret.RetryPolicy(3, 0.0, 0.0)})
+    walker = ctx.make_walker()
+    dist.seed(queue, walker.repository_map(), ['w1'])
+    output = str(tmp_path / 'w1.ndjson')
+    assert dist.run_worker(walker, queue, 'w1', output, idle_sleep=0.0) == 2
+    assert queue.finished() and queue.counts()[dist.FAILED] == 1
+    assert walker.stats[brm.RETRIES] == 1 and walker.stats[brm.DEAD_LETTERS] == 1
+    assert [(letter.path, letter.error_class, letter.attempts) for letter in queue.dead_letters()] == [('c/', ret.MISSING, 1)]
+    tree = dist.merge_outputs([output])[1][ctx.REPOSITORY_URL]
+    assert tree['c/'] == {brm.FAILED: ret.MISSING} and 'b.txt' in tree['b/']
+
+
+def test_work_queue_ok_failed_folder_due_after_backoff(tmp_path):
+    queue = dist.WorkQueue(str(tmp_path / 'frontier.db'))
+    queue.register(['w1'])
+    queue.push([('u', 'repo', 'key', '')])
+    assert queue.claim('w1')[0] == 'u'
+    assert queue.fail('u', requests.ConnectionError('down'))
+    assert queue.claim('w1') is None and not queue.finished()
+    queue.close()
+
+
+def test_main_nok_usage():
+    assert dist.main(['nonsense', 'store', 'x']) == 2
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import pytest  # type: ignore
+
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.duplicates as dup
+
+ONE_URL, TWO_URL = f'{ctx.API_BASE_URL}one', f'{ctx.API_BASE_URL}two'
+REPOSITORIES = [ctx.repository('one', ONE_URL), ctx.repository('two', TWO_URL)]
+SHA_A, SHA_B = 'a' * 64, 'b' * 64
+
+
+@responses.activate
+def test_duplicate_index_ok_digests_only_on_size_collision():
+    walker = ctx.make_walker(REPOSITORIES)
+    responses.add(responses.GET, ONE_URL, status=200, body='\n'.join((ctx.leaf_line('lib.jar', '2 MB'), ctx.leaf_line('solo.tgz', '7 MB'))))
+    responses.add(responses.GET, TWO_URL, status=200, body='\n'.join((ctx.leaf_line('copy.jar', '2 MB'), ctx.leaf_line('other.jar', '2 MB'))))
+    responses.add(responses.GET, f'{ONE_URL}/lib.jar.sha256', status=200, body=f'{SHA_A}  lib.jar\n')
+    responses.add(responses.GET, f'{TWO_URL}/copy.jar.sha256', status=200, body=SHA_A.upper())
+    responses.add(responses.GET, f'{TWO_URL}/other.jar.sha256', status=404)
+
+    index = dup.DuplicateIndex(walker).update(walker.iter_entries(walker.repositories))
+    groups = list(index.groups())
+    assert len(groups) == 1
+    group = groups[0]
+    assert (group.digest, group.value, group.size) == (brm.SHA256, SHA_A, 2 << 20)
+    assert [entry.url for entry in group.copies] == [f'{ONE_URL}/lib.jar', f'{TWO_URL}/copy.jar']
+    assert group.reclaimable == 2 << 20
+    assert index.report() == [dup.RepositoryWaste(TWO_URL, 1, 2 << 20)]
+    assert index.stats == {dup.LEAVES: 4, dup.DIGEST_REQUESTS: 3, dup.UNRESOLVED: 1}
+    assert not any(call.request.url.startswith(f'{ONE_URL}/solo.tgz') for call in responses.calls)
+
+
+def test_duplicate_index_ok_known_digests_need_no_walker():
+    def leaf(repository, path, size, digests):
+        return brm.Entry(repository, path, brm.LEAF, size, None, digests)
+    index = dup.DuplicateIndex(digest=brm.SHA1)
+    index.update([
+        brm.Entry(ONE_URL, '', brm.FOLDER),
+        leaf(ONE_URL, 'a.tgz', 10, {brm.SHA1: 'f' * 40, brm.MD5: '0' * 32}),
+        leaf(TWO_URL, 'a.tgz', 10, {brm.SHA1: 'F' * 40}),
+        leaf(TWO_URL, 'b.tgz', 10, {brm.SHA1: f"{'F' * 40}  b.tgz"}),
+        leaf(ONE_URL, 'c.tgz', 10, {brm.MD5: '0' * 32}),
+        leaf(ONE_URL, 'd.tgz', 99, {brm.SHA1: 'f' * 40}),
+    ])
+    [group] = index.groups()
+    assert [entry.path for entry in group.copies] == ['a.tgz', 'a.tgz', 'b.tgz']
+    assert group.copies[0].repository == ONE_URL and group.reclaimable == 20
+    assert index.report() == [dup.RepositoryWaste(TWO_URL, 2, 20)]
+    assert index.stats[dup.UNRESOLVED] == 1 and index.stats[dup.LEAVES] == 5
+
+
+@responses.activate
+def test_duplicate_index_ok_agreed_digest_groups_metadata_and_sidecar_copies():
+    walker = ctx.make_walker(REPOSITORIES)
+    npm_copy = brm.Entry(ONE_URL, 'pkg/-/pkg-1.0.0.tgz', brm.LEAF, 2048, None, {brm.SHA1: 'f' * 40})
+    sidecar_copy = brm.Entry(TWO_URL, 'pkg-1.0.0.tgz', brm.LEAF, 2048, None, {brm.SHA256: SHA_B})
+    responses.add(responses.GET, f'{npm_copy.url}.sha256', status=200, body=f'{SHA_B}  pkg-1.0.0.tgz')
+    [group] = dup.DuplicateIndex(walker).update([npm_copy, sidecar_copy]).groups()
+    assert group.copies == [npm_copy, sidecar_copy] and group.value == SHA_B
+
+
+def test_duplicate_index_nok_unknown_digest():
+    with pytest.raises(ValueError, match='Unknown digest'):
+        dup.DuplicateIndex(digest='crc32')
+
+
+def test_main_nok_usage(capsys):
+    assert dup.main(['--all']) == 2
+    assert 'ERROR usage' in capsys.readouterr().out
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import json
+
+import pytest  # type: ignore
+
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.enumerators as enu
+import brm_rest_walk.filters as flt
+
+SHA256 = 'a' * 64
+
+
+def add_page(path, *lines):
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/{path}' if path else ctx.REPOSITORY_URL, status=200, body='\n'.join(lines))
+
+
+def requested():
+    return [call.request.url.replace(f'{ctx.REPOSITORY_URL}/', '') for call in responses.calls][1:]
+
+
+def test_strategy_registry_ok_case_insensitive_and_unknown():
+    assert enu.strategy_for('Maven') is None
+    assert enu.strategy_for('NPM') is enu.npm_entries and enu.strategy_for('pypi') is enu.pypi_entries
+    assert enu.strategy_for('Generic') is None and enu.strategy_for(None) is None
+
+
+def test_iso_timestamp_ok_and_nok():
+    assert enu.iso_timestamp('2020-08-22T09:53:00.000Z') == 1598089980
+    assert enu.iso_timestamp('yesterday') is None and enu.iso_timestamp(None) is None
+
+
+@responses.activate
+def test_enumerate_entries_ok_npm_package_documents_and_fallback():
+    walker = ctx.make_walker([ctx.repository(packageType='npm')])
+    add_page('', ctx.folder_line('left-pad'), ctx.folder_line('broken'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/left-pad', status=200, json={
+        'name': 'left-pad',
+        'time': {'1.0.0': '2020-08-22T09:53:00.000Z'},
+        'versions': {
+            '1.0.0': {'dist': {'tarball': f'{ctx.REPOSITORY_URL}/left-pad/-/left-pad-1.0.0.tgz', 'shasum': 'f' * 40}},
+            '1.1.0': {'dist': {'tarball': 'https://elsewhere.example.com/npm/left-pad/-/left-pad-1.1.0.tgz'}},
+        },
+    })
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/broken', status=404)
+    add_page('broken/', ctx.folder_line('-'))
+    add_page('broken/-/', ctx.leaf_line('broken-0.1.0.tgz'))
+
+    entries = list(enu.enumerate_entries(walker, walker.repositories))
+    assert [(entry.path, entry.kind) for entry in entries] == [
+        ('', brm.FOLDER),
+        ('left-pad/', brm.FOLDER), ('left-pad/-/', brm.FOLDER),
+        ('left-pad/-/left-pad-1.0.0.tgz', brm.LEAF), ('left-pad/-/left-pad-1.1.0.tgz', brm.LEAF),
+        ('broken/', brm.FOLDER), ('broken/-/', brm.FOLDER), ('broken/-/broken-0.1.0.tgz', brm.LEAF),
+    ]
+    assert entries[3].digests == {brm.SHA1: 'f' * 40} and entries[3].ts == 1598089980
+    assert requested() == [ctx.REPOSITORY_URL, 'left-pad', 'broken', 'broken/', 'broken/-/']
+    assert walker.stats[brm.METADATA_FALLBACKS] == 1
+
+
+def test_npm_package_nok_inconsistent_document():
+    class Walker:
+        stats = {brm.SKIPPED_LEAVES: 0}
+
+        @staticmethod
+        def document(url):
+            return {'name': 'other', 'versions': {'1.0.0': {}}} if url.endswith('left-pad') else {'versions': {}}
+
+    with pytest.raises(enu.MetadataError, match='another package'):
+        enu.npm_package(Walker, ctx.REPOSITORY_URL, 'left-pad/')
+    with pytest.raises(enu.MetadataError, match='no versions'):
+        enu.npm_package(Walker, ctx.REPOSITORY_URL, 'right-pad/')
+
+
+@responses.activate
+def test_enumerate_entries_ok_pypi_simple_index():
+    walker = ctx.make_walker([ctx.repository(packageType='PyPI')])
+    add_page('simple/', '<a href="demo/">demo</a>')
+    add_page('simple/demo/',
+             f'<a href="../../packages/ab/demo-1.0.tar.gz#sha256={SHA256}">demo-1.0.tar.gz</a>',
+             '<a href="../../packages/cd/demo-1.0-py3-none-any.whl">demo-1.0-py3-none-any.whl</a>')
+
+    entries = list(enu.enumerate_entries(walker, walker.repositories, lambda key: flt.PathFilter(exclude=['*.whl'])))
+    assert [(entry.path, entry.kind) for entry in entries] == [
+        ('', brm.FOLDER), ('packages/', brm.FOLDER), ('packages/ab/', brm.FOLDER), ('packages/ab/demo-1.0.tar.gz', brm.LEAF),
+    ]
+    assert entries[-1].digests == {brm.SHA256: SHA256}
+    assert requested() == ['simple/', 'simple/demo/']
+    assert walker.stats[brm.SKIPPED_LEAVES] == 1
+
+
+@responses.activate
+def test_enumerate_entries_ok_pypi_falls_back_without_simple_index():
+    walker = ctx.make_walker([ctx.repository(packageType='pypi')])
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/simple/', status=404)
+    add_page('', ctx.folder_line('packages'))
+    add_page('packages/', ctx.leaf_line('demo-1.0.tar.gz'))
+
+    entries = list(enu.enumerate_entries(walker, walker.repositories))
+    assert [entry.path for entry in entries] == ['', 'packages/', 'packages/demo-1.0.tar.gz']
+    assert entries[-1].size == 1024
+    assert walker.stats[brm.METADATA_FALLBACKS] == 1
+
+
+@responses.activate
+def test_enumerate_entries_ok_generic_uses_autoindex():
+    walker = ctx.make_walker([ctx.repository(packageType='generic')])
+    add_page('', ctx.leaf_line('a.txt'))
+    assert [entry.path for entry in enu.enumerate_entries(walker, walker.repositories)] == ['', 'a.txt']
+
+
+def test_main_nok_usage():
+    assert enu.main(['out.json']) == 2
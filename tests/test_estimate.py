@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import math
+import random
+
+import pytest  # type: ignore
+
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.estimate as est
+
+
+def add_uniform_tree(fanout, depth, leaves):
+    """Every folder above depth has fanout subfolders, the folders at depth carry the leaves."""
+    frontier = [(ctx.REPOSITORY_URL, 0)]
+    while frontier:
+        url, level = frontier.pop()
+        if level == depth:
+            body = '\n'.join(ctx.leaf_line(f'l{n}.jar') for n in range(leaves))
+        else:
+            body = '\n'.join(ctx.folder_line(f'f{n}') for n in range(fanout))
+            frontier.extend((f'{url.rstrip("/")}/f{n}/', level + 1) for n in range(fanout))
+        responses.add(responses.GET, url, body=body, status=200)
+
+
+def test_size_bytes_ok_units():
+    assert brm.size_bytes('2.50', 'MB') == 2621440
+    assert brm.size_bytes('1', 'kB') == 1024
+    assert brm.size_bytes('123', 'bytes') == 123
+
+
+def test_size_bytes_ok_folder_and_unknown():
+    assert brm.size_bytes('-', '-') is None
+    assert brm.size_bytes('1', 'parsecs') is None
+
+
+def test_summarize_ok_interval():
+    estimate = est.summarize([10.0, 12.0, 14.0])
+    assert estimate.mean == 12.0
+    assert estimate.low < 12.0 < estimate.high
+
+
+def test_summarize_ok_degenerate():
+    assert est.summarize([]) == (0.0, 0.0, math.inf)
+    assert est.summarize([5.0]) == (5.0, 0.0, math.inf)
+
+
+@responses.activate
+def test_estimate_ok_uniform_tree_is_exact_within_budget():
+    add_uniform_tree(fanout=3, depth=3, leaves=4)
+    walker = ctx.make_walker([ctx.repository()])
+    result = est.estimate(walker, ctx.REPOSITORY_URL, max_requests=8, rng=random.Random(42))
+    assert result[est.REQUESTS] >= 8
+    assert result[est.REQUESTS] < 1 + 3 + 9 + 27
+    assert result[est.FOLDERS].mean == 1 + 3 + 9 + 27
+    assert result[est.LEAVES] == (108.0, 108.0, 108.0)
+    assert result[est.BYTES].mean == 108 * 1024
+
+
+@responses.activate
+def test_estimate_ok_small_tree_exhausted_gives_exact_totals():
+    add_uniform_tree(fanout=2, depth=1, leaves=3)
+    walker = ctx.make_walker([ctx.repository()])
+    result = est.estimate(walker, ctx.REPOSITORY_URL, max_requests=1000, rng=random.Random(0))
+    assert result[est.REQUESTS] == 3
+    assert result[est.FOLDERS] == (3.0, 3.0, 3.0)
+    assert result[est.LEAVES] == (6.0, 6.0, 6.0)
+
+
+@responses.activate
+def test_probe_ok_tracks_unseen_folders():
+    add_uniform_tree(fanout=2, depth=2, leaves=1)
+    walker = ctx.make_walker([ctx.repository()])
+    pages, unseen, rng = {}, {ctx.REPOSITORY_URL}, random.Random(0)
+    est.probe(walker, ctx.REPOSITORY_URL, pages, rng, unseen=unseen)
+    assert len(pages) == 3 and len(unseen) == 2 and not unseen & set(pages)
+    for _ in range(100):
+        unseen and est.probe(walker, ctx.REPOSITORY_URL, pages, rng, unseen=unseen)
+    assert not unseen and len(pages) == 1 + 2 + 4
+
+
+@responses.activate
+def test_estimate_ok_then_walk_and_estimate_again_on_same_walker():
+    add_uniform_tree(fanout=2, depth=1, leaves=3)
+    walker = ctx.make_walker([ctx.repository()])
+    first = est.estimate(walker, ctx.REPOSITORY_URL, max_requests=1000, rng=random.Random(0))
+    tree = walker.walk(ctx.REPOSITORY_URL)
+    assert set(tree) - set(brm.MARKERS) == {'f0/', 'f1/'} and walker.stats[brm.DUPLICATE_FOLDERS] == 0
+    second = est.estimate(walker, ctx.REPOSITORY_URL, max_requests=1000, rng=random.Random(0))
+    assert second[est.FOLDERS] == first[est.FOLDERS] == (3.0, 3.0, 3.0)
+
+
+def test_main_nok_usage():
+    assert est.main(['many']) == 2
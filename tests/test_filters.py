@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import json
+
+import pytest  # type: ignore
+
+import brm_rest_walk.filters as flt
+
+
+def test_compile_glob_ok_unanchored_any_depth():
+    compiled = flt.compile_glob('*.jar')
+    assert flt.glob_match(compiled, ['a.jar'])
+    assert flt.glob_match(compiled, ['com', 'x', 'a.jar'])
+    assert not flt.glob_match(compiled, ['com', 'a.pom'])
+
+
+def test_compile_glob_ok_anchored_leading_slash():
+    compiled = flt.compile_glob('/releases/')
+    assert flt.glob_match(compiled, ['releases'])
+    assert not flt.glob_match(compiled, ['x', 'releases'])
+
+
+def test_glob_may_match_below_ok_prefix():
+    compiled = flt.compile_glob('com/ourcorp/**')
+    assert flt.glob_may_match_below(compiled, ['com'])
+    assert flt.glob_may_match_below(compiled, ['com', 'ourcorp', 'deep'])
+    assert not flt.glob_may_match_below(compiled, ['org'])
+
+
+def test_path_filter_ok_empty_admits_everything():
+    path_filter = flt.PathFilter()
+    assert not path_filter
+    assert not path_filter.prunes('.index/')
+    assert path_filter.admits('a/b/c.txt')
+
+
+def test_path_filter_ok_include_prunes_unrelated_subtrees():
+    path_filter = flt.PathFilter(include=['/releases/', 'com/ourcorp/**'])
+    assert not path_filter.prunes('releases/')
+    assert not path_filter.prunes('releases/1.0/')
+    assert not path_filter.prunes('com/')
+    assert not path_filter.prunes('com/ourcorp/')
+    assert path_filter.prunes('com/other/')
+    assert path_filter.prunes('org/')
+    assert path_filter.admits('releases/1.0/a.jar')
+    assert path_filter.admits('com/ourcorp/a/b.jar')
+    assert not path_filter.admits('top.txt')
+
+
+def test_path_filter_ok_exclude_prunes_at_any_depth():
+    path_filter = flt.PathFilter(exclude=['.index', '**/*-SNAPSHOT/'])
+    assert path_filter.prunes('.index/')
+    assert path_filter.prunes('com/x/1.0-SNAPSHOT/')
+    assert not path_filter.prunes('com/x/1.0/')
+    assert not path_filter.admits('com/.index')
+
+
+def test_path_filter_ok_regex_include_keeps_folders_open():
+    path_filter = flt.PathFilter(include=[r're:\.jar$'], exclude=[r're:^tmp/'])
+    assert not path_filter.prunes('org/')
+    assert path_filter.prunes('tmp/')
+    assert path_filter.admits('org/a.jar')
+    assert not path_filter.admits('org/a.pom')
+
+
+def test_path_filter_for_ok_global_and_repository_rules(tmp_path):
+    rules = {
+        flt.EXCLUDE: ['.index'],
+        flt.REPOSITORIES: {'libs': {flt.INCLUDE: ['/releases/']}},
+    }
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(rules), encoding=flt.ENCODING)
+    loaded = flt.load_rules(str(path))
+    libs = flt.path_filter_for(loaded, 'libs')
+    assert libs.include == ['/releases/'] and libs.exclude == ['.index']
+    other = flt.path_filter_for(loaded, 'other')
+    assert other.include == [] and other.exclude == ['.index']
+
+
+def test_load_rules_ok_no_path():
+    assert flt.load_rules('') == {}
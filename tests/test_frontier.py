@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import os
+import random
+
+import pytest  # type: ignore
+
+import brm_rest_walk.frontier as fro
+
+
+def drain(frontier):
+    items = []
+    while frontier:
+        items.append(frontier.pop())
+    return items
+
+
+@pytest.mark.parametrize('max_in_memory', [2, 3, 7, 1000])
+def test_frontier_ok_dfs_order_survives_spill(max_in_memory):
+    with fro.Frontier(fro.DFS, max_in_memory) as frontier:
+        expected = []
+        for n in range(50):
+            frontier.push((f'u{n}', f'p{n}/'))
+            if n % 5 == 4:
+                expected.append(frontier.pop())
+        items = drain(frontier)
+    assert expected == [(f'u{n}', f'p{n}/') for n in range(4, 50, 5)]
+    pushed = [(f'u{n}', f'p{n}/') for n in range(50) if n % 5 != 4]
+    assert items == pushed[::-1]
+
+
+@pytest.mark.parametrize('max_in_memory', [2, 3, 7, 1000])
+def test_frontier_ok_bfs_order_survives_spill(max_in_memory):
+    with fro.Frontier(fro.BFS, max_in_memory) as frontier:
+        popped = []
+        for n in range(50):
+            frontier.push((f'u{n}', n))
+            if n % 3 == 2:
+                popped.append(frontier.pop())
+        popped.extend(drain(frontier))
+    assert popped == [(f'u{n}', n) for n in range(50)]
+    assert frontier.spilled > 0 or max_in_memory == 1000
+
+
+def test_frontier_ok_bfs_spills_whole_segments_while_head_is_loaded(tmp_path):
+    with fro.Frontier(fro.BFS, max_in_memory=4, spill_dir=str(tmp_path)) as frontier:
+        for n in range(5):
+            frontier.push((n,))
+        assert frontier.pop() == (0,)
+        for n in range(5, 25):
+            frontier.push((n,))
+            assert len(frontier._head) + len(frontier._tail) <= 4  # pylint: disable=protected-access
+        assert len(frontier._segments) <= 12 and frontier.spilled <= 24  # pylint: disable=protected-access
+        assert list(drain(frontier)) == [(n,) for n in range(1, 25)]
+
+
+@pytest.mark.parametrize('max_in_memory', [2, 5, 1000])
+def test_frontier_ok_priority_order_survives_spill(max_in_memory):
+    rng = random.Random(42)
+    priorities = [rng.randint(0, 9) for _ in range(200)]
+    with fro.Frontier(fro.PRIORITY, max_in_memory) as frontier:
+        for n, priority in enumerate(priorities):
+            frontier.push((f'u{n}',), priority)
+        items = drain(frontier)
+    expected = [(f'u{n}',) for n, _ in sorted(enumerate(priorities), key=lambda pair: (-pair[1], pair[0]))]
+    assert items == expected
+
+
+def test_frontier_ok_memory_bounded_and_files_removed(tmp_path):
+    frontier = fro.Frontier(fro.BFS, max_in_memory=10, spill_dir=str(tmp_path))
+    for n in range(1000):
+        frontier.push((n,))
+        assert len(frontier._head) + len(frontier._tail) <= 10  # pylint: disable=protected-access
+    assert len(frontier) == 1000 and frontier.spilled >= 990
+    assert os.listdir(tmp_path)
+    frontier.pop()
+    frontier.close()
+    assert not os.listdir(tmp_path)
+
+
+def test_frontier_ok_max_in_memory_from_environment(monkeypatch):
+    monkeypatch.setenv(fro.BRM_FRONTIER_MAX, '4')
+    assert fro.Frontier().max_in_memory == 4
+
+
+def test_frontier_nok_policy_and_empty():
+    with pytest.raises(ValueError, match='Unknown frontier policy'):
+        fro.Frontier('random')
+    with pytest.raises(IndexError):
+        fro.Frontier().pop()
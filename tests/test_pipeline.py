@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import threading
+import time
+
+import pytest  # type: ignore
+
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.diff as dif
+import brm_rest_walk.pipeline as pip
+import brm_rest_walk.snapshot as snp
+
+
+def add_tree_responses():
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200,
+                  body='\n'.join((ctx.leaf_line('a.txt', '2.50 MB', '22-Aug-2019 09:53'), ctx.folder_line('b'))))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=200, body=ctx.listing('b.txt'))
+    for leaf in ('a.txt', 'b/b.txt'):
+        for digest in brm.KNOWN_DIGESTS:
+            responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/{leaf}.{digest}', status=200, body=f'{leaf}-{digest}')
+
+
+@responses.activate
+def test_iter_entries_ok_lazy_and_typed():
+    add_tree_responses()
+    walker = ctx.make_walker([ctx.repository()])
+    entries = walker.iter_entries(walker.repositories)
+    assert next(entries) == brm.Entry(ctx.REPOSITORY_URL, '', brm.FOLDER)
+    assert walker.stats[brm.REQUESTS] == 1  # nothing requested before asked for
+    rest = list(entries)
+    assert [(entry.path, entry.kind) for entry in rest] == [('a.txt', brm.LEAF), ('b/', brm.FOLDER), ('b/b.txt', brm.LEAF)]
+    assert rest[0].size == 2621440 and rest[2].url == f'{ctx.REPOSITORY_URL}/b/b.txt'
+    assert walker.stats[brm.REQUESTS] == 3
+
+
+@responses.activate
+def test_pipeline_ok_filter_enrich_throttle_sink():
+    add_tree_responses()
+    walker = ctx.make_walker([ctx.repository()])
+    sunk = []
+    outputs = list(pip.pipeline(
+        walker.iter_entries(walker.repositories),
+        pip.keep(lambda entry: entry.kind == brm.LEAF),
+        pip.with_digests(walker),
+        pip.throttle(1000.0),
+        pip.sink(sunk.append),
+        maxsize=1,
+    ))
+    assert outputs == sunk
+    assert [entry.path for entry in outputs] == ['a.txt', 'b/b.txt']
+    assert outputs[1].digests == {digest: f'b/b.txt-{digest}' for digest in brm.KNOWN_DIGESTS}
+
+
+@responses.activate
+def test_pipeline_ok_sidecar_digests_normalized_for_snapshots(tmp_path):
+    add_tree_responses()
+    walker = ctx.make_walker([ctx.repository()])
+    values = {brm.MD5: 'AB' * 16, brm.SHA1: 'CD' * 20, brm.SHA256: 'EF' * 32}
+    for digest, value in values.items():
+        responses.replace(responses.GET, f'{ctx.REPOSITORY_URL}/a.txt.{digest}', body=f'{value}  a.txt\n', status=200)
+    [leaf] = pip.pipeline(iter([brm.leaf_entry(ctx.REPOSITORY_URL, 'a.txt', {})]), pip.with_digests(walker))
+    assert leaf.digests == {digest: value.lower() for digest, value in values.items()}
+    path = str(tmp_path / 'entries.snap')
+    snp.write_snapshot(path, [leaf])
+    assert list(dif.read_snapshot(path)) == [leaf]
+
+
+@responses.activate
+def test_pipeline_ok_missing_sidecars_skipped():
+    add_tree_responses()
+    walker = ctx.make_walker([ctx.repository()])
+    responses.replace(responses.GET, f'{ctx.REPOSITORY_URL}/a.txt.{brm.SHA256}', status=404)
+    responses.replace(responses.GET, f'{ctx.REPOSITORY_URL}/a.txt.{brm.MD5}', status=410)
+    leaves = [brm.leaf_entry(ctx.REPOSITORY_URL, 'a.txt', {}), brm.leaf_entry(ctx.REPOSITORY_URL, 'b/b.txt', {})]
+    enriched = list(pip.pipeline(iter(leaves), pip.with_digests(walker)))
+    assert enriched[0].digests == {brm.SHA1: f'a.txt-{brm.SHA1}'}
+    assert enriched[1].digests == {digest: f'b/b.txt-{digest}' for digest in brm.KNOWN_DIGESTS}
+
+
+def test_pipeline_ok_bounded_queues_hold_source_back():
+    produced = []
+
+    def source():
+        for n in range(1000):
+            produced.append(n)
+            yield n
+
+    items = pip.pipeline(source(), pip.keep(lambda n: True), maxsize=2)
+    assert next(items) == 0
+    time.sleep(0.2)
+    assert len(produced) < 10
+    items.close()
+
+
+def test_pipeline_nok_stage_error_reaches_consumer():
+    def failing(items):
+        for item in items:
+            if item == 3:
+                raise RuntimeError("stage failed")
+            yield item
+
+    with pytest.raises(RuntimeError, match=r"stage failed"):
+        list(pip.pipeline(range(10), failing))
+
+
+def test_throttle_ok_rate_and_nok_rate():
+    start = time.monotonic()
+    assert list(pip.throttle(50.0)(iter(range(6)))) == list(range(6))
+    assert time.monotonic() - start >= 0.09
+    with pytest.raises(ValueError, match=r"Rate limit must be positive"):
+        pip.throttle(0)
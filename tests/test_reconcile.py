@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import pytest  # type: ignore
+
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.reconcile as rec
+
+REPO = ctx.REPOSITORY_URL
+SHA_A, SHA_B, SHA_C, SHA_D = ('a' * 40), ('b' * 40), ('c' * 40), ('d' * 40)
+
+
+def make_filestore(root, blobs):
+    for digest, content in blobs.items():
+        folder = root / digest[:2]
+        folder.mkdir(exist_ok=True)
+        (folder / digest).write_bytes(content)
+    (root / 'aa' / 'not-a-digest.tmp').write_bytes(b'ignored')
+
+
+def test_scan_filestore_ok_digest_named_files_only(tmp_path):
+    make_filestore(tmp_path, {SHA_A: b'12345', SHA_B: b'1'})
+    scanned = sorted((digest, size) for digest, size, _ in rec.scan_filestore(str(tmp_path)))
+    assert scanned == [(SHA_A, 5), (SHA_B, 1)]
+
+
+def test_external_sort_ok_spills_runs(tmp_path):
+    records = [(f'{n % 97:02x}', n, f'url{n}') for n in range(500)]
+    merged = list(rec.external_sort(records, max_in_memory=64, temp_dir=str(tmp_path)))
+    assert merged == sorted(records)
+
+
+def test_external_sort_ok_in_memory():
+    assert list(rec.external_sort([('b', 1, 'x'), ('a', 2, 'y')])) == [('a', 2, 'y'), ('b', 1, 'x')]
+
+
+def test_reconcile_ok_orphans_missing_and_dedup(tmp_path):
+    make_filestore(tmp_path, {SHA_A: b'12345', SHA_B: b'1', SHA_D: b'1234'})
+    entries = [
+        brm.Entry(REPO, '', brm.FOLDER),
+        brm.Entry(REPO, 'x/a.jar', brm.LEAF, 5, digests={brm.SHA1: SHA_A}),
+        brm.Entry(REPO, 'y/a.jar', brm.LEAF, 5, digests={brm.SHA1: SHA_A}),
+        brm.Entry(REPO, 'z/a.jar', brm.LEAF, 5, digests={brm.SHA1: f'{SHA_A}  a.jar'}),
+        brm.Entry(REPO, 'c.jar', brm.LEAF, 3, digests={brm.SHA1: SHA_C}),
+        brm.Entry(REPO, 'd.jar', brm.LEAF, None, digests={brm.SHA1: SHA_D}),
+        brm.Entry(REPO, 'unhashed.jar', brm.LEAF, 3),
+    ]
+    summary = {}
+    references = rec.external_sort(rec.reference_records(entries, summary), max_in_memory=2, temp_dir=str(tmp_path))
+    blobs = rec.external_sort(rec.scan_filestore(str(tmp_path)))
+    findings = list(rec.reconcile(references, blobs, summary))
+    assert [(finding.kind, finding.digest) for finding in findings] == [(rec.ORPHAN, SHA_B), (rec.MISSING, SHA_C)]
+    assert findings[1].location == f'{REPO}/c.jar'
+    assert summary[rec.REFERENCES] == 5 and summary[rec.UNHASHED] == 1
+    assert summary[rec.BLOBS] == 3 and summary[rec.REFERENCED_BLOBS] == 2
+    assert summary[rec.ORPHAN_BYTES] == 1 and summary[rec.MISSING_REFERENCES] == 1
+    assert summary[rec.LOGICAL_BYTES] == 3 * 5 + 4 and summary[rec.PHYSICAL_BYTES] == 5 + 1 + 4
+    assert summary[rec.DEDUP_RATIO] == 2.0
+
+
+@responses.activate
+def test_with_hashes_ok_fills_missing_digests():
+    for digest in brm.KNOWN_DIGESTS:
+        responses.add(responses.GET, f'{REPO}/a.jar.{digest}', body=f'{digest}-value', status=200)
+    walker = ctx.make_walker([])
+    entries = [brm.Entry(REPO, '', brm.FOLDER), brm.Entry(REPO, 'a.jar', brm.LEAF), brm.Entry(REPO, 'b.jar', brm.LEAF, digests={brm.SHA1: SHA_B})]
+    enriched = list(rec.with_hashes(walker, entries))
+    assert enriched[1].digests == {brm.SHA1: 'sha1-value'}
+    assert enriched[2].digests == {brm.SHA1: SHA_B}
+    assert walker.stats[brm.REQUESTS] == 1 + 1
+
+
+@responses.activate
+def test_with_hashes_ok_missing_sidecars_count_as_unhashed():
+    responses.add(responses.GET, f'{REPO}/a.jar.md5', body='0' * 32, status=200)
+    responses.add(responses.GET, f'{REPO}/a.jar.sha1', body=f'{SHA_A}  a.jar', status=200)
+    responses.add(responses.GET, f'{REPO}/a.jar.sha256', status=404)
+    responses.add(responses.GET, f'{REPO}/b.jar.sha1', status=404)
+    walker = ctx.make_walker([])
+    entries = [brm.Entry(REPO, 'a.jar', brm.LEAF, 5), brm.Entry(REPO, 'b.jar', brm.LEAF, 5)]
+    enriched = list(rec.with_hashes(walker, entries))
+    assert [entry.digests for entry in enriched] == [{brm.SHA1: SHA_A}, {}]
+    summary = {}
+    assert list(rec.reference_records(enriched, summary)) == [(SHA_A, 5, f'{REPO}/a.jar')]
+    assert summary[rec.UNHASHED] == 1
+    sha256_url = f'{REPO}/a.jar.sha256'
+    assert not any(call.request.url == sha256_url for call in responses.calls)
+
+
+def test_main_nok_usage():
+    assert rec.main(['source', '--nope']) == 2
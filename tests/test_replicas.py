@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import collections
+import random
+
+import pytest  # type: ignore
+import requests
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.replicas as rep
+
+CANONICAL = ctx.BASE_URL
+REPLICAS = ['https://r1.example.com', 'https://r2.example.com', 'https://r3.example.com']
+
+
+def make_pool(clock, urls=None, cooldown=10.0):
+    return rep.ReplicaPool(CANONICAL, urls if urls else REPLICAS, cooldown=cooldown, clock=clock, rng=random.Random(7))
+
+
+def fake_send(clock, latencies, failing=()):
+    calls = collections.Counter()
+
+    def send(url):
+        host = url.split('/')[2]
+        calls[host] += 1
+        clock.now += latencies.get(host, 0.01)
+        if host in failing:
+            raise requests.ConnectionError(f"{host} down")
+        response = requests.Response()
+        response.status_code = 200
+        return response
+    return send, calls
+
+
+def test_replica_pool_ok_prefers_fast_replicas():
+    clock = ctx.Clock()
+    pool = make_pool(clock)
+    send, calls = fake_send(clock, {'r1.example.com': 0.01, 'r2.example.com': 0.01, 'r3.example.com': 0.5})
+    for n in range(300):
+        assert pool.fetch(send, f'{CANONICAL}/api/data/{n}/').status_code == 200
+    assert calls['r1.example.com'] > 5 * calls['r3.example.com']
+    assert calls['r2.example.com'] > 5 * calls['r3.example.com']
+    health = pool.health()
+    assert health['https://r3.example.com']['latency'] == pytest.approx(0.5)
+    assert sum(value['requests'] for value in health.values()) == 300
+
+
+def test_replica_pool_ok_failover_opens_circuit_and_probes_after_cooldown():
+    clock = ctx.Clock()
+    pool = make_pool(clock, REPLICAS[:2], cooldown=10.0)
+    send, calls = fake_send(clock, {}, failing={'r1.example.com'})
+    for n in range(20):
+        assert pool.fetch(send, f'{CANONICAL}/api/data/{n}/').status_code == 200
+    assert calls['r1.example.com'] == rep.FAILURE_THRESHOLD
+    assert pool.health()['https://r1.example.com']['state'] == rep.OPEN
+    clock.now += 10.0
+    assert pool.health()['https://r1.example.com']['state'] == rep.HALF_OPEN
+    recovered, calls = fake_send(clock, {})
+    for n in range(20):
+        pool.fetch(recovered, f'{CANONICAL}/api/data/{n}/')
+    assert pool.health()['https://r1.example.com']['state'] == rep.CLOSED and calls['r1.example.com'] > 0
+
+
+def test_replica_pool_nok_all_down_raises_last_error():
+    clock = ctx.Clock()
+    pool = make_pool(clock, REPLICAS[:2])
+    send, calls = fake_send(clock, {}, failing={'r1.example.com', 'r2.example.com'})
+    for _ in range(2 * rep.FAILURE_THRESHOLD):
+        with pytest.raises(requests.ConnectionError, match='down'):
+            pool.fetch(send, f'{CANONICAL}/api/data/')
+    assert sum(calls.values()) == 4 * rep.FAILURE_THRESHOLD
+    assert all(replica.in_flight == 0 for replica in pool.replicas)
+    assert all(value['state'] == rep.OPEN and value['requests'] == 2 * rep.FAILURE_THRESHOLD for value in pool.health().values())
+
+
+def test_replica_pool_ok_canonicalize_and_foreign_urls():
+    pool = make_pool(ctx.Clock())
+    assert pool.canonicalize('https://r2.example.com/api/data') == f'{CANONICAL}/api/data'
+    assert pool.canonicalize('https://other.example.com/api/data') == 'https://other.example.com/api/data'
+    send, calls = fake_send(ctx.Clock(), {})
+    pool.fetch(send, 'https://other.example.com/x')
+    assert calls == {'other.example.com': 1}
+    with pytest.raises(ValueError, match='at least one'):
+        rep.ReplicaPool(CANONICAL, [])
+
+
+@responses.activate
+def test_tree_walker_ok_walk_spreads_over_replicas_and_fails_over():
+    api_path = ctx.BRM_API_ROOT
+    responses.add(responses.GET, f'https://r1.example.com{api_path}repositories/', body=requests.ConnectionError('r1 down'))
+    for host in REPLICAS[1:]:
+        base = f'{host}{api_path}'
+        responses.add(responses.GET, f'{base}repositories/', status=200, json=[ctx.repository(url=f'{base}data')])
+        responses.add(responses.GET, f'{base}data', status=200, body=ctx.listing(*(f'{n}/' for n in range(8))))
+        for n in range(8):
+            responses.add(responses.GET, f'{base}data/{n}/', status=200, body=ctx.listing(f'{n}.txt'))
+    responses.add(responses.GET, f'https://r1.example.com{api_path}data', body=requests.ConnectionError('r1 down'))
+
+    walker = ctx.make_walker(replicas=REPLICAS)
+    repository_url = walker.repositories['data']['url']
+    assert repository_url == f'{CANONICAL}{api_path}data'
+    tree = walker.walk(repository_url)
+    assert tree['7/']['7.txt'][brm.NODE][brm.NODE] == f'{repository_url}/7/7.txt'
+    hosts = collections.Counter(call.request.url.split('/')[2] for call in responses.calls)
+    assert hosts['r2.example.com'] > 0 and hosts['r3.example.com'] > 0
+    assert 'example.com' not in hosts
+    assert walker.replicas.health()['https://r1.example.com']['failures'] >= 1
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import json
+
+import pytest  # type: ignore
+import requests
+
+import tests.context as ctx
+
+import brm_rest_walk.retry as ret
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers if headers else {})
+    return requests.HTTPError(f"{status} Error", response=response)
+
+
+@pytest.mark.parametrize('status, error_class', [
+    (500, ret.TRANSIENT), (503, ret.TRANSIENT), (429, ret.THROTTLED), (404, ret.MISSING),
+    (410, ret.MISSING), (403, ret.DENIED), (401, ret.DENIED), (400, ret.CLIENT),
+])
+def test_classify_ok_http_status(status, error_class):
+    assert ret.classify(http_error(status)) == error_class
+
+
+def test_classify_ok_network_errors():
+    assert ret.classify(requests.ConnectionError("refused")) == ret.NETWORK
+    assert ret.classify(requests.Timeout("slow")) == ret.NETWORK
+
+
+def test_retry_policy_ok_exponential_capped():
+    policy = ret.RetryPolicy(5, 1.0, 5.0)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_retry_queue_ok_backoff_then_dead_letter():
+    clock = ctx.Clock(100.0)
+    queue = ret.RetryQueue({ret.TRANSIENT: ret.RetryPolicy(3, 1.0, 10.0)}, clock=clock)
+    item = ('https://example.com/api/data/b/', 'b/')
+    assert queue.fail(item, http_error(500))
+    assert len(queue) == 1 and queue.wait_seconds() == 1.0 and queue.due() == []
+    clock.now += 1.0
+    assert queue.due() == [item] and not queue
+    assert queue.fail(item, http_error(502))
+    assert queue.wait_seconds() == 2.0
+    clock.now += 2.0
+    assert queue.due() == [item]
+    assert not queue.fail(item, http_error(500))
+    assert queue.dead_letters == [ret.DeadLetter(item[0], 'b/', ret.TRANSIENT, 'HTTPError: 500 Error', 3)]
+    assert queue.wait_seconds() is None
+
+
+def test_retry_queue_ok_missing_dead_on_first_failure_and_retry_after():
+    clock = ctx.Clock(100.0)
+    queue = ret.RetryQueue(clock=clock)
+    assert not queue.fail(('u', 'p/'), http_error(404))
+    assert queue.dead_letters[0].error_class == ret.MISSING and queue.dead_letters[0].attempts == 1
+    assert queue.fail(('v', 'q/'), http_error(429, {'Retry-After': '30'}))
+    assert queue.wait_seconds() == 30.0
+    assert queue.drain() == [('v', 'q/')] and not queue
+
+
+def test_write_dead_letters_ok(tmp_path):
+    path = tmp_path / ret.DEAD_LETTERS_FILE
+    letters = [ret.DeadLetter('u', 'p/', ret.DENIED, 'HTTPError: 403', 1)]
+    assert ret.write_dead_letters(str(path), letters) == 1
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [letters[0]._asdict()]
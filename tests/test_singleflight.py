@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import threading
+import time
+
+import pytest  # type: ignore
+
+import brm_rest_walk.singleflight as sf
+
+
+def test_single_flight_ok_concurrent_callers_share_one_call():
+    flight = sf.SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ['result'] * 8
+
+
+def test_single_flight_ok_memo_and_forget():
+    flight = sf.SingleFlight(ttl=60.0)
+    calls = []
+    assert flight.do('k', lambda: calls.append(1) or 'a') == 'a'
+    assert flight.do('k', lambda: calls.append(1) or 'b') == 'a'
+    flight.forget('k')
+    assert flight.do('k', lambda: calls.append(1) or 'c') == 'c'
+    assert len(calls) == 2
+
+
+def test_single_flight_ok_no_memo_without_ttl():
+    flight = sf.SingleFlight(ttl=0.0)
+    assert flight.do('k', lambda: 'a') == 'a'
+    assert flight.do('k', lambda: 'b') == 'b'
+
+
+def test_single_flight_ok_memo_bounded():
+    flight = sf.SingleFlight(max_entries=2)
+    for key in 'abc':
+        flight.do(key, lambda key=key: key)
+    assert flight.do('a', lambda: 'fresh') == 'fresh'
+    assert flight.do('c', lambda: 'fresh') == 'c'
+
+
+def test_single_flight_nok_errors_are_not_memoized():
+    flight = sf.SingleFlight()
+
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match=r"boom"):
+        flight.do('k', failing)
+    assert flight.do('k', lambda: 'recovered') == 'recovered'
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import json
+
+import pytest  # type: ignore
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.snapshot as snap
+
+REPOSITORY_URL = 'https://example.com/api/data'
+DIGESTS_A = {
+    brm.MD5: "921214c14fda7cd320caf04cfa26a224",
+    brm.SHA1: "7c6b7b5a662dcf0a21253bc2576d614f6b7fdc9c",
+    brm.SHA256: "fd60560f94c1ad21d45e2383f974dd77df582f7336816b7fb367d70ff001fc8f",
+}
+TREE = {
+    '1': {
+        REPOSITORY_URL: {
+            brm.EDGE: ['a.txt', 'b/'],
+            'a.txt': {brm.NODE: {brm.NODE: f'{REPOSITORY_URL}/a.txt', brm.META: {
+                'name': 'a.txt', 'api_ts': '22-Aug-2019 09:53', 'h_size': '2.50', 'h_unit': 'MB', **DIGESTS_A}}},
+            'b/': {
+                brm.EDGE: ['b.txt'],
+                'b.txt': {brm.NODE: {brm.NODE: f'{REPOSITORY_URL}/b/b.txt', brm.META: {
+                    'name': 'b.txt', 'api_ts': '22-Aug-2020 09:53', 'h_size': '1', 'h_unit': 'kB'}}},
+            },
+        }
+    }
+}
+
+
+def test_iter_tree_ok_entries():
+    entries = sorted(brm.iter_tree(TREE), key=lambda entry: entry.sort_key)
+    assert [(entry.path, entry.kind, entry.depth) for entry in entries] == [
+        ('', brm.FOLDER, 0), ('a.txt', brm.LEAF, 1), ('b/', brm.FOLDER, 1), ('b/b.txt', brm.LEAF, 2)]
+    assert entries[1].size == 2621440 and entries[1].digests == DIGESTS_A
+    assert entries[1].ts == brm.api_timestamp('22-Aug-2019 09:53')
+    assert entries[3].url == f'{REPOSITORY_URL}/b/b.txt'
+
+
+def test_build_tree_ok_round_trip_entries():
+    entries = sorted(brm.iter_tree(TREE), key=lambda entry: entry.sort_key)
+    rebuilt = brm.build_tree(entries)
+    assert rebuilt[1][REPOSITORY_URL][brm.EDGE] == ['a.txt', 'b/']
+    assert rebuilt[1][REPOSITORY_URL]['a.txt'][brm.NODE][brm.META]['api_ts'] == '22-Aug-2019 09:53'
+    assert sorted(brm.iter_tree(rebuilt), key=lambda entry: entry.sort_key) == entries
+
+
+def test_snapshot_ok_write_lookup_iterate(tmp_path):
+    path = str(tmp_path / 'tree.snap')
+    entries = list(brm.iter_tree(TREE))
+    assert snap.write_snapshot(path, entries) == 4
+    with snap.Snapshot(path) as snapshot:
+        assert len(snapshot) == 4
+        assert list(snapshot) == sorted(entries, key=lambda entry: entry.sort_key)
+        found = snapshot.lookup(REPOSITORY_URL, 'a.txt')
+        assert found.digests == DIGESTS_A and found.size == 2621440
+        assert snapshot.lookup(REPOSITORY_URL, 'b/b.txt').digests == {}
+        assert snapshot.lookup(REPOSITORY_URL, 'missing') is None
+        assert [entry.path for entry in snapshot.below(REPOSITORY_URL, 'b/')] == ['b/', 'b/b.txt']
+
+
+def test_snapshot_ok_empty(tmp_path):
+    path = str(tmp_path / 'empty.snap')
+    assert snap.write_snapshot(path, []) == 0
+    with snap.Snapshot(path) as snapshot:
+        assert list(snapshot) == [] and snapshot.lookup('r', '') is None
+
+
+def test_snapshot_nok_not_a_snapshot(tmp_path):
+    path = tmp_path / 'tree.json'
+    path.write_text(json.dumps(TREE) + ' ' * 400, encoding='utf-8')
+    with pytest.raises(ValueError, match=r"Not a snapshot of version 1"):
+        snap.Snapshot(str(path))
+
+
+def test_json_snapshot_converters_ok_round_trip(tmp_path):
+    source, target, back = tmp_path / 'tree.json', str(tmp_path / 'tree.snap'), str(tmp_path / 'back.json')
+    source.write_text(json.dumps(TREE), encoding='utf-8')
+    assert snap.main([str(source), target]) == 0
+    assert snap.main([target, back]) == 0
+    with open(back, encoding='utf-8') as handle:
+        restored = json.load(handle)
+    key = lambda entry: entry.sort_key  # noqa
+    assert sorted(brm.iter_tree(restored), key=key) == sorted(brm.iter_tree(TREE), key=key)
+
+
+def test_main_nok_usage():
+    assert snap.main(['only-one']) == 2
+
+
+def test_snapshot_nok_digest_width(tmp_path):
+    entry = brm.Entry(REPOSITORY_URL, 'a.txt', brm.LEAF, digests={brm.SHA1: 'abcd'})
+    with pytest.raises(ValueError, match=r"The sha1 digest of https://example.com/api/data/a.txt is not 20 bytes long"):
+        snap.write_snapshot(str(tmp_path / 'bad.snap'), [entry])
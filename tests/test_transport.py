@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import warnings
+
+import pytest  # type: ignore
+import requests
+import responses
+
+import tests.context as ctx
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.transport as tra
+
+PIN = 'ab' * 32
+
+
+def test_transport_from_env_ok_defaults_and_overrides(monkeypatch):
+    for name in (tra.BRM_CA_BUNDLE, tra.BRM_PIN_SHA256, tra.BRM_INSECURE, tra.BRM_POOL_SIZE, tra.BRM_READ_TIMEOUT):
+        monkeypatch.delenv(name, raising=False)
+    assert tra.transport_from_env(workers=32) == tra.Transport(pool_size=32)
+    monkeypatch.setenv(tra.BRM_CA_BUNDLE, '/etc/brm/ca.pem')
+    monkeypatch.setenv(tra.BRM_PIN_SHA256, ':'.join(['AB'] * 32))
+    monkeypatch.setenv(tra.BRM_READ_TIMEOUT, '5')
+    transport = tra.transport_from_env()
+    assert transport.verify == '/etc/brm/ca.pem' and transport.pin_sha256 == PIN
+    assert transport.timeout == (tra.CONNECT_TIMEOUT, 5.0)
+
+
+def test_configure_ok_mounts_adapter_once():
+    session = tra.configure(requests.Session(), tra.Transport(verify='/etc/brm/ca.pem', pin_sha256=PIN, pool_size=3))
+    adapter = session.get_adapter('https://example.com/')
+    assert isinstance(adapter, tra.TransportAdapter) and adapter is session.get_adapter('http://example.com/')
+    assert adapter.poolmanager.connection_pool_kw['assert_fingerprint'] == PIN
+    assert adapter.poolmanager.connection_pool_kw['maxsize'] == 3
+    assert tra.KEEP_ALIVE_OPTIONS[0] in adapter.poolmanager.connection_pool_kw['socket_options']
+    assert session.verify is False  # chain validation replaced by the pinned fingerprint
+
+
+def test_configure_nok_short_fingerprint():
+    with pytest.raises(ValueError, match='64 hex digits'):
+        tra.configure(requests.Session(), tra.Transport(pin_sha256='abcd'))
+
+
+@responses.activate
+def test_tree_walker_ok_fetch_uses_session_transport():
+    transport = tra.Transport(verify='/etc/brm/ca.pem', connect_timeout=2.0, read_timeout=3.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        walker = ctx.make_walker([], transport=transport)
+    assert walker._session.verify == '/etc/brm/ca.pem'  # pylint: disable=protected-access
+    request_kwargs = responses.calls[0].request.req_kwargs
+    assert request_kwargs['timeout'] == (2.0, 3.0) and request_kwargs['verify'] == '/etc/brm/ca.pem'
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import pathlib
+import time
+
+import pytest  # type: ignore
+
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.verify as ver
+
+FIXTURES = pathlib.Path(__file__).parent / 'fixtures' / 'data'
+
+
+def add_artifact(relative, sidecars_from=None):
+    """Serve the fixture bytes of relative with the sidecars of sidecars_from (default relative)."""
+    url = f'{ctx.REPOSITORY_URL}/{relative}'
+    responses.add(responses.GET, url, body=(FIXTURES / relative).read_bytes(), status=200)
+    for digest in brm.KNOWN_DIGESTS:
+        sidecar = (FIXTURES / f'{sidecars_from or relative}.{digest}').read_text(encoding='utf-8')
+        responses.add(responses.GET, f'{url}.{digest}', body=sidecar, status=200)
+    return url
+
+
+def test_digest_stream_ok_single_pass_over_chunks():
+    content = (FIXTURES / 'a.txt').read_bytes()
+    digests, size = ver.digest_stream(content[n:n + 7] for n in range(0, len(content), 7))
+    assert size == len(content)
+    assert digests == {digest: (FIXTURES / f'a.txt.{digest}').read_text(encoding='utf-8').split()[0] for digest in brm.KNOWN_DIGESTS}
+
+
+def test_byte_rate_limiter_ok_throttles():
+    limiter = ver.ByteRateLimiter(1000)
+    start = time.monotonic()
+    limiter.consume(1000)
+    limiter.consume(100)
+    assert time.monotonic() - start >= 0.09
+
+
+def test_byte_rate_limiter_nok_rate():
+    with pytest.raises(ValueError, match=r"Byte rate budget must be positive"):
+        ver.ByteRateLimiter(0)
+
+
+@responses.activate
+def test_verify_ok_reports_mismatch_and_errors():
+    walker = ctx.make_walker([ctx.repository()])
+    good = add_artifact('a.txt')
+    bad = add_artifact('b/b.txt', sidecars_from='a.txt')
+    missing = f'{ctx.REPOSITORY_URL}/missing.txt'
+    responses.add(responses.GET, f'{missing}.{brm.MD5}', status=500)
+    unpublished = f'{ctx.REPOSITORY_URL}/unpublished.txt'
+    for digest in brm.KNOWN_DIGESTS:
+        responses.add(responses.GET, f'{unpublished}.{digest}', status=404)
+    outcomes = {outcome.url: outcome for outcome in ver.verify(walker, [good, bad, missing, unpublished], workers=2, chunk_size=16)}
+    assert outcomes[good].ok and outcomes[good].size == (FIXTURES / 'a.txt').stat().st_size
+    assert outcomes[bad].mismatches == list(brm.KNOWN_DIGESTS)
+    assert outcomes[missing].error.startswith('HTTPError')
+    assert outcomes[unpublished].error == 'No sidecar digests published' and not outcomes[unpublished].ok
+
+
+@responses.activate
+def test_verify_ok_compares_only_published_sidecars():
+    walker = ctx.make_walker([ctx.repository()])
+    url = add_artifact('a.txt')
+    responses.replace(responses.GET, f'{url}.{brm.SHA256}', status=404)
+    [outcome] = ver.verify(walker, [url])
+    assert outcome.ok and sorted(outcome.expected) == [brm.MD5, brm.SHA1]
+
+
+@responses.activate
+def test_verify_ok_lazy_urls_with_rate_budget():
+    walker = ctx.make_walker([ctx.repository()])
+    url = add_artifact('a.txt')
+    outcomes = list(ver.verify(walker, (url for _ in range(10)), workers=2, bytes_per_second=1 << 20))
+    assert len(outcomes) == 10 and all(outcome.ok for outcome in outcomes)
+
+
+def test_main_nok_usage():
+    assert ver.main(['a', 'b', 'c', 'd']) == 2
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import pytest  # type: ignore
+
+import brm_rest_walk.visited as vis
+
+
+def test_exact_visited_ok_add_and_contains():
+    visited = vis.ExactVisited()
+    assert visited.add('https://example.com/api/data/b/')
+    assert not visited.add('https://example.com/api/data/b')
+    assert 'https://example.com/api/data/b/' in visited
+    assert 'https://example.com/api/data/c/' not in visited
+    assert visited.add('https://example.com/api/data/c/')
+    assert len(visited) == 2
+    visited.clear()
+    assert len(visited) == 0 and 'https://example.com/api/data/b/' not in visited
+
+
+def test_exact_visited_ok_prefix_shared():
+    visited = vis.ExactVisited()
+    for n in range(100):
+        visited.add(f'https://example.com/api/data/folder/{n}/')
+    assert len(visited._tails_by_prefix) == 1  # pylint: disable=protected-access
+
+
+def test_bloom_visited_ok_no_false_negatives():
+    visited = vis.BloomVisited(capacity=1000, fp_rate=0.01)
+    urls = [f'https://example.com/api/data/{n}/' for n in range(1000)]
+    assert all(visited.add(url) for url in urls[:10])
+    assert all(url in visited for url in urls[:10])
+    for url in urls[10:]:
+        visited.add(url)
+    assert all(url in visited for url in urls)
+    assert not visited.add(urls[0])
+
+
+def test_bloom_visited_ok_false_positive_rate_near_configured():
+    visited = vis.BloomVisited(capacity=2000, fp_rate=0.01)
+    for n in range(2000):
+        visited.add(f'seen/{n}')
+    false_positives = sum(f'unseen/{n}' in visited for n in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_visited_nok_parameters():
+    with pytest.raises(ValueError, match=r"positive capacity"):
+        vis.BloomVisited(capacity=0)
+    with pytest.raises(ValueError, match=r"false positive rate between 0 and 1"):
+        vis.BloomVisited(fp_rate=1.5)
+
+
+def test_visited_set_ok_modes(monkeypatch):
+    monkeypatch.delenv(vis.BRM_VISITED, raising=False)
+    assert isinstance(vis.visited_set(), vis.ExactVisited)
+    monkeypatch.setenv(vis.BRM_VISITED, vis.BLOOM)
+    monkeypatch.setenv(vis.BRM_VISITED_CAPACITY, '100')
+    bloom = vis.visited_set()
+    assert isinstance(bloom, vis.BloomVisited) and bloom.bits < 100 * 64
+
+
+def test_visited_set_nok_unknown_mode():
+    with pytest.raises(ValueError, match=r"Unknown visited set mode \(nope\)"):
+        vis.visited_set('nope')
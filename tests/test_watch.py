@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,unused-import,reimported
+import pytest  # type: ignore
+
+import responses
+
+import tests.context as ctx
+
+import brm_rest_walk.brm_rest_walk as brm
+import brm_rest_walk.diff as dif
+import brm_rest_walk.watch as wat
+
+NOW = 1598089980  # 22-Aug-2020 09:53 UTC
+HOUR = 3600
+
+
+def make_watcher(clock, **kwargs):
+    walker = ctx.make_walker([ctx.repository()])
+    return wat.Watcher(walker, walker.repositories, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+@responses.activate
+def test_watcher_ok_baseline_silent_then_streams_changes_with_conditional_requests():
+    clock = ctx.Clock(NOW + HOUR)
+    watcher = make_watcher(clock, requests_per_second=10.0)
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200, body=ctx.listing('a.txt', 'b/'), headers={'ETag': '"root-1"'})
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=304)
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=200, body=ctx.listing('b.txt'), headers={'Last-Modified': 'Sat, 22 Aug 2020 09:53:00 GMT'})
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=200, body=ctx.listing('b.txt', 'c.txt', 'd/'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/d/', status=200, body=ctx.listing('d.txt'))
+
+    found = []
+    watcher.run(found.append, max_polls=2)
+    assert found == [] and set(watcher.folders) == {ctx.REPOSITORY_URL, f'{ctx.REPOSITORY_URL}/b/'}
+    assert watcher.folders[ctx.REPOSITORY_URL].interval == 0.1 * HOUR  # Changed an hour ago
+
+    watcher.run(found.append, max_polls=4)
+    assert [(change.path, change.changes) for change in found] == [
+        ('b/c.txt', (dif.ADDED,)), ('b/d/', (dif.ADDED,)), ('b/d/d.txt', (dif.ADDED,)),
+    ]
+    root_headers = [call.request.headers for call in responses.calls if call.request.url == ctx.REPOSITORY_URL]
+    b_headers = [call.request.headers for call in responses.calls if call.request.url == f'{ctx.REPOSITORY_URL}/b/']
+    assert 'If-None-Match' not in root_headers[0] and root_headers[1]['If-None-Match'] == '"root-1"'
+    assert b_headers[1]['If-Modified-Since'] == 'Sat, 22 Aug 2020 09:53:00 GMT'
+    assert watcher.stats[wat.NOT_MODIFIED] == 1 and watcher.stats[wat.CHANGED] >= 1
+    assert all(seconds > 0 for seconds in clock.slept)
+
+
+@responses.activate
+def test_watcher_ok_hot_folders_polled_more_often_than_cold():
+    clock = ctx.Clock(NOW + 600)
+    watcher = make_watcher(clock, min_interval=60.0, max_interval=HOUR)
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200, body=ctx.listing('hot/', 'cold/'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/hot/', status=200, body=ctx.listing('h.txt'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/cold/', status=200, body=ctx.listing('c.txt', stamp='22-Aug-2018 09:53'))
+    list(watcher.changes(max_polls=3))
+    hot, cold = watcher.folders[f'{ctx.REPOSITORY_URL}/hot/'], watcher.folders[f'{ctx.REPOSITORY_URL}/cold/']
+    assert hot.interval < 2 * 60.0 and cold.interval == HOUR
+
+
+@responses.activate
+def test_watcher_ok_removed_folder_unwatched_and_errors_back_off():
+    clock = ctx.Clock(NOW)
+    watcher = make_watcher(clock, min_interval=10.0, max_interval=1000.0)
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200, body=ctx.listing('a.txt', 'b/'))
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200, body=ctx.listing('a.txt'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=500)
+    changes = list(watcher.changes(max_polls=3))
+    assert [(change.path, change.changes) for change in changes] == [('b/', (dif.REMOVED,))]
+    assert set(watcher.folders) == {ctx.REPOSITORY_URL}
+    assert watcher.stats[wat.ERRORS] == 1
+
+
+@responses.activate
+def test_watcher_ok_reappearing_folder_polled_by_one_schedule():
+    clock = ctx.Clock(NOW)
+    watcher = make_watcher(clock, min_interval=10.0, max_interval=10.0)
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200, body=ctx.listing('b/'))
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200, body=ctx.listing('a.txt'))
+    responses.add(responses.GET, ctx.REPOSITORY_URL, status=200, body=ctx.listing('b/'))
+    responses.add(responses.GET, f'{ctx.REPOSITORY_URL}/b/', status=200, body=ctx.listing('b.txt'))
+    list(watcher.changes(max_polls=12))
+    live = [folder.url for _, _, folder in watcher._heap if watcher.folders.get(folder.url) is folder]  # pylint: disable=protected-access
+    assert sorted(live) == sorted(watcher.folders) == [ctx.REPOSITORY_URL, f'{ctx.REPOSITORY_URL}/b/']  # One schedule per folder
+
+
+def test_watcher_nok_rate_and_intervals():
+    with pytest.raises(ValueError, match='positive request rate'):
+        wat.Watcher(None, {}, requests_per_second=0)
+    with pytest.raises(ValueError, match='min interval'):
+        wat.Watcher(None, {}, min_interval=10, max_interval=5)
+
+
+def test_change_record_ok_json_friendly():
+    entry = brm.Entry(ctx.REPOSITORY_URL, 'a.txt', brm.LEAF, 1, NOW)
+    record = wat.change_record(dif.Change(ctx.REPOSITORY_URL, 'a.txt', (dif.ADDED,), None, entry))
+    assert record == {'repository': ctx.REPOSITORY_URL, 'path': 'a.txt', 'changes': ['added'], 'old': None, 'new': entry._asdict()}